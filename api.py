@@ -1,25 +1,118 @@
-from fastapi import FastAPI, HTTPException, Body
-from utils.ocr_document_ai import OCRProcessor
-from utils.gcs import upload_to_gcs, download_from_gcs
-from utils.gemini import GeminiConnector
-from google.oauth2 import service_account
+import json
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, Response
+from utils.clients import registry
+from utils.latency import LatencyTracker
+from utils.metrics import span, metrics_payload, observe_transfer, HTTP_REQUEST_SECONDS
+from utils.ocr_jobs import OCRJobManager
+import asyncio
+import time
 import os
+import re
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Backend clients to build at startup (comma separated registry names), e.g. "ocr,gemini,gcs_bucket"
+WARMUP_CLIENTS = [name.strip() for name in os.getenv("WARMUP_CLIENTS", "").split(",") if name.strip()]
+
+def get_ocr_processor():
+    """Returns the shared OCRProcessor, built on first use."""
+    return registry.get("ocr")
+
+def get_gemini_connector():
+    """Returns the shared GeminiConnector, built on first use."""
+    return registry.get("gemini")
+
+# Time-to-first-token and total time of streamed generations
+generation_latency = LatencyTracker()
+
+# Batch OCR jobs share the processor's client pool
+ocr_jobs = OCRJobManager(lambda filename: get_ocr_processor().process_file(filename))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warms up the configured backend clients in the background, so the worker accepts
+    requests immediately and an unreachable backend does not stop it from booting.
+    """
+    warmup = asyncio.create_task(asyncio.to_thread(registry.warm_up, WARMUP_CLIENTS)) if WARMUP_CLIENTS else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await ocr_jobs.shutdown()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Times every request inside a trace span, labelled by route template so that /jobs/{job_id}
+    is one series. The span covers the handler until the headers are sent; the latency is
+    observed once the last byte of the body is sent, so streamed responses are timed in full.
+    """
+    start = time.perf_counter()
+
+    def route_path() -> str:
+        route = request.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+    def observe(status: str):
+        HTTP_REQUEST_SECONDS.labels(method=request.method, route=route_path(), status=status).observe(time.perf_counter() - start)
+
+    with span(f"{request.method} {request.url.path}", **{"http.method": request.method}) as current:
+        try:
+            response = await call_next(request)
+        except Exception:
+            observe("500")
+            raise
+        finally:
+            if current is not None:
+                current.update_name(f"{request.method} {route_path()}")
+                current.set_attribute("http.route", route_path())
+        if current is not None:
+            current.set_attribute("http.status_code", response.status_code)
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(str(response.status_code))
 
-# Initialize OCRProcessor
-ocr_processor = OCRProcessor()
+    response.body_iterator = timed_body()
+    return response
 
-gemini_connector = GeminiConnector()
+@app.get("/metrics")
+def metrics():
+    """
+    API endpoint exposing the Prometheus metrics of the API and the pipeline code it runs.
+
+    Returns:
+    Response: Metrics in the Prometheus text exposition format.
+    """
+    try:
+        payload, content_type = metrics_payload()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return Response(content=payload, media_type=content_type)
 
 @app.post("/process-ocr/")
-def process_ocr(filename: str = Body(..., embed=True)):
+def process_ocr(filename: str = Body(..., embed=True), split_pages: bool = Body(False, embed=True)):
     """
     API endpoint to process a document using Google Document AI OCR.
 
     Parameters:
     - filename (str): Path to the file to be processed.
+    - split_pages (bool): OCR large PDFs as parallel page ranges and return per-page offsets.
 
     Returns:
     dict: Extracted text from the processed document.
@@ -29,8 +122,12 @@ def process_ocr(filename: str = Body(..., embed=True)):
         if not os.path.exists(filename):
             raise HTTPException(status_code=400, detail=f"File not found: {filename}")
 
+        if split_pages:
+            result = get_ocr_processor().process_file_pages(filename)
+            return {"filename": filename, "extracted_text": result["text"], "pages": result["pages"]}
+
         # Process the file using OCRProcessor
-        ocr_text = ocr_processor.process_file(filename)
+        ocr_text = get_ocr_processor().process_file(filename)
 
         # Return the extracted text
         return {"filename": filename, "extracted_text": ocr_text}
@@ -38,6 +135,62 @@ def process_ocr(filename: str = Body(..., embed=True)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/process-ocr/batch")
+async def process_ocr_batch(filenames: List[str] = Body(..., embed=True)):
+    """
+    API endpoint to queue a batch of documents for OCR.
+
+    Parameters:
+    - filenames (list): Paths of the files to be processed.
+
+    Returns:
+    dict: The job id to poll on /jobs/{job_id} and the number of queued files.
+    """
+    if not filenames:
+        raise HTTPException(status_code=400, detail="filenames must not be empty")
+
+    job = ocr_jobs.submit(filenames)
+    return {"job_id": job.id, "total": len(filenames)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, stream: bool = True):
+    """
+    API endpoint to follow a batch OCR job.
+
+    Parameters:
+    - job_id (str): Id returned by /process-ocr/batch.
+    - stream (bool): Stream per-file results as newline-delimited JSON while they finish.
+      When false, return a snapshot of the job instead.
+
+    Returns:
+    StreamingResponse | dict: Per-file results, or the job status and results collected so far.
+    """
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    if not stream:
+        return job.summary()
+
+    async def result_lines():
+        async for result in job.iter_results():
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+@app.get("/process-ocr/cache-stats")
+def ocr_cache_stats():
+    """
+    API endpoint reporting the OCR result cache counters.
+
+    Returns:
+    dict: Backend name, entry count, hits, misses and hit rate.
+    """
+    cache = get_ocr_processor().cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
 @app.post("/upload-to-gcs/")
 def upload_to_gcs_api(source_file: str = Body(...), destination_blob_name: str = Body(...)):
     """
@@ -50,6 +203,10 @@ def upload_to_gcs_api(source_file: str = Body(...), destination_blob_name: str =
     Returns:
     dict: Confirmation message with uploaded file path.
     """
+    # utils.gcs and utils.elasticsearch_searching load the Google Cloud Storage and Elasticsearch
+    # libraries, so they are imported by the routes using them rather than at worker startup
+    from utils.gcs import upload_to_gcs
+
     try:
         # Use the GCS utility function
         message = upload_to_gcs(source_file, destination_blob_name)
@@ -69,6 +226,8 @@ def download_from_gcs_api(blob_name: str = Body(...), destination_file: str = Bo
     Returns:
     dict: Confirmation message with the downloaded file path.
     """
+    from utils.gcs import download_from_gcs
+
     try:
         # Use the GCS utility function
         downloaded_file = download_from_gcs(blob_name, destination_file)
@@ -76,6 +235,291 @@ def download_from_gcs_api(blob_name: str = Body(...), destination_file: str = Bo
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
+@app.post("/gcs/upload-many/")
+def upload_many_to_gcs_api(
+    source_files: List[str] = Body(None),
+    source_dir: str = Body(None),
+    prefix: str = Body(""),
+    max_workers: int = Body(None),
+    skip_unchanged: bool = Body(True),
+):
+    """
+    Uploads a list of local files and/or a whole directory to Google Cloud Storage in parallel.
+
+    Parameters:
+    - source_files (list): Local file paths to upload.
+    - source_dir (str): Local directory to upload recursively.
+    - prefix (str): Prefix prepended to every destination blob name.
+    - max_workers (int): Maximum number of concurrent uploads, GCS_TRANSFER_WORKERS by default.
+    - skip_unchanged (bool): Skip files whose checksum matches the existing blob.
+
+    Returns:
+    dict: Throughput report with per-object timing.
+    """
+    if not source_files and not source_dir:
+        raise HTTPException(status_code=400, detail="Provide source_files or source_dir")
+    from utils.gcs import upload_many, DEFAULT_TRANSFER_WORKERS
+
+    if max_workers is None:
+        max_workers = DEFAULT_TRANSFER_WORKERS
+    try:
+        return upload_many(source_files, source_dir, prefix, max_workers=max_workers, skip_unchanged=skip_unchanged)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/gcs/download-many/")
+def download_many_from_gcs_api(
+    destination_dir: str = Body(...),
+    blob_names: List[str] = Body(None),
+    prefix: str = Body(None),
+    max_workers: int = Body(None),
+    skip_unchanged: bool = Body(True),
+):
+    """
+    Downloads a list of blobs and/or a whole prefix from Google Cloud Storage in parallel.
+
+    Parameters:
+    - destination_dir (str): Local directory to save the files to.
+    - blob_names (list): Paths of the files in the GCS bucket.
+    - prefix (str): Download every blob under this prefix.
+    - max_workers (int): Maximum number of concurrent downloads, GCS_TRANSFER_WORKERS by default.
+    - skip_unchanged (bool): Skip blobs whose checksum matches the existing local file.
+
+    Returns:
+    dict: Throughput report with per-object timing.
+    """
+    if not blob_names and prefix is None:
+        raise HTTPException(status_code=400, detail="Provide blob_names or prefix")
+    from utils.gcs import download_many, DEFAULT_TRANSFER_WORKERS
+
+    if max_workers is None:
+        max_workers = DEFAULT_TRANSFER_WORKERS
+    try:
+        return download_many(destination_dir, blob_names, prefix, max_workers=max_workers, skip_unchanged=skip_unchanged)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_multipart_to_gcs(request: Request, destination_blob_name: str, chunk_size: int) -> dict:
+    """
+    Parses a multipart/form-data body as it arrives and writes its first file part to GCS.
+
+    Parameters:
+    - request (Request): Incoming request with a multipart body.
+    - destination_blob_name (str): Destination path in the bucket, defaults to the part's filename.
+    - chunk_size (int): Bytes sent per resumable upload request.
+
+    Returns:
+    dict: Name and size of the uploaded blob.
+    """
+    from utils.gcs import open_upload_stream, abort_upload_stream
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with a boundary")
+
+    part = {"headers": {}, "field": b"", "value": b"", "writer": None, "active": False, "done": False}
+    upload = {"blob_name": None, "size": 0}
+    start = time.perf_counter()
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"")
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        # Only the first file part is uploaded, other fields are skipped
+        if filename is not None and not part["done"]:
+            upload["blob_name"] = destination_blob_name or filename.decode()
+            part_type = part["headers"].get(b"content-type", b"application/octet-stream").decode()
+            # Active only once the upload is open, so a failed open leaves nothing to abort
+            part["writer"] = open_upload_stream(upload["blob_name"], part_type, chunk_size)
+            part["active"] = True
+
+    def on_part_data(data, start, end):
+        if part["active"]:
+            part["writer"].write(data[start:end])
+            upload["size"] += end - start
+
+    def on_part_end():
+        if part["active"]:
+            part["writer"].close()
+            part.update(active=False, done=True)
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    # GCS writes block, so every chunk is fed to the parser off the event loop
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(parser.write, chunk)
+        await run_in_threadpool(parser.finalize)
+    finally:
+        # A part still open means the client went away or a write failed mid-file
+        if part["active"] and part["writer"] is not None:
+            part["active"] = False
+            await run_in_threadpool(abort_upload_stream, part["writer"])
+
+    if not part["done"]:
+        raise HTTPException(status_code=400, detail="No file part found in the multipart body")
+
+    observe_transfer("upload", upload["size"], time.perf_counter() - start)
+    return upload
+
+@app.post("/gcs/upload/")
+async def upload_multipart_to_gcs_api(request: Request, destination_blob_name: str = None, chunk_size: int = None):
+    """
+    Streams a multipart/form-data file upload straight into a resumable GCS upload.
+
+    Parameters:
+    - destination_blob_name (str): Destination path in the GCS bucket; defaults to the uploaded filename.
+    - chunk_size (int): Bytes sent per resumable upload request, a multiple of 256 KiB; GCS_CHUNK_SIZE by default.
+
+    Returns:
+    dict: Name and size of the uploaded blob.
+    """
+    from utils.gcs import DEFAULT_CHUNK_SIZE
+
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    try:
+        return await _stream_multipart_to_gcs(request, destination_blob_name, chunk_size)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/gcs/upload/{blob_name:path}")
+async def upload_stream_to_gcs_api(blob_name: str, request: Request, chunk_size: int = None):
+    """
+    Streams a raw request body straight into a resumable GCS upload.
+
+    Parameters:
+    - blob_name (str): Destination path in the GCS bucket.
+    - chunk_size (int): Bytes sent per resumable upload request, a multiple of 256 KiB; GCS_CHUNK_SIZE by default.
+
+    Returns:
+    dict: Name and size of the uploaded blob.
+    """
+    from utils.gcs import open_upload_stream, abort_upload_stream, DEFAULT_CHUNK_SIZE
+
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        writer = await run_in_threadpool(open_upload_stream, blob_name, content_type, chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    size = 0
+    finalized = False
+    start = time.perf_counter()
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(writer.write, chunk)
+            size += len(chunk)
+        await run_in_threadpool(writer.close)
+        finalized = True
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not finalized:
+            await run_in_threadpool(abort_upload_stream, writer)
+    observe_transfer("upload", size, time.perf_counter() - start)
+
+    return {"blob_name": blob_name, "size": size}
+
+def _parse_range(range_header: str, size: int):
+    """
+    Parses a single-range HTTP Range header.
+
+    Parameters:
+    - range_header (str): Value of the Range header, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500".
+    - size (int): Total size of the object.
+
+    Returns:
+    tuple | None: Inclusive (start, end) offsets, or None when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        return None
+    return start, end
+
+@app.get("/gcs/download/{blob_name:path}")
+def download_stream_from_gcs_api(blob_name: str, request: Request, chunk_size: int = None):
+    """
+    Streams an object from Google Cloud Storage, honouring HTTP Range requests.
+
+    Parameters:
+    - blob_name (str): Path of the file in the GCS bucket.
+    - chunk_size (int): Bytes fetched from GCS per ranged request, GCS_CHUNK_SIZE by default.
+
+    Returns:
+    StreamingResponse: The object content, or the requested byte range with status 206.
+    """
+    from utils.gcs import get_blob_metadata, iter_blob_range, DEFAULT_CHUNK_SIZE
+
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="chunk_size must be a positive number of bytes")
+
+    blob = get_blob_metadata(blob_name)
+    if blob is None:
+        raise HTTPException(status_code=404, detail=f"Blob not found: {blob_name}")
+
+    headers = {"Accept-Ranges": "bytes"}
+    status_code = 200
+    start, end = 0, blob.size - 1
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, blob.size)
+        if byte_range is None:
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                                headers={"Content-Range": f"bytes */{blob.size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{blob.size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_blob_range(blob, start, end, chunk_size),
+        status_code=status_code,
+        media_type=blob.content_type or "application/octet-stream",
+        headers=headers,
+    )
+
 @app.post("/generate-content/")
 def generate_content(prompt: str = Body(..., embed=True)):
     """
@@ -88,7 +532,125 @@ def generate_content(prompt: str = Body(..., embed=True)):
     dict: Generated content.
     """
     try:
-        result = gemini_connector.generate_content(prompt)
+        result = get_gemini_connector().generate_content(prompt)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating content: {e}")
+
+@app.post("/generate-content/stream")
+def generate_content_stream(prompt: str = Body(..., embed=True)):
+    """
+    API endpoint to stream generated content as Server-Sent Events.
+
+    Each chunk is sent as a "data" event as soon as the model produces it, followed by a
+    "done" event with the time to first token and total time, or an "error" event.
+
+    Parameters:
+    - prompt (str): Text prompt for content generation.
+
+    Returns:
+    StreamingResponse: text/event-stream of generated chunks.
+    """
+    start = time.perf_counter()
+
+    def events():
+        first_token_ms = None
+        try:
+            for text in get_gemini_connector().stream_content(prompt):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                    generation_latency.record("time_to_first_token", first_token_ms)
+                yield f"data: {json.dumps({'text': text})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error generating content: {e}'})}\n\n"
+            return
+
+        total_ms = (time.perf_counter() - start) * 1000
+        generation_latency.record("total", total_ms)
+        yield f"event: done\ndata: {json.dumps({'time_to_first_token_ms': first_token_ms, 'total_ms': total_ms})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/generate-content/stream-stats")
+def generate_content_stream_stats():
+    """
+    API endpoint reporting time-to-first-token and total time percentiles of streamed generations.
+
+    Returns:
+    dict: Latency summary per stage in milliseconds.
+    """
+    return generation_latency.summary()
+
+@app.get("/generate-content/cache-stats")
+def generate_content_cache_stats():
+    """
+    API endpoint reporting the Gemini response cache counters.
+
+    Returns:
+    dict: Hits and misses per cache tier and the number of coalesced requests.
+    """
+    return get_gemini_connector().cache_stats()
+
+@app.post("/search")
+def search(
+    query: str = Body(...),
+    index: str = Body(...),
+    vector_field: str = Body("embedding"),
+    text_fields: List[str] = Body(None),
+    source_fields: List[str] = Body(None),
+    k: int = Body(5),
+    num_candidates: int = Body(100),
+    size: int = Body(10),
+    knn_boost: float = Body(0.5),
+    text_boost: float = Body(0.5),
+    fusion: str = Body("boost"),
+    rank_constant: int = Body(60),
+):
+    """
+    API endpoint for hybrid keyword and kNN search.
+
+    Parameters:
+    - query (str): Text to search for.
+    - index (str): Elasticsearch index to search in.
+    - vector_field (str): dense_vector field used by the kNN search.
+    - text_fields (list): Fields matched by the keyword search; required unless the index has defaults
+      (news_jakarta: title and content, twitter_jakarta: full_text).
+    - source_fields (list): Fields returned for each document; required unless the index has defaults.
+    - k (int): Number of nearest neighbours.
+    - num_candidates (int): kNN candidates considered per shard.
+    - size (int): Number of documents returned.
+    - knn_boost (float): Weight of the kNN score when fusion is "boost".
+    - text_boost (float): Weight of the keyword score when fusion is "boost".
+    - fusion (str): "boost" for a weighted score blend or "rrf" for reciprocal rank fusion.
+    - rank_constant (int): Rank constant used by "rrf".
+
+    Returns:
+    dict: Matching documents with their ids and fused scores.
+    """
+    if fusion not in ("boost", "rrf"):
+        raise HTTPException(status_code=400, detail="fusion must be 'boost' or 'rrf'")
+    from utils.elasticsearch_searching import hybrid_search, SEARCH_FIELDS
+
+    if index not in SEARCH_FIELDS and (not text_fields or not source_fields):
+        raise HTTPException(status_code=400, detail=f"text_fields and source_fields are required for index {index}")
+    try:
+        documents = hybrid_search(
+            query, index, field=vector_field, k=k, num_candidates=num_candidates, size=size,
+            knn_boost=knn_boost, text_boost=text_boost, text_fields=text_fields,
+            source_fields=source_fields, fusion=fusion, rank_constant=rank_constant,
+        )
+        return {"query": query, "documents": documents}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching: {e}")
+
+@app.get("/search/stats")
+def search_stats():
+    """
+    API endpoint reporting per-stage search latency percentiles and the query embedding cache counters.
+
+    Returns:
+    dict: Latency summary per stage in milliseconds and cache statistics.
+    """
+    from utils.elasticsearch_searching import search_latency, query_embedding_cache
+
+    return {"latency": search_latency.summary(), "query_embedding_cache": query_embedding_cache.stats()}
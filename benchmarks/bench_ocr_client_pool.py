@@ -0,0 +1,116 @@
+"""
+Per-call latency of OCRProcessor with a fresh Document AI client per request
+versus the pooled clients, measured against a local stub gRPC server.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ocr_client_pool --calls 200 --pool-size 4
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.cloud import documentai_v1 as documentai
+from google.cloud.documentai_v1.services.document_processor_service.transports import (
+    DocumentProcessorServiceGrpcTransport,
+)
+
+from utils.ocr_document_ai import OCRProcessor
+
+SERVICE_NAME = "google.cloud.documentai.v1.DocumentProcessorService"
+
+
+def start_stub_server():
+    """
+    Start a local gRPC server answering ProcessDocument with a fixed document.
+
+    Returns:
+    tuple: The running server and the address it listens on.
+    """
+    def process_document(request, context):
+        return documentai.ProcessResponse(document=documentai.Document(text="stub text"))
+
+    handler = grpc.method_handlers_generic_handler(SERVICE_NAME, {
+        "ProcessDocument": grpc.unary_unary_rpc_method_handler(
+            process_document,
+            request_deserializer=documentai.ProcessRequest.deserialize,
+            response_serializer=documentai.ProcessResponse.serialize,
+        ),
+    })
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+
+class StubOCRProcessor(OCRProcessor):
+    """
+    OCRProcessor whose clients talk to the stub server over an insecure channel.
+    """
+    def __init__(self, address: str, pool_size: int, pooled: bool = True):
+        self.project_id = "bench-project"
+        self.location = "us"
+        self.processor_id = "bench-processor"
+        self.credentials = None
+        self.cache = None
+        self.pool_size = pool_size
+        self._clients = []
+        self._next_client = 0
+        self._pool_lock = threading.Lock()
+        self.address = address
+        self.pooled = pooled
+
+    def _create_client(self):
+        transport = DocumentProcessorServiceGrpcTransport(channel=grpc.insecure_channel(self.address))
+        return documentai.DocumentProcessorServiceClient(transport=transport)
+
+    def _get_client(self):
+        if self.pooled:
+            return super()._get_client()
+        # Baseline: the previous behaviour of one new client per request
+        return self._create_client()
+
+
+def measure(processor: OCRProcessor, filename: str, calls: int) -> list:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        processor.process_file(filename)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<12} mean={statistics.mean(latencies):7.3f} ms  "
+          f"p50={statistics.median(latencies):7.3f} ms  p95={p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    server, address = start_stub_server()
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as sample:
+        sample.write(os.urandom(4096))
+
+    try:
+        report("per-request", measure(StubOCRProcessor(address, args.pool_size, pooled=False), sample.name, args.calls))
+        pooled = StubOCRProcessor(address, args.pool_size)
+        report("pooled", measure(pooled, sample.name, args.calls))
+        pooled.close()
+    finally:
+        os.remove(sample.name)
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Cold start time of the API: a fresh interpreter importing `api` and building the
+FastAPI app, which is what every uvicorn worker pays before serving its first request.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --runs 5 --warm-up ocr,gemini,gcs_bucket
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter() - start
+warm_up = {}
+if WARM_UP:
+    from utils.clients import registry
+    warm_up = registry.warm_up(WARM_UP)
+print(json.dumps({"import": imported, "total": time.perf_counter() - start, "warm_up": warm_up}))
+"""
+
+
+def run_once(warm_up: list) -> dict:
+    code = f"WARM_UP = {warm_up!r}\n" + IMPORT_SNIPPET
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warm-up", default="", help="Comma separated clients to build after the import")
+    args = parser.parse_args()
+
+    warm_up = [name for name in args.warm_up.split(",") if name]
+    runs = [run_once(warm_up) for _ in range(args.runs)]
+
+    imports = [run["import"] * 1000 for run in runs]
+    print(f"import api   mean={statistics.mean(imports):8.1f} ms  min={min(imports):8.1f} ms  max={max(imports):8.1f} ms")
+    if warm_up:
+        totals = [run["total"] * 1000 for run in runs]
+        print(f"with warm-up mean={statistics.mean(totals):8.1f} ms  min={min(totals):8.1f} ms")
+        print(f"last warm-up report: {runs[-1]['warm_up']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cost of collecting tweets from a scrolling timeline, on the saved HTML in
+benchmarks/fixtures/tweets.html:
+
+- extract: per-tweet latency of extract_tweet_data versus the previous version,
+  which serialized the element with str() for its regexes.
+- session: a simulated crawl where every scroll renders --per-scroll new tweets.
+  The previous loop re-parsed the whole page_source and re-extracted every tweet
+  on each scroll; the incremental loop parses only the newly rendered nodes.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_tweet_extraction --scrolls 50 --per-scroll 8
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from crawler.tweet_parser import convert_formatted_number, extract_tweet_data, parse_tweets
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "tweets.html")
+
+
+def legacy_extract_tweet_data(tweet):
+    # Baseline: extract_tweet_data as it was before incremental collection
+    text_parts = []
+    for element in tweet.find('div', {"data-testid": "tweetText"}).find_all(['span', 'img']):
+        if element.name == 'span':
+            text_parts.append(element.get_text(strip=True))
+        elif element.name == 'img' and element.has_attr('alt'):
+            text_parts.append(element['alt'])
+    full_text = " ".join(text_parts)
+
+    account = [i.text for i in tweet.find('div', {"data-testid": "User-Name"}).find_all(['span']) if i.text and i.text != '·']
+    waktu = tweet.find('time').get('datetime').split('T')
+
+    try:
+        link_image_url = re.findall(r'(https://pbs.twimg.com/profile_images/.*?)"', str(tweet))[0]
+    except IndexError:
+        link_image_url = 'https://abs.twimg.com/sticky/default_profile_images/default_profile_normal.png'
+    link_post = 'https://x.com' + re.findall(r'href="(/[^\s]*?/status/.*?)"', str(tweet))[0]
+
+    agg = [i.text if i.text else "0" for i in tweet.find_all('span', {'data-testid': 'app-text-transition-container'})]
+    return {
+        "id": link_post.split('/')[-1], "full_text": full_text, "link_post": link_post,
+        "link_image_url": link_image_url, "username": account[-1], "name": account[0],
+        "date": waktu[0], "time": waktu[1].split('.')[0],
+        "favorite_count": convert_formatted_number(agg[2]), "retweet_count": convert_formatted_number(agg[1]),
+        "reply_count": convert_formatted_number(agg[0]),
+        "views_count": convert_formatted_number(agg[3]) if len(agg) > 3 else 0,
+        "mentions": re.findall(r'@\w+', full_text), "hashtags": re.findall(r'#\w+', full_text),
+    }
+
+
+def load_templates() -> list:
+    with open(FIXTURE, encoding="utf-8") as fixture:
+        return [str(tweet) for tweet in parse_tweets(fixture.read())]
+
+
+def timeline(templates: list, count: int) -> list:
+    """
+    outerHTML of count tweets cloned from the fixture, each with its own status id.
+    """
+    tweets = []
+    for i in range(count):
+        html = templates[i % len(templates)]
+        tweets.append(re.sub(r"/status/\d+", f"/status/{1800000000000000000 + i}", html))
+    return tweets
+
+
+def page(tweets: list) -> str:
+    return "<html><body><main><div data-testid=\"primaryColumn\">" + "".join(tweets) + "</div></main></body></html>"
+
+
+def bench_extract(templates: list, runs: int):
+    tweets = parse_tweets("".join(templates))
+    for label, extract in (("legacy", legacy_extract_tweet_data), ("current", extract_tweet_data)):
+        latencies = []
+        for _ in range(runs):
+            for tweet in tweets:
+                start = time.perf_counter()
+                extract(tweet)
+                latencies.append((time.perf_counter() - start) * 1e6)
+        print(f"extract  {label:<8} mean={statistics.mean(latencies):8.1f} us  p50={statistics.median(latencies):8.1f} us")
+
+
+def bench_session(templates: list, scrolls: int, per_scroll: int):
+    tweets = timeline(templates, scrolls * per_scroll)
+
+    # Previous loop: parse the full page and extract every tweet on it after each scroll
+    start = time.perf_counter()
+    collected = set()
+    for scroll in range(1, scrolls + 1):
+        soup = BeautifulSoup(page(tweets[:scroll * per_scroll]), 'lxml')
+        for tweet in soup.find_all('article', {"data-testid": "tweet"}):
+            collected.add(legacy_extract_tweet_data(tweet)["id"])
+    legacy = time.perf_counter() - start
+
+    # Incremental loop: only the nodes rendered since the previous scroll
+    start = time.perf_counter()
+    seen_ids = set()
+    for scroll in range(scrolls):
+        for tweet in parse_tweets("".join(tweets[scroll * per_scroll:(scroll + 1) * per_scroll])):
+            seen_ids.add(extract_tweet_data(tweet)["id"])
+    current = time.perf_counter() - start
+
+    assert collected == seen_ids
+    print(f"session  legacy   {legacy:8.3f} s for {len(collected)} tweets over {scrolls} scrolls")
+    print(f"session  current  {current:8.3f} s for {len(seen_ids)} tweets ({legacy / current:.1f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="Passes over the fixture tweets for the extract benchmark")
+    parser.add_argument("--scrolls", type=int, default=50)
+    parser.add_argument("--per-scroll", type=int, default=8)
+    args = parser.parse_args()
+
+    templates = load_templates()
+    bench_extract(templates, args.runs)
+    bench_session(templates, args.scrolls, args.per_scroll)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.chrome.service import Service as ChromeService
+from dotenv import load_dotenv
+from utils.metrics import timed, CRAWLER_FETCH_SECONDS
+
+load_dotenv()
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 4))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() == "true"
+PAGE_LOAD_TIMEOUT = int(os.getenv("BROWSER_PAGE_LOAD_TIMEOUT", 20))
+DOM_READY_TIMEOUT = int(os.getenv("BROWSER_DOM_READY_TIMEOUT", 10))
+# Drivers are recycled after this many pages to keep Chrome's memory in check
+PAGES_PER_DRIVER = int(os.getenv("BROWSER_PAGES_PER_DRIVER", 200))
+
+# The page is ready once loaded, or as soon as enough paragraphs are rendered
+DOM_READY_SCRIPT = """
+return document.readyState === 'complete'
+    || (document.readyState === 'interactive' && document.querySelectorAll('p').length >= 5);
+"""
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def setup_driver(headless=BROWSER_HEADLESS):
+    """
+    Set up and return a Selenium WebDriver instance for crawling.
+
+    Args:
+        headless (bool): Run Chrome without a window.
+
+    Returns:
+        webdriver.Chrome: The driver, returning from get() at DOMContentLoaded.
+    """
+    global _driver_path
+    # Resolve the chromedriver binary once for all workers
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    # Images are not needed to extract article text
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.page_load_strategy = "eager"
+
+    driver = webdriver.Chrome(service=ChromeService(_driver_path), options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+class BrowserWorker:
+    def __init__(self, name):
+        """
+        A headless browser owned by one pool worker, restarted when unhealthy.
+
+        Args:
+            name (str): Name used in log messages.
+        """
+        self.name = name
+        self.driver = None
+        self.pages = 0
+        self.restarts = 0
+
+    def start(self):
+        self.driver = setup_driver()
+        self.pages = 0
+
+    def stop(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def restart(self):
+        print(f"Restarting browser {self.name}")
+        self.stop()
+        self.start()
+        self.restarts += 1
+
+    def is_healthy(self):
+        """
+        Check that the browser still answers commands.
+        """
+        if self.driver is None:
+            return False
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def ensure_ready(self):
+        """
+        Start the browser on first use and replace it if it died or served too many pages.
+        """
+        if self.driver is None:
+            self.start()
+        elif self.pages >= PAGES_PER_DRIVER or not self.is_healthy():
+            self.restart()
+
+    def get_html(self, url, ready_script=DOM_READY_SCRIPT):
+        """
+        Navigate to a URL and return its HTML once the DOM condition is met.
+
+        Args:
+            url (str): The page to load.
+            ready_script (str): JavaScript returning true when the page is ready.
+
+        Returns:
+            str: The page source.
+        """
+        self.ensure_ready()
+        self.pages += 1
+        with timed(CRAWLER_FETCH_SECONDS, method="browser"):
+            try:
+                self.driver.get(url)
+            except TimeoutException:
+                # Slow third-party resources; the article DOM is usually there already
+                pass
+            try:
+                WebDriverWait(self.driver, DOM_READY_TIMEOUT, poll_frequency=0.2).until(
+                    lambda driver: driver.execute_script(ready_script)
+                )
+            except TimeoutException:
+                pass
+            return self.driver.page_source
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE):
+        """
+        Pool of headless browser workers, each with its own driver, started lazily.
+
+        Args:
+            size (int): Number of browsers.
+        """
+        self.size = size
+        self._idle = queue.Queue()
+        self._workers = [BrowserWorker(f"browser-{i}") for i in range(size)]
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @contextmanager
+    def worker(self):
+        """
+        Borrow a worker for the duration of the block. A worker whose browser raised is restarted on next use.
+        """
+        worker = self._idle.get()
+        try:
+            yield worker
+        except WebDriverException:
+            worker.stop()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def get_html(self, url):
+        """
+        Load a URL on any idle browser and return its HTML.
+        """
+        with self.worker() as worker:
+            return worker.get_html(url)
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
@@ -0,0 +1,208 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+from utils.bulk_ingest import iter_batches
+
+load_dotenv()
+
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", ".cache/crawl_state.sqlite3")
+# Indexed URLs checked more recently than this are skipped without any request
+CRAWL_REVISIT_SECONDS = float(os.getenv("CRAWL_REVISIT_SECONDS", 24 * 3600))
+# Ids looked up per mget when checking which URLs are already indexed
+CRAWL_MGET_BATCH_SIZE = int(os.getenv("CRAWL_MGET_BATCH_SIZE", 500))
+
+def content_hash(text: str) -> str:
+    """
+    Hash of the article text, used to tell whether an article changed since it was enriched.
+    """
+    return hashlib.sha256((text or "").strip().encode("utf-8")).hexdigest()
+
+class CrawlState:
+    def __init__(self, path: str = CRAWL_STATE_PATH, revisit_seconds: float = CRAWL_REVISIT_SECONDS):
+        """
+        Persistent crawl state: for every URL, its document id, the hash of the enriched text,
+        the HTTP validators (ETag / Last-Modified) and when it was last checked and enriched.
+
+        State is written in two steps: a fetched article is staged, and only committed once its
+        document is indexed, so an article that failed enrichment or ingest is retried on the next
+        run instead of being answered from the validators. Staged state is stored in the database
+        too, so fetching and ingesting may run in different processes.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            revisit_seconds (float): Minimum age of the last check before an indexed URL is revalidated.
+        """
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.revisit_seconds = revisit_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, id TEXT NOT NULL, content_hash TEXT, etag TEXT, last_modified TEXT, "
+            "checked_at REAL, enriched_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS staged ("
+            "id TEXT PRIMARY KEY, url TEXT NOT NULL, content_hash TEXT, etag TEXT, last_modified TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, urls: list) -> dict:
+        """
+        Look up the state of URLs.
+
+        Args:
+            urls (list): URLs to look up.
+
+        Returns:
+            dict: URL to its state row, for the URLs that are known.
+        """
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for batch in iter_batches(urls, 500):
+                rows = self._conn.execute(
+                    "SELECT url, id, content_hash, etag, last_modified, checked_at, enriched_at "
+                    f"FROM urls WHERE url IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for url, doc_id, text_hash, etag, last_modified, checked_at, enriched_at in rows:
+                    found[url] = {
+                        "id": doc_id, "content_hash": text_hash, "etag": etag, "last_modified": last_modified,
+                        "checked_at": checked_at, "enriched_at": enriched_at,
+                    }
+        return found
+
+    def _seed_from_index(self, es: Elasticsearch, index_name: str, ids_by_url: dict) -> set:
+        """
+        Record URLs whose document is already indexed, hashing the stored content.
+
+        Returns:
+            set: The URLs found in the index.
+        """
+        if not ids_by_url or not es.indices.exists(index=index_name):
+            return set()
+
+        now = time.time()
+        urls_by_id = {doc_id: url for url, doc_id in ids_by_url.items()}
+        rows = []
+        for ids in iter_batches(list(urls_by_id), CRAWL_MGET_BATCH_SIZE):
+            response = es.mget(index=index_name, ids=ids, source=["content"])
+            for document in response["docs"]:
+                if document.get("found"):
+                    content = (document.get("_source") or {}).get("content")
+                    rows.append((urls_by_id[document["_id"]], document["_id"], content_hash(content), now, now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO urls (url, id, content_hash, checked_at, enriched_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return {row[0] for row in rows}
+
+    def urls_to_fetch(self, urls, es: Elasticsearch = None, index_name: str = None, id_for=None) -> list:
+        """
+        Select the URLs of this run: new URLs, and indexed URLs due for revalidation.
+
+        Args:
+            urls (iterable): Discovered URLs.
+            es (Elasticsearch): Client used to find URLs indexed before the state existed, optional.
+            index_name (str): The index the documents live in, required with es.
+            id_for (callable): Maps a URL to its document id, required with es.
+
+        Returns:
+            list: URLs to fetch; known ones are fetched conditionally with their validators.
+        """
+        urls = list(dict.fromkeys(urls))
+        known = self.get_many(urls)
+
+        seeded = set()
+        if es is not None and index_name and id_for is not None:
+            seeded = self._seed_from_index(es, index_name, {url: id_for(url) for url in urls if url not in known})
+
+        cutoff = time.time() - self.revisit_seconds
+        to_fetch, fresh = [], 0
+        for url in urls:
+            if url in seeded:
+                fresh += 1
+                continue
+            state = known.get(url)
+            if state and state["enriched_at"] and (state["checked_at"] or 0) >= cutoff:
+                fresh += 1
+                continue
+            to_fetch.append(url)
+
+        print(f"{len(urls)} URLs discovered: {fresh} indexed and recently checked, "
+              f"{sum(url in known for url in to_fetch)} to revalidate, {sum(url not in known for url in to_fetch)} new.")
+        return to_fetch
+
+    def validators(self, urls: list) -> dict:
+        """
+        HTTP validators of enriched URLs, for conditional requests.
+
+        Returns:
+            dict: URL to {"etag", "last_modified"}, for URLs with at least one validator.
+        """
+        return {
+            url: {"etag": state["etag"], "last_modified": state["last_modified"]}
+            for url, state in self.get_many(urls).items()
+            if state["enriched_at"] and (state["etag"] or state["last_modified"])
+        }
+
+    def is_unchanged(self, url: str, text_hash: str) -> bool:
+        """
+        Whether the URL was already enriched with exactly this text.
+        """
+        state = self.get_many([url]).get(url)
+        return bool(state and state["enriched_at"] and state["content_hash"] == text_hash)
+
+    def touch(self, url: str):
+        """
+        Record that an indexed URL was checked and found unchanged.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE urls SET checked_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def stage(self, doc_id: str, url: str, text_hash: str, etag: str = None, last_modified: str = None):
+        """
+        Keep the state of a fetched article until its document is indexed.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO staged (id, url, content_hash, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, url, text_hash, etag, last_modified),
+            )
+            self._conn.commit()
+
+    def commit(self, doc_id: str):
+        """
+        Persist the staged state of an article once its document is indexed.
+        """
+        now = time.time()
+        with self._lock:
+            staged = self._conn.execute(
+                "SELECT url, id, content_hash, etag, last_modified FROM staged WHERE id = ?", (doc_id,)
+            ).fetchone()
+            if staged is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, id, content_hash, etag, last_modified, checked_at, enriched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*staged, now, now),
+            )
+            self._conn.execute("DELETE FROM staged WHERE id = ?", (doc_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,522 @@
+import os
+import queue
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+from utils.clients import registry
+from utils.json_stream import JSONArrayStream
+from utils.elasticsearch_client import get_elasticsearch
+from utils.rate_limit import TokenBucket, retry_with_backoff
+from utils.bulk_ingest import stream_ingest, iter_batches
+from utils.vector_index import iter_with_embeddings, ensure_vector_index
+from utils.metrics import GEMINI_ENRICHMENT_ARTICLES, GEMINI_ENRICHMENT_WASTED_TOKENS
+
+load_dotenv()
+
+# Gemini enrichment: requests in flight, per-minute quotas and the prompt size budget
+MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", 8))
+REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 60))
+TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", 1000000))
+PROMPT_TOKEN_BUDGET = int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", 30000))
+OUTPUT_TOKENS_PER_ARTICLE = 250  # Rough size of one classification object in the response
+MAX_CHUNK_SIZE = 20
+# Requests an article may take part in before it is given up
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", 3))
+
+# Fields Gemini fills in; also copied from a representative to its near-duplicates
+LABEL_FIELDS = [
+    "topic_classification", "urgency_level", "sentiment", "target_audience",
+    "affected_region", "contextual_content", "contextual_keywords"
+]
+# Records looked up per mget when checking which ones are already labeled
+LABELED_LOOKUP_BATCH_SIZE = int(os.getenv("LABELED_LOOKUP_BATCH_SIZE", 200))
+
+request_limiter = TokenBucket(REQUESTS_PER_MINUTE)
+token_limiter = TokenBucket(TOKENS_PER_MINUTE)
+
+# Static part of the bulk prompt, sent once per model as system instruction
+ENRICHMENT_INSTRUCTIONS = "Given a list of twitter post, predict the following categories for each item: topic classification, urgency level, sentiment, target audience, affected region and Capture contextual or descriptive terms that support the main theme. Output should be in JSON format with each article's uuid included. \n\nGuidelines:\n\n" + """
+1. Topic Classification: Choose one of the following categories based on the main issue addressed:
+   - Social and Economy
+   - Infrastructure and Transportation
+   - Public Health
+   - Environment and Disaster
+   - Safety and Crime
+   - Government and Public Policy
+   - Technology and Innovation
+   - City Planning and Housing
+   - Education and Culture
+   - Tourism and Entertainment
+   - Ecology and Green Spaces
+
+2. Urgency Level: Provide a score from 0 to 100, where 100 indicates the highest urgency. This score represents how quickly the issue needs to be addressed to minimize its impact.
+
+3. Sentiment: Classify sentiment as one of the following:
+   - Positive
+   - Neutral
+   - Negative
+
+4. Target Audience: Identify the primary groups affected by or interested in the news. Use the following categories:
+   - Traditional Market Vendors
+   - Business Owners
+   - Local Government
+   - General Public
+   - Healthcare Workers
+   - Environmental Agencies
+   - Public Transport Users
+   - Tourists
+   - Students and Educators
+   - Technology Enthusiasts
+   - Safety and Security Agencies
+
+5. Affected Region: Classify the region affected by the news as one of the following:
+   - DKI Jakarta (for issues that generally affect all of Jakarta)
+   - South Jakarta
+   - North Jakarta
+   - East Jakarta
+   - West Jakarta
+   - Central Jakarta
+6. Contextual Keywords: Words and phrases that represent key themes, brands, products, individuals, locations, or technical specifications
+
+Return the output in JSON format
+Output:
+[{
+"id":<string>,
+"topic_classification":<string>,
+"urgency_level":<0-100>,
+"sentiment":<string>,
+"target_audience":<list of target>,
+"affected_region":<string>,
+"contextual_content": "This is a brief summary of the content related to the topic, capturing the main ideas and context. using indonesia language",
+"contextual_keywords":<Top 5 list of contextual keyword or phrases in Indonesia Language>
+}]
+
+Process each news article separately using its uuid as an identifier.
+
+"""
+
+# Function to generate the per-chunk part of the bulk prompt
+def generate_articles_prompt(news_list):
+    return f"""News Articles:
+{news_list}"""
+
+# Function to generate bulk prompts for Gemini
+def generate_bulk_prompt(news_list):
+    return ENRICHMENT_INSTRUCTIONS + generate_articles_prompt(news_list)
+
+# Response schema of the bulk prompt, enforced by Gemini's JSON response mode
+ENRICHMENT_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "topic_classification": {"type": "string", "enum": [
+                "Social and Economy", "Infrastructure and Transportation", "Public Health",
+                "Environment and Disaster", "Safety and Crime", "Government and Public Policy",
+                "Technology and Innovation", "City Planning and Housing", "Education and Culture",
+                "Tourism and Entertainment", "Ecology and Green Spaces",
+            ]},
+            "urgency_level": {"type": "integer"},
+            "sentiment": {"type": "string", "enum": ["Positive", "Neutral", "Negative"]},
+            "target_audience": {"type": "array", "items": {"type": "string", "enum": [
+                "Traditional Market Vendors", "Business Owners", "Local Government", "General Public",
+                "Healthcare Workers", "Environmental Agencies", "Public Transport Users", "Tourists",
+                "Students and Educators", "Technology Enthusiasts", "Safety and Security Agencies",
+            ]}},
+            "affected_region": {"type": "string", "enum": [
+                "DKI Jakarta", "South Jakarta", "North Jakarta", "East Jakarta", "West Jakarta", "Central Jakarta",
+            ]},
+            "contextual_content": {"type": "string"},
+            "contextual_keywords": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["id", *LABEL_FIELDS],
+    },
+}
+
+# Rough token count, Gemini averages about four characters per token
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Function to select the fields of a record that are sent to Gemini
+def prompt_view(record, prompt_fields=None):
+    if not prompt_fields:
+        return record
+    return {field: record.get(field) for field in prompt_fields}
+
+# Function to chunk a stream of articles so that each prompt stays within the token budget
+def iter_token_budget_chunks(news_data, token_budget=PROMPT_TOKEN_BUDGET, max_chunk_size=MAX_CHUNK_SIZE, prompt_fields=None):
+    """
+    Group articles into chunks whose prompt fits the token budget, as the articles arrive.
+
+    Args:
+        news_data (iterable): Articles to enrich.
+        token_budget (int): Maximum estimated input tokens of one prompt.
+        max_chunk_size (int): Maximum number of articles per chunk.
+        prompt_fields (list): Fields of each article sent to Gemini, all of them when None.
+
+    Yields:
+        list: The next chunk; an article larger than the budget gets a chunk of its own.
+    """
+    base_tokens = estimate_tokens(generate_bulk_prompt([]))
+    chunk, chunk_tokens = [], base_tokens
+    for news in news_data:
+        news_tokens = estimate_tokens(str(prompt_view(news, prompt_fields)))
+        if chunk and (chunk_tokens + news_tokens > token_budget or len(chunk) >= max_chunk_size):
+            yield chunk
+            chunk, chunk_tokens = [], base_tokens
+        chunk.append(news)
+        chunk_tokens += news_tokens
+    if chunk:
+        yield chunk
+
+class EnrichmentStats:
+    def __init__(self):
+        """
+        Thread-safe counters of the Gemini enrichment, including the tokens spent on requests
+        whose output could not be used (failed calls, and the share of articles left out of a response).
+        Article outcomes and wasted tokens are also exported as Prometheus counters, see utils.metrics.
+        """
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.enriched = 0
+        self.retried = 0
+        self.failed = 0
+        self.tokens = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.wasted_tokens = 0
+
+    def record(self, chunk_size, recovered, usage):
+        input_tokens = usage.get("prompt_tokens", 0)
+        tokens = input_tokens + usage.get("output_tokens", 0)
+        wasted_tokens = tokens * (chunk_size - recovered) // max(chunk_size, 1)
+        with self._lock:
+            self.requests += 1
+            self.enriched += recovered
+            self.tokens += tokens
+            self.input_tokens += input_tokens
+            self.cached_tokens += usage.get("cached_tokens") or 0
+            self.wasted_tokens += wasted_tokens
+        GEMINI_ENRICHMENT_ARTICLES.labels(outcome="enriched").inc(recovered)
+        GEMINI_ENRICHMENT_WASTED_TOKENS.inc(wasted_tokens)
+
+    def add(self, retried=0, failed=0):
+        with self._lock:
+            self.retried += retried
+            self.failed += failed
+        GEMINI_ENRICHMENT_ARTICLES.labels(outcome="retried").inc(retried)
+        GEMINI_ENRICHMENT_ARTICLES.labels(outcome="failed").inc(failed)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "enriched": self.enriched,
+                "retried": self.retried,
+                "failed": self.failed,
+                "tokens": self.tokens,
+                "tokens_per_article": round(self.tokens / self.enriched, 1) if self.enriched else None,
+                "input_tokens_per_article": round(self.input_tokens / self.enriched, 1) if self.enriched else None,
+                "cached_tokens_per_article": round(self.cached_tokens / self.enriched, 1) if self.enriched else None,
+                "wasted_tokens_per_article": round(self.wasted_tokens / self.enriched, 1) if self.enriched else None,
+            }
+
+enrichment_stats = EnrichmentStats()
+
+# Function to check a classification object before it is merged into an article
+def valid_labels(item, ids):
+    return item.get("id") in ids and all(field in item for field in LABEL_FIELDS)
+
+# Function to enrich one chunk, within the request and token quotas
+def enrich_chunk(chunk, prompt_fields=None, use_cache=True):
+    """
+    Classify a chunk of articles with Gemini in JSON response mode.
+
+    The static instructions go as system instruction, a prefix shared by every request that
+    Vertex can serve from its implicit cache; the articles follow as the prompt. The response is parsed while it streams, so every
+    object completed before an error is kept; the call is only retried when it failed before
+    returning any object. Retried calls skip the response cache.
+
+    Args:
+        chunk (list): Articles to classify.
+        prompt_fields (list): Fields of each article sent to Gemini, all of them when None.
+        use_cache (bool): Answer the first call from the Gemini response cache when possible.
+
+    Returns:
+        list: Classification objects of the articles recovered, possibly fewer than the chunk.
+    """
+    prompt = generate_articles_prompt([prompt_view(news, prompt_fields) for news in chunk])
+    ids = {news["id"] for news in chunk}
+    labels = {}
+    usage = {}
+    calls = 0
+
+    def call_gemini():
+        nonlocal calls
+        calls += 1
+        request_limiter.acquire()
+        # Cached instructions still count towards the tokens-per-minute quota
+        token_limiter.acquire(estimate_tokens(ENRICHMENT_INSTRUCTIONS + prompt) + OUTPUT_TOKENS_PER_ARTICLE * len(chunk))
+        parser = JSONArrayStream()
+        try:
+            stream = registry.get("gemini").stream_content(
+                prompt, use_cache=use_cache and calls == 1, response_schema=ENRICHMENT_SCHEMA, usage=usage,
+                system_instruction=ENRICHMENT_INSTRUCTIONS,
+            )
+            for text in stream:
+                for item in parser.feed(text):
+                    if valid_labels(item, ids):
+                        # Clean contextual content
+                        item["contextual_content"] = str(item["contextual_content"]).replace('"', '')
+                        labels[item["id"]] = item
+        except Exception as e:
+            if not labels:
+                raise
+            print(f"Gemini stream cut off after {len(labels)} of {len(chunk)} articles: {e}")
+
+    try:
+        retry_with_backoff(call_gemini)
+    finally:
+        enrichment_stats.record(len(chunk), len(labels), usage)
+    return list(labels.values())
+
+# Function to enrich a stream of articles, yielding each article merged with its labels
+def iter_enriched_news(news_data, max_in_flight=MAX_IN_FLIGHT, max_attempts=ENRICH_MAX_ATTEMPTS, prompt_fields=None,
+                       keep_failed=False):
+    """
+    Enrich articles with Gemini while they are still being crawled.
+
+    At most max_in_flight chunks are pending at once; the crawl is only pulled further when a
+    slot frees up, so memory stays bounded. Articles missing from a response, or whose request
+    failed, go to a retry queue that is served before new articles, and are sent again
+    grouped with other retries rather than with their whole original chunk, bypassing the
+    response cache.
+
+    Args:
+        news_data (iterable): Articles to enrich.
+        max_in_flight (int): Maximum number of concurrent Gemini requests.
+        max_attempts (int): Requests an article may take part in before it is given up.
+        prompt_fields (list): Fields of each article sent to Gemini, all of them when None.
+        keep_failed (bool): Yield articles still unlabeled after max_attempts, marked with
+            "enrichment_failed", instead of dropping them; labeled articles are then marked too.
+
+    Yields:
+        dict: An article merged with its classification.
+    """
+    chunks = iter_token_budget_chunks(news_data, prompt_fields=prompt_fields)
+    retry_queue = deque()
+    attempts = defaultdict(int)
+
+    def next_chunk():
+        if retry_queue:
+            retries = list(retry_queue)
+            retry_queue.clear()
+            chunk = next(iter_token_budget_chunks(retries, prompt_fields=prompt_fields))
+            retry_queue.extend(retries[len(chunk):])
+            return chunk
+        return next(chunks, None)
+
+    def merged(future, chunk):
+        try:
+            labels = {item["id"]: item for item in future.result()}
+        except Exception as e:
+            print(f"Error enriching news chunk: {e}")
+            labels = {}
+        for news in chunk:
+            if news["id"] in labels:
+                attempts.pop(news["id"], None)
+                yield {**news, **labels[news["id"]], **({"enrichment_failed": False} if keep_failed else {})}
+            elif attempts[news["id"]] < max_attempts:
+                enrichment_stats.add(retried=1)
+                retry_queue.append(news)
+            else:
+                attempts.pop(news["id"], None)
+                enrichment_stats.add(failed=1)
+                print(f"Giving up enriching article {news['id']} after {max_attempts} attempts")
+                if keep_failed:
+                    yield {**news, "enrichment_failed": True}
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending = {}
+        while True:
+            while len(pending) < max_in_flight:
+                chunk = next_chunk()
+                if not chunk:
+                    break
+                for news in chunk:
+                    attempts[news["id"]] += 1
+                # A chunk holding retried articles asks the model again rather than the response cache
+                use_cache = all(attempts[news["id"]] == 1 for news in chunk)
+                pending[executor.submit(enrich_chunk, chunk, prompt_fields, use_cache)] = chunk
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from merged(future, pending.pop(future))
+
+    print(f"Gemini enrichment: {enrichment_stats.summary()}")
+
+# Function to look up the labels of documents enriched in an earlier run
+def indexed_labels(es, index_name, ids):
+    labels = {}
+    if not ids or not es.indices.exists(index=index_name):
+        return labels
+    for batch in iter_batches(ids, 500):
+        response = es.mget(index=index_name, ids=batch, source=LABEL_FIELDS)
+        for document in response["docs"]:
+            source = document.get("_source") or {}
+            if document.get("found") and source.get("topic_classification"):
+                labels[document["_id"]] = {field: source.get(field) for field in LABEL_FIELDS}
+    return labels
+
+# Function to enrich only the records whose document has no labels yet
+def iter_labeled(records, es=None, index_name=None, prompt_fields=None, max_in_flight=MAX_IN_FLIGHT,
+                 batch_size=LABELED_LOOKUP_BATCH_SIZE):
+    """
+    Label a stream of records, reusing the labels of documents that are already indexed.
+
+    Records are looked up by id in batches; those already labeled skip Gemini and are yielded
+    right away with their stored labels. The others are handed to an enrichment thread, and
+    its results are merged into the output after every batch, so a re-crawl of indexed records
+    streams through without waiting for Gemini.
+
+    Records Gemini could not label are still yielded, without label fields and with
+    "enrichment_failed" set, so they are indexed and labeled by a later run.
+
+    Args:
+        records (iterable): Records with an "id" field.
+        es (Elasticsearch): Client used to look up indexed labels, optional.
+        index_name (str): The index the records are ingested into.
+        prompt_fields (list): Fields of each record sent to Gemini, all of them when None.
+        max_in_flight (int): Maximum number of concurrent Gemini requests.
+        batch_size (int): Records looked up per mget.
+
+    Yields:
+        dict: Every record, labeled or marked with "enrichment_failed".
+    """
+    # Bounded, so the crawl is held back when Gemini falls behind
+    to_enrich = queue.Queue(maxsize=batch_size)
+    enriched = queue.Queue()
+    done = object()
+    state = {"reused": 0, "finished": False}
+
+    def unlabeled():
+        while True:
+            record = to_enrich.get()
+            if record is done:
+                return
+            yield record
+
+    def enrich():
+        try:
+            for record in iter_enriched_news(unlabeled(), max_in_flight, prompt_fields=prompt_fields, keep_failed=True):
+                enriched.put(record)
+        except Exception as e:
+            print(f"Error enriching records, indexing the rest without labels: {e}")
+            # Keep consuming so the lookup loop is never blocked on a full queue
+            for record in unlabeled():
+                enriched.put({**record, "enrichment_failed": True})
+        finally:
+            enriched.put(done)
+
+    def ready(block=False):
+        while not state["finished"]:
+            try:
+                record = enriched.get(block=block)
+            except queue.Empty:
+                return
+            if record is done:
+                state["finished"] = True
+            else:
+                yield record
+
+    worker = threading.Thread(target=enrich, daemon=True)
+    worker.start()
+    try:
+        for batch in iter_batches(records, batch_size):
+            labels = indexed_labels(es, index_name, [str(record["id"]) for record in batch]) if es is not None else {}
+            for record in batch:
+                if str(record["id"]) in labels:
+                    state["reused"] += 1
+                    yield {**record, **labels[str(record["id"])]}
+                else:
+                    to_enrich.put(record)
+            yield from ready()
+    finally:
+        to_enrich.put(done)
+
+    yield from ready(block=True)
+    worker.join()
+
+    print(f"Reused the labels of {state['reused']} already indexed records.")
+
+# Function to embed and ingest a stream of labeled records
+def ingest_records(records, index_name, embedding_fields, es: Elasticsearch = None, upsert=False, prepare=None,
+                   on_indexed=None, embed=True, relax_refresh=True):
+    """
+    Embed records and stream them into Elasticsearch under their "id".
+
+    Args:
+        records (iterable): Labeled records, typically a generator.
+        index_name (str): The Elasticsearch index name.
+        embedding_fields (list): Text fields embedded into the kNN vector.
+        es (Elasticsearch): Client to ingest with, defaults to the shared client.
+        upsert (bool): Update documents in place (doc_as_upsert) instead of replacing them, so fields
+            not in the record, such as labels, are kept.
+        prepare (callable): Applied to each record before it is sent, optional.
+        on_indexed (callable): Called with the bulk action of each indexed record, optional.
+        embed (bool): Embed the records; False when they already carry their vector.
+        relax_refresh (bool): Relax the index refresh interval during the load.
+
+    Returns:
+        dict: The stream_ingest statistics.
+    """
+    es = es or get_elasticsearch()
+    ensure_vector_index(es, index_name)
+
+    def generate_bulk_data(records):
+        # Embed records so they are kNN-searchable, reusing vectors of unchanged documents
+        if embed:
+            records = iter_with_embeddings(records, embedding_fields, es=es, index_name=index_name)
+        for record in records:
+            if prepare is not None:
+                record = prepare(record)
+            if upsert:
+                yield {"_op_type": "update", "_index": index_name, "_id": record["id"], "doc": record, "doc_as_upsert": True}
+            else:
+                yield {"_index": index_name, "_id": record["id"], "_source": record}
+
+    stats = stream_ingest(es, generate_bulk_data(records), index_name, on_indexed=on_indexed, relax_refresh=relax_refresh)
+    print(f"Ingested {stats['indexed']} documents to {index_name} in {stats['seconds']:.1f}s, "
+          f"{stats['failed']} failed (see {stats['dead_letter_path']}).")
+    return stats
+
+# Function to run enrichment and ingest as one streaming stage
+def enrichment_stage(records, index_name, embedding_fields, es: Elasticsearch = None, upsert=False,
+                     prompt_fields=None, prepare=None, on_indexed=None, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Label, embed and ingest a stream of records while it is being produced by a crawler.
+
+    Gemini requests run on a thread pool as soon as a chunk is full, so classification overlaps
+    with the crawl; the crawl is only held back when max_in_flight requests are pending.
+
+    Args:
+        records (iterable): Crawled records with an "id" field, typically a generator.
+        index_name (str): The Elasticsearch index name.
+        embedding_fields (list): Text fields embedded into the kNN vector.
+        es (Elasticsearch): Client to ingest with, defaults to the shared client.
+        upsert (bool): Update documents in place instead of replacing them.
+        prompt_fields (list): Fields of each record sent to Gemini, all of them when None.
+        prepare (callable): Applied to each record before it is sent, optional.
+        on_indexed (callable): Called with the bulk action of each indexed record, optional.
+        max_in_flight (int): Maximum number of concurrent Gemini requests.
+
+    Returns:
+        dict: The stream_ingest statistics.
+    """
+    es = es or get_elasticsearch()
+    labeled = iter_labeled(records, es=es, index_name=index_name, prompt_fields=prompt_fields, max_in_flight=max_in_flight)
+    return ingest_records(labeled, index_name, embedding_fields, es=es, upsert=upsert, prepare=prepare, on_indexed=on_indexed)
@@ -0,0 +1,79 @@
+import os
+import asyncio
+from collections import namedtuple
+import httpx
+from dotenv import load_dotenv
+from utils.metrics import timed, CRAWLER_FETCH_SECONDS
+
+load_dotenv()
+
+HTTP_FETCH_CONCURRENCY = int(os.getenv("HTTP_FETCH_CONCURRENCY", 32))
+HTTP_FETCH_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", 15))
+USER_AGENT = os.getenv(
+    "CRAWLER_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+)
+
+# Result of one fetch; html is None when the page could not be fetched or was not modified (status 304)
+Page = namedtuple("Page", ["url", "html", "status", "etag", "last_modified"])
+
+def conditional_headers(validators):
+    """
+    Build the If-None-Match / If-Modified-Since headers of a conditional request.
+
+    Args:
+        validators (dict): "etag" and "last_modified" of the previous response, either may be None.
+
+    Returns:
+        dict: The request headers.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+async def _fetch(client, semaphore, url, validators=None):
+    async with semaphore:
+        try:
+            with timed(CRAWLER_FETCH_SECONDS, method="http"):
+                response = await client.get(url, headers=conditional_headers(validators))
+            etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+            if response.status_code == 304:
+                return Page(url, None, 304, etag, last_modified)
+            if response.status_code == 200 and "html" in response.headers.get("content-type", "html"):
+                return Page(url, response.text, 200, etag, last_modified)
+            return Page(url, None, response.status_code, None, None)
+        except Exception as e:
+            # Invalid URLs, unsupported schemes and undecodable bodies fall back to the browser
+            # instead of failing the whole batch
+            print(f"Error fetching {url}: {e}")
+        return Page(url, None, None, None, None)
+
+async def fetch_all(urls, concurrency=HTTP_FETCH_CONCURRENCY, validators=None):
+    """
+    Fetch pages concurrently with a shared async HTTP client.
+
+    Args:
+        urls (list): The pages to fetch.
+        concurrency (int): Maximum number of requests in flight.
+        validators (dict): URL to the validators of its previous response, sent as a conditional request.
+
+    Returns:
+        list: Page tuples in input order.
+    """
+    validators = validators or {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT}, timeout=HTTP_FETCH_TIMEOUT, limits=limits, follow_redirects=True
+    ) as client:
+        return await asyncio.gather(*(_fetch(client, semaphore, url, validators.get(url)) for url in urls))
+
+def fetch_static_pages(urls, concurrency=HTTP_FETCH_CONCURRENCY, validators=None):
+    """
+    Blocking wrapper around fetch_all for the synchronous crawler pipeline.
+    """
+    return asyncio.run(fetch_all(urls, concurrency, validators))
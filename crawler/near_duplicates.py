@@ -0,0 +1,158 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NEAR_DUP_PATH = os.getenv("NEAR_DUP_PATH", ".cache/near_duplicates.sqlite3")
+# Estimated Jaccard similarity of word shingles above which two articles are duplicates
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", 0.8))
+NEAR_DUP_SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", 5))
+# NUM_PERM = BANDS * rows per band; 16 bands of 8 rows surface pairs from about 0.7 similarity
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", 128))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", 16))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def shingles(text: str, size: int = NEAR_DUP_SHINGLE_SIZE) -> set:
+    """
+    Word n-grams of the lowercased text, so boilerplate punctuation and spacing do not matter.
+    """
+    words = _WORD.findall((text or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class NearDuplicateIndex:
+    def __init__(self, path: str = NEAR_DUP_PATH, threshold: float = NEAR_DUP_THRESHOLD,
+                 num_perm: int = NEAR_DUP_NUM_PERM, bands: int = NEAR_DUP_BANDS, seed: int = 1):
+        """
+        Persistent MinHash-LSH index clustering near-identical articles.
+
+        Each article gets a MinHash signature of its word shingles, cut into bands that are
+        stored as bucket keys. Candidates are the articles sharing at least one bucket, so a
+        lookup touches a handful of rows instead of the whole corpus; candidates are then
+        confirmed on the similarity estimated from the full signatures.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            threshold (float): Minimum estimated similarity of a duplicate.
+            num_perm (int): Number of hash permutations of a signature.
+            bands (int): Number of LSH bands, must divide num_perm.
+            seed (int): Seed of the permutations; changing it invalidates a stored index.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures (id TEXT PRIMARY KEY, signature BLOB NOT NULL, representative TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, bucket TEXT NOT NULL, id TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_id ON bands (id)")
+        self._conn.commit()
+
+    def signature(self, text: str):
+        """
+        MinHash signature of a text.
+
+        Returns:
+            np.ndarray: num_perm uint32 values, or None when the text has no words.
+        """
+        grams = shingles(text)
+        if not grams:
+            return None
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") for gram in grams],
+            dtype=np.uint64,
+        )
+        # Universal hashing (a * x + b) mod p of every shingle under every permutation
+        permuted = np.bitwise_and((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _buckets(self, signature: np.ndarray) -> list:
+        return [
+            (band, hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest())
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """
+        Jaccard similarity estimated from two signatures.
+        """
+        return float(np.mean(first == second))
+
+    def assign(self, doc_id: str, text: str) -> str:
+        """
+        Add an article to the index and return the representative of its cluster.
+
+        Args:
+            doc_id (str): Id of the article.
+            text (str): Text of the article.
+
+        Returns:
+            str: Id of the most similar indexed article's representative, or doc_id itself when
+            the article has no near-duplicate (it then represents a new cluster).
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return doc_id
+        buckets = self._buckets(signature)
+
+        with self._lock:
+            row = self._conn.execute("SELECT signature, representative FROM signatures WHERE id = ?", (doc_id,)).fetchone()
+            if row is not None:
+                if np.array_equal(np.frombuffer(row[0], dtype=np.uint32), signature):
+                    return row[1]
+                # The article changed since it was indexed, place it again
+                self._conn.execute("DELETE FROM bands WHERE id = ?", (doc_id,))
+
+            candidates = self._conn.execute(
+                "SELECT DISTINCT s.id, s.signature, s.representative FROM bands b JOIN signatures s ON s.id = b.id "
+                f"WHERE ({' OR '.join(['(b.band = ? AND b.bucket = ?)'] * len(buckets))}) AND b.id != ?",
+                [value for bucket in buckets for value in bucket] + [doc_id],
+            ).fetchall()
+
+            representative, best = doc_id, self.threshold
+            for _, candidate, candidate_representative in candidates:
+                score = self.similarity(signature, np.frombuffer(candidate, dtype=np.uint32))
+                if score >= best:
+                    representative, best = candidate_representative, score
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO signatures (id, signature, representative) VALUES (?, ?, ?)",
+                (doc_id, signature.tobytes(), representative),
+            )
+            self._conn.executemany(
+                "INSERT INTO bands (band, bucket, id) VALUES (?, ?, ?)",
+                [(band, bucket, doc_id) for band, bucket in buckets],
+            )
+            self._conn.commit()
+            return representative
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
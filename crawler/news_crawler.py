@@ -1,27 +1,22 @@
 import os
-import re
-import json
 import time
 import uuid
-import pandas as pd
 from tqdm import tqdm
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service as ChromeService
-from elasticsearch import Elasticsearch, helpers
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from newspaper import Article
-from utils.gemini import GeminiConnector
-
-# Initialize GeminiConnector
-gemini_connector = GeminiConnector()
-
-# Selenium WebDriver setup
-chrome_service = ChromeService(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=chrome_service)
+from crawler.browser_pool import BrowserPool
+from crawler.http_fetcher import fetch_static_pages
+from crawler.url_discovery import discover_urls
+from crawler.crawl_state import CrawlState, content_hash
+from crawler.near_duplicates import NearDuplicateIndex
+from crawler.enrichment import LABEL_FIELDS, MAX_IN_FLIGHT, iter_enriched_news, indexed_labels, ingest_records
+from utils.elasticsearch_client import get_elasticsearch
+from utils.bulk_ingest import iter_batches
+
+# Headless browsers, started on first use
+browser_pool = BrowserPool()
 
 # Constants
 KEYWORDS = [
@@ -34,34 +29,37 @@ KEYWORDS = [
     'pilkada jakarta', 'upah jakarta'
 ]
 
-RSP = []  # List to store URLs
+INDEX_NAME = "news_jakarta"
+
+# Text fields embedded into the kNN vector of each article
+EMBEDDING_FIELDS = ["title", "contextual_content", "content"]
 
-# Function to scrape URLs using Selenium
-def scrape_urls():
+# Article fetching: pages fetched over HTTP per batch, and the text length below which the
+# page is assumed to need JavaScript and is loaded in a browser instead
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", 50))
+MIN_ARTICLE_CHARS = int(os.getenv("MIN_ARTICLE_CHARS", 400))
+
+# Function to discover article URLs
+def scrape_urls(keywords=KEYWORDS):
     """
-    Scrape news article URLs from DuckDuckGo based on defined keywords.
+    Discover news article URLs on DuckDuckGo, searching the keywords concurrently on the browser pool.
+
+    Returns:
+        generator: Article URLs, one per normalized URL, as they are found.
     """
-    global RSP
-    for keyword in KEYWORDS:
-        print(f"Scraping for keyword: {keyword}")
-        search_url = f"https://duckduckgo.com/?q={'+'.join(keyword.split())}&ia=news"
-        driver.get(search_url)
-
-        try:
-            WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'a.result--more'))
-            )
-        except Exception as e:
-            print(f"Error fetching results for {keyword}: {e}")
-
-        links = set(re.findall(r'href=["\'](https?://[^"\']+)', driver.page_source))
-        links = [link for link in links if 'duckduckgo' not in link]
-        RSP.extend(links)
+    return discover_urls(keywords, browser_pool)
+
+# Function to parse an article from its HTML
+def parse_article(url, html):
+    article = Article(url)
+    article.set_html(html)
+    article.parse()
+    return article
 
 # Function to retrieve and parse an article
 def get_article(url):
     """
-    Retrieve and parse a web article.
+    Retrieve and parse a web article in a headless browser from the pool.
 
     Args:
         url (str): The URL of the article.
@@ -70,162 +68,220 @@ def get_article(url):
         Article: Parsed article object, or None if fetching fails.
     """
     try:
-        driver.get(url)
-        time.sleep(3)
-        article = Article(url)
-        article.set_html(driver.page_source)
-        article.parse()
-        return article
+        return parse_article(url, browser_pool.get_html(url))
     except Exception as e:
         print(f"Error fetching article: {e}")
         return None
 
-# Function to generate bulk prompts for Gemini
-def generate_bulk_prompt(news_list):
-    prompt = "Given a list of twitter post, predict the following categories for each item: topic classification, urgency level, sentiment, target audience, affected region and Capture contextual or descriptive terms that support the main theme. Output should be in JSON format with each article's uuid included. \n\nGuidelines:\n\n"
-    prompt += """
-1. Topic Classification: Choose one of the following categories based on the main issue addressed:
-   - Social and Economy
-   - Infrastructure and Transportation
-   - Public Health
-   - Environment and Disaster
-   - Safety and Crime
-   - Government and Public Policy
-   - Technology and Innovation
-   - City Planning and Housing
-   - Education and Culture
-   - Tourism and Entertainment
-   - Ecology and Green Spaces
-
-2. Urgency Level: Provide a score from 0 to 100, where 100 indicates the highest urgency. This score represents how quickly the issue needs to be addressed to minimize its impact.
-
-3. Sentiment: Classify sentiment as one of the following:
-   - Positive
-   - Neutral
-   - Negative
-
-4. Target Audience: Identify the primary groups affected by or interested in the news. Use the following categories:
-   - Traditional Market Vendors
-   - Business Owners
-   - Local Government
-   - General Public
-   - Healthcare Workers
-   - Environmental Agencies
-   - Public Transport Users
-   - Tourists
-   - Students and Educators
-   - Technology Enthusiasts
-   - Safety and Security Agencies
-
-5. Affected Region: Classify the region affected by the news as one of the following:
-   - DKI Jakarta (for issues that generally affect all of Jakarta)
-   - South Jakarta
-   - North Jakarta
-   - East Jakarta
-   - West Jakarta
-   - Central Jakarta
-6. Contextual Keywords: Words and phrases that represent key themes, brands, products, individuals, locations, or technical specifications
-
-Return the output in JSON format
-Output:
-[{
-"id":<string>,
-"topic_classification":<string>,
-"urgency_level":<0-100>,
-"sentiment":<string>,
-"target_audience":<list of target>,
-"affected_region":<string>,
-"contextual_content": "This is a brief summary of the content related to the topic, capturing the main ideas and context. using indonesia language",
-"contextual_keywords":<Top 5 list of contextual keyword or phrases in Indonesia Language>
-}]
-
-Process each news article separately using its uuid as an identifier.
-
-News Articles:
-"""
-    prompt += f"""{news_list}"""
-    return prompt
-
-
-# Function to chunk a list
-def chunk_list(data, chunk_size):
-    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
-
-# Function to enrich news using Gemini
-def enrich_news_with_gemini(news_chunks):
-    enriched_data = []
-    for chunk in tqdm(news_chunks, desc="Enriching news with Gemini"):
-        prompt = generate_bulk_prompt(chunk)
-        gemini_response = gemini_connector.generate_content(prompt)
-
-        # Extract JSON from response
-        extracted_json = re.findall(r'\[.*?\]', gemini_response, flags=re.I | re.S)
-        if extracted_json:
-            json_data = json.loads(extracted_json[0])
-
-            # Clean contextual content
-            for item in json_data:
-                item["contextual_content"] = item["contextual_content"].replace('"', '')
-            enriched_data.extend(json_data)
-    return enriched_data
+# Function to enrich a stream of articles once per near-duplicate cluster
+def iter_enriched_unique_news(news_data, dedup_index, es=None, index_name=INDEX_NAME, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Enrich only one representative article per cluster of near-duplicates and copy its labels
+    to the other members, which get a duplicate_of field pointing to it.
 
-# Function to ingest data into Elasticsearch
-def ingest_to_elasticsearch(data, index_name="news_jakarta"):
-    es = Elasticsearch("http://localhost:9200")
+    Duplicates are held back until their representative is enriched. Those whose representative
+    was enriched in an earlier run get its labels from Elasticsearch at the end of the stream,
+    and those whose representative has no labels anywhere are enriched themselves.
 
-    def generate_bulk_data(data):
-        for record in data:
-            yield {
-                "_index": index_name,
-                "_id": record["id"],
-                "_source": record
-            }
+    Args:
+        news_data (iterable): Articles to enrich.
+        dedup_index (NearDuplicateIndex): Persistent near-duplicate index.
+        es (Elasticsearch): Client used to fetch labels of earlier representatives, optional.
+        index_name (str): The index earlier representatives live in.
+        max_in_flight (int): Maximum number of concurrent Gemini requests.
+
+    Yields:
+        dict: Enriched articles, representatives first.
+    """
+    waiting = defaultdict(list)  # Representative id to the duplicates waiting for its labels
+    labels = {}  # Labels of the representatives enriched in this run
+    ready = deque()  # Duplicates whose representative is already labeled
+    stats = {"representatives": 0, "duplicates": 0}
+
+    def representatives():
+        for news in news_data:
+            representative = dedup_index.assign(news["id"], news["content"])
+            if representative == news["id"]:
+                stats["representatives"] += 1
+                yield news
+            else:
+                stats["duplicates"] += 1
+                if representative in labels:
+                    ready.append((news, representative))
+                else:
+                    waiting[representative].append(news)
+
+    def copy_labels(news, representative, representative_labels):
+        return {**news, **representative_labels, "duplicate_of": representative}
+
+    for enriched in iter_enriched_news(representatives(), max_in_flight):
+        labels[enriched["id"]] = {field: enriched.get(field) for field in LABEL_FIELDS}
+        yield enriched
+        for news in waiting.pop(enriched["id"], []):
+            yield copy_labels(news, enriched["id"], labels[enriched["id"]])
+        while ready:
+            news, representative = ready.popleft()
+            yield copy_labels(news, representative, labels[representative])
+    while ready:
+        news, representative = ready.popleft()
+        yield copy_labels(news, representative, labels[representative])
+
+    earlier = indexed_labels(es, index_name, list(waiting)) if es is not None else {}
+    unlabeled = []
+    for representative, duplicates in waiting.items():
+        for news in duplicates:
+            if representative in earlier:
+                yield copy_labels(news, representative, earlier[representative])
+            else:
+                unlabeled.append(news)
+    yield from iter_enriched_news(unlabeled, max_in_flight)
+
+    print(f"Near-duplicates: {stats['duplicates']} of {stats['representatives'] + stats['duplicates']} articles "
+          f"reused labels, {len(unlabeled)} of them enriched on their own.")
+
+# Function to format an article for Elasticsearch
+def prepare_article(record):
+    # Ensure "publish_at" is properly formatted
+    record["publish_at"] = datetime.fromisoformat(record["publish_at"])
+    return record
 
+# Function to ingest data into Elasticsearch
+def ingest_to_elasticsearch(data, index_name=INDEX_NAME, on_indexed=None):
+    """
+    Stream articles into Elasticsearch as they are produced.
+
+    Args:
+        data (iterable): Enriched articles, typically a generator.
+        index_name (str): The Elasticsearch index name.
+        on_indexed (callable): Called with the bulk action of each indexed article, optional.
+    """
     try:
-        helpers.bulk(es, generate_bulk_data(data))
-        print("Data successfully ingested to Elasticsearch.")
+        ingest_records(data, index_name, EMBEDDING_FIELDS, prepare=prepare_article, on_indexed=on_indexed)
     except Exception as e:
         print(f"Error ingesting data to Elasticsearch: {e}")
 
-# Main execution flow
-def main():
-    # Step 1: Scrape URLs
-    scrape_urls()
-
-    # Step 2: Process articles into data
-    news_data = []
-    for url in tqdm(set(RSP), desc="Processing articles"):
-        article = get_article(url)
-        if article:
-            article.nlp()
-            news_data.append({
-                'id': str(uuid.uuid5(uuid.NAMESPACE_DNS, url)),
-                'title': article.title,
-                'url': url,
-                'description': article.summary,
-                'content': article.text,
-                'publish_at': str(article.publish_date or datetime.now()),
-                'image_url': article.top_image
-            })
-
-    # Step 3: Enrich data with Gemini
-    news_chunks = chunk_list(news_data, 20)
-    enriched_news = enrich_news_with_gemini(news_chunks)
-
-    # Step 4: Ingest data to Elasticsearch
-    original_data = pd.DataFrame(news_data)
-    enriched_df = pd.DataFrame(enriched_news)
-
-    df_ingest = original_data.merge(enriched_df, on="id", how="inner").to_dict(orient="records")
+# Function to derive the document id of an article
+def article_id(url):
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, url))
+
+# Function to turn a parsed article into a news record
+def article_record(url, article):
+    article.nlp()
+    return {
+        'id': article_id(url),
+        'title': article.title,
+        'url': url,
+        'description': article.summary,
+        'content': article.text,
+        'publish_at': str(article.publish_date or datetime.now()),
+        'image_url': article.top_image
+    }
+
+# Function to fetch and parse articles
+def iter_articles(urls, crawl_state=None):
+    """
+    Fetch and parse articles, trying a plain HTTP request first and the browser pool only
+    for pages whose article text needs JavaScript to render.
 
-    # Ensure "publish_at" is properly formatted
-    for news in df_ingest:
-        news["publish_at"] = datetime.fromisoformat(news["publish_at"])
+    With a crawl state, known URLs are requested conditionally, and articles that were not
+    modified or whose text is unchanged since they were enriched are skipped. The others are
+    staged in the crawl state, to be committed once indexed.
+
+    Args:
+        urls (iterable): Article URLs.
+        crawl_state (CrawlState): Persistent crawl state, optional.
+
+    Yields:
+        dict: News records of new or changed articles, as soon as each batch is fetched.
+    """
+    start = time.perf_counter()
+    fetched = {"http": 0, "browser": 0, "unchanged": 0}
+
+    def changed(url, article, page=None):
+        if crawl_state is None:
+            return True
+        text_hash = content_hash(article.text)
+        if crawl_state.is_unchanged(url, text_hash):
+            crawl_state.touch(url)
+            fetched["unchanged"] += 1
+            return False
+        crawl_state.stage(article_id(url), url, text_hash, page.etag if page else None, page.last_modified if page else None)
+        return True
+
+    try:
+        for batch in iter_batches(tqdm(urls, desc="Processing articles"), FETCH_BATCH_SIZE):
+            validators = crawl_state.validators(batch) if crawl_state is not None else None
+            browser_urls = []
+            for page in fetch_static_pages(batch, validators=validators):
+                if page.status == 304:
+                    crawl_state.touch(page.url)
+                    fetched["unchanged"] += 1
+                    continue
+                try:
+                    article = parse_article(page.url, page.html) if page.html else None
+                except Exception as e:
+                    print(f"Error parsing article: {e}")
+                    article = None
+
+                if article is not None and len(article.text) >= MIN_ARTICLE_CHARS:
+                    fetched["http"] += 1
+                    if changed(page.url, article, page):
+                        yield article_record(page.url, article)
+                else:
+                    browser_urls.append(page.url)
+
+            with ThreadPoolExecutor(max_workers=browser_pool.size) as executor:
+                for url, article in zip(browser_urls, executor.map(get_article, browser_urls)):
+                    if article:
+                        fetched["browser"] += 1
+                        if changed(url, article):
+                            yield article_record(url, article)
+    finally:
+        minutes = (time.perf_counter() - start) / 60
+        total = fetched["http"] + fetched["browser"]
+        print(f"Fetched {total} articles ({fetched['http']} over HTTP, {fetched['browser']} in a browser), "
+              f"{total / minutes if minutes else 0:.1f} articles/minute; "
+              f"{fetched['unchanged']} unchanged since they were enriched.")
+
+# Function to select the URLs to fetch while discovery is still running
+def iter_urls_to_fetch(urls, crawl_state, es=None):
+    """
+    Filter discovered URLs through the crawl state one fetch batch at a time, so fetching
+    starts as soon as the first batch is discovered instead of after every keyword search.
 
-    ingest_to_elasticsearch(df_ingest)
+    Args:
+        urls (iterable): Discovered URLs, typically the scrape_urls generator.
+        crawl_state (CrawlState): State deciding which URLs are due.
+        es (Elasticsearch): Client used to find URLs indexed before the state existed, optional.
+
+    Yields:
+        str: URLs to fetch.
+    """
+    for batch in iter_batches(urls, FETCH_BATCH_SIZE):
+        yield from crawl_state.urls_to_fetch(batch, es=es, index_name=INDEX_NAME, id_for=article_id)
+
+# Main execution flow
+def main():
+    es = get_elasticsearch()
+    crawl_state = CrawlState()
+    dedup_index = NearDuplicateIndex()
+    try:
+        # Steps 1-2: Discover URLs, skipping those already indexed and recently checked
+        urls = iter_urls_to_fetch(scrape_urls(), crawl_state, es=es)
+
+        # Steps 3-5: Fetch, enrich one article per near-duplicate cluster, embed and ingest
+        # new or changed articles as a streaming pipeline
+        news_data = iter_articles(urls, crawl_state)
+        enriched_news = iter_enriched_unique_news(news_data, dedup_index, es=es)
+        ingest_to_elasticsearch(enriched_news, on_indexed=lambda action: crawl_state.commit(action["_id"]))
+    finally:
+        crawl_state.close()
+        dedup_index.close()
 
     print("Process completed.")
 
 if __name__ == "__main__":
-    main()
-    driver.quit()
+    try:
+        main()
+    finally:
+        browser_pool.close()
@@ -0,0 +1,393 @@
+"""
+Scheduled crawl orchestrator.
+
+The crawl runs as stages (discover, fetch, enrich, embed, ingest) connected by durable queues
+in one SQLite file (see crawler.work_queue). Each stage runs in its own worker processes, so
+a slow stage is scaled on its own and a crash only loses the batch in progress: its jobs are
+leased, not removed, and are delivered again once the lease expires. A scheduler enqueues a
+crawl of every keyword set (and of the Twitter timeline) at its own interval.
+
+Gemini quotas are enforced per process, so more than one enrich worker needs proportionally
+lower GEMINI_REQUESTS_PER_MINUTE / GEMINI_TOKENS_PER_MINUTE settings.
+
+With ORCHESTRATOR_METRICS_PORT set, the metrics of all workers are served on that port; this
+needs PROMETHEUS_MULTIPROC_DIR to point to an empty directory before the orchestrator starts.
+
+Usage (from the repository root):
+    python -m crawler.orchestrator                 # run the scheduler and all stages
+    python -m crawler.orchestrator --once          # crawl every keyword set once, exit when done
+    python -m crawler.orchestrator --stages fetch,enrich --no-schedule
+"""
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+from collections import namedtuple, defaultdict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from crawler import news_crawler, twitter_crawler
+from crawler.work_queue import WorkQueue, WORK_QUEUE_PATH
+from crawler.crawl_state import CrawlState
+from crawler.near_duplicates import NearDuplicateIndex
+from crawler.enrichment import iter_labeled, ingest_records
+from crawler.browser_pool import BROWSER_POOL_SIZE
+from utils.elasticsearch_client import get_elasticsearch
+from utils.vector_index import iter_with_embeddings
+from utils.bulk_ingest import iter_batches
+from utils.metrics import timed, start_metrics_server, mark_process_dead, ORCHESTRATOR_BATCH_SECONDS
+
+load_dotenv()
+
+# Optional JSON file with the schedule, a list of
+# {"name": ..., "pipeline": "news" | "tweets", "keywords": [...], "interval_minutes": ...}
+CRAWL_SCHEDULE_PATH = os.getenv("CRAWL_SCHEDULE_PATH")
+NEWS_CRAWL_INTERVAL_MINUTES = float(os.getenv("NEWS_CRAWL_INTERVAL_MINUTES", 60))
+TWEET_CRAWL_INTERVAL_MINUTES = float(os.getenv("TWEET_CRAWL_INTERVAL_MINUTES", 30))
+
+ORCHESTRATOR_TICK_SECONDS = float(os.getenv("ORCHESTRATOR_TICK_SECONDS", 30))
+ORCHESTRATOR_POLL_SECONDS = float(os.getenv("ORCHESTRATOR_POLL_SECONDS", 2))
+# Seconds a leased batch stays invisible to other workers without a heartbeat
+ORCHESTRATOR_LEASE_SECONDS = float(os.getenv("ORCHESTRATOR_LEASE_SECONDS", 120))
+ORCHESTRATOR_SHUTDOWN_SECONDS = float(os.getenv("ORCHESTRATOR_SHUTDOWN_SECONDS", 30))
+ORCHESTRATOR_METRICS_PORT = int(os.getenv("ORCHESTRATOR_METRICS_PORT", 0))
+# Records handed to the next queue at once
+HANDOFF_BATCH_SIZE = int(os.getenv("ORCHESTRATOR_HANDOFF_BATCH_SIZE", 20))
+
+Stage = namedtuple("Stage", ["queue", "workers", "batch_size"])
+
+STAGES = {
+    # Keywords of a worker are searched concurrently on its browser pool
+    "discover": Stage("discover", int(os.getenv("ORCHESTRATOR_DISCOVER_WORKERS", 1)), BROWSER_POOL_SIZE),
+    "fetch": Stage("fetch", int(os.getenv("ORCHESTRATOR_FETCH_WORKERS", 2)), news_crawler.FETCH_BATCH_SIZE),
+    "enrich": Stage("enrich", int(os.getenv("ORCHESTRATOR_ENRICH_WORKERS", 1)), int(os.getenv("ORCHESTRATOR_ENRICH_BATCH_SIZE", 200))),
+    "embed": Stage("embed", int(os.getenv("ORCHESTRATOR_EMBED_WORKERS", 1)), int(os.getenv("ORCHESTRATOR_EMBED_BATCH_SIZE", 100))),
+    "ingest": Stage("ingest", int(os.getenv("ORCHESTRATOR_INGEST_WORKERS", 1)), int(os.getenv("ORCHESTRATOR_INGEST_BATCH_SIZE", 500))),
+}
+
+# Where the records of each pipeline are ingested
+PIPELINES = {
+    "news": {
+        "index_name": news_crawler.INDEX_NAME, "embedding_fields": news_crawler.EMBEDDING_FIELDS,
+        "upsert": False, "prepare": news_crawler.prepare_article,
+    },
+    "tweets": {
+        "index_name": twitter_crawler.INDEX_NAME, "embedding_fields": twitter_crawler.EMBEDDING_FIELDS,
+        "upsert": True, "prepare": None,
+    },
+}
+
+def load_schedule(path: str = CRAWL_SCHEDULE_PATH) -> list:
+    """
+    Load the crawl schedule, defaulting to all news keywords as one set plus the Twitter timeline.
+
+    Args:
+        path (str): Path of a JSON schedule file, optional.
+
+    Returns:
+        list: Schedule entries with name, pipeline, keywords and interval_minutes.
+    """
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return [
+        {"name": "news-jakarta", "pipeline": "news", "keywords": news_crawler.KEYWORDS,
+         "interval_minutes": NEWS_CRAWL_INTERVAL_MINUTES},
+        {"name": "tweets-timeline", "pipeline": "tweets", "interval_minutes": TWEET_CRAWL_INTERVAL_MINUTES},
+    ]
+
+def schedule_due(work_queue: WorkQueue, schedule: list, force: bool = False) -> int:
+    """
+    Enqueue the crawls that are due. A news crawl is one discovery job per keyword, so a crash
+    only repeats the keywords in progress; keywords of an earlier run still pending are not added twice.
+
+    Args:
+        work_queue (WorkQueue): The orchestrator queues.
+        schedule (list): Schedule entries, see load_schedule.
+        force (bool): Enqueue every entry, due or not.
+
+    Returns:
+        int: Number of discovery jobs added or updated.
+    """
+    now = time.time()
+    added = 0
+    for entry in schedule:
+        if not force and now - work_queue.last_run(entry["name"]) < entry["interval_minutes"] * 60:
+            continue
+        if entry["pipeline"] == "tweets":
+            jobs = [(entry["name"], {"pipeline": "tweets", "schedule": entry["name"]})]
+        else:
+            jobs = [
+                (f"{entry['name']}:{keyword}", {"pipeline": entry["pipeline"], "schedule": entry["name"], "keyword": keyword})
+                for keyword in entry["keywords"]
+            ]
+        added += work_queue.put_many("discover", jobs)
+        work_queue.set_last_run(entry["name"], now)
+        print(f"Scheduled {entry['name']}: {len(jobs)} discovery jobs.")
+    return added
+
+class StageWorker:
+    def __init__(self, path: str = WORK_QUEUE_PATH):
+        """
+        Resources of one worker process, opened on first use.
+
+        Args:
+            path (str): Path of the work queue database.
+        """
+        self.path = path
+        self.queue = WorkQueue(path)
+        self._es = None
+        self._crawl_state = None
+        self._dedup_index = None
+
+    @property
+    def es(self):
+        if self._es is None:
+            self._es = get_elasticsearch()
+        return self._es
+
+    @property
+    def crawl_state(self):
+        if self._crawl_state is None:
+            self._crawl_state = CrawlState()
+        return self._crawl_state
+
+    @property
+    def dedup_index(self):
+        if self._dedup_index is None:
+            self._dedup_index = NearDuplicateIndex()
+        return self._dedup_index
+
+    def hand_off(self, queue: str, records, pipeline: str, batch_size: int = HANDOFF_BATCH_SIZE):
+        """
+        Enqueue records for the next stage in small batches, so it starts while this one is running.
+        """
+        for batch in iter_batches(records, batch_size):
+            self.queue.put_many(queue, [
+                (f"{pipeline}:{record['id']}", {"pipeline": pipeline, "record": record}) for record in batch
+            ])
+
+    def close(self):
+        for resource in (self._crawl_state, self._dedup_index, self.queue):
+            if resource is not None:
+                resource.close()
+        news_crawler.browser_pool.close()
+
+def by_pipeline(payloads: list) -> dict:
+    grouped = defaultdict(list)
+    for payload in payloads:
+        grouped[payload["pipeline"]].append(payload)
+    return grouped
+
+def discover(worker: StageWorker, payloads: list):
+    """
+    Discover the article URLs of news keywords, or collect the tweets of a timeline crawl.
+    """
+    grouped = by_pipeline(payloads)
+    keywords = [payload["keyword"] for payload in grouped.pop("news", [])]
+    if keywords:
+        for urls in iter_batches(news_crawler.scrape_urls(keywords), news_crawler.FETCH_BATCH_SIZE):
+            to_fetch = worker.crawl_state.urls_to_fetch(
+                urls, es=worker.es, index_name=news_crawler.INDEX_NAME, id_for=news_crawler.article_id
+            )
+            worker.queue.put_many("fetch", [(f"news:{url}", {"pipeline": "news", "url": url}) for url in to_fetch])
+
+    for _ in grouped.pop("tweets", []):
+        driver = twitter_crawler.setup_driver()
+        try:
+            twitter_crawler.login_to_twitter(driver)
+            worker.hand_off("enrich", twitter_crawler.scroll_and_collect_tweets(driver), "tweets")
+        finally:
+            driver.quit()
+
+def fetch(worker: StageWorker, payloads: list):
+    """
+    Fetch and parse articles; new or changed ones are staged in the crawl state until indexed.
+    """
+    urls = [payload["url"] for payload in payloads]
+    worker.hand_off("enrich", news_crawler.iter_articles(urls, worker.crawl_state), "news")
+
+def enrich(worker: StageWorker, payloads: list):
+    """
+    Label records with Gemini: one article per near-duplicate cluster, and tweets not labeled yet.
+    """
+    for pipeline, group in by_pipeline(payloads).items():
+        records = [payload["record"] for payload in group]
+        if pipeline == "news":
+            enriched = news_crawler.iter_enriched_unique_news(records, worker.dedup_index, es=worker.es)
+        else:
+            enriched = iter_labeled(records, es=worker.es, index_name=PIPELINES[pipeline]["index_name"],
+                                    prompt_fields=twitter_crawler.PROMPT_FIELDS)
+        worker.hand_off("embed", enriched, pipeline)
+
+def embed(worker: StageWorker, payloads: list):
+    """
+    Embed labeled records, reusing the vectors of unchanged documents.
+    """
+    for pipeline, group in by_pipeline(payloads).items():
+        config = PIPELINES[pipeline]
+        records = [payload["record"] for payload in group]
+        embedded = iter_with_embeddings(records, config["embedding_fields"], es=worker.es, index_name=config["index_name"])
+        worker.hand_off("ingest", embedded, pipeline)
+
+def ingest(worker: StageWorker, payloads: list):
+    """
+    Bulk index embedded records, then commit the crawl state of the indexed articles.
+    """
+    for pipeline, group in by_pipeline(payloads).items():
+        config = PIPELINES[pipeline]
+        on_indexed = (lambda action: worker.crawl_state.commit(action["_id"])) if pipeline == "news" else None
+        ingest_records(
+            [payload["record"] for payload in group], config["index_name"], config["embedding_fields"],
+            es=worker.es, upsert=config["upsert"], prepare=config["prepare"], on_indexed=on_indexed,
+            embed=False, relax_refresh=False,
+        )
+
+HANDLERS = {"discover": discover, "fetch": fetch, "enrich": enrich, "embed": embed, "ingest": ingest}
+
+@contextmanager
+def heartbeat(path: str, job_ids: list, lease_seconds: float = ORCHESTRATOR_LEASE_SECONDS):
+    """
+    Keep extending the lease of jobs while the block runs, so long jobs are not taken over
+    by other workers while a crashed worker's jobs still come back after one lease.
+    """
+    done = threading.Event()
+
+    def run():
+        work_queue = WorkQueue(path)
+        try:
+            while not done.wait(lease_seconds / 3):
+                work_queue.extend(job_ids, lease_seconds)
+        finally:
+            work_queue.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+def run_worker(stage_name: str, stop, path: str = WORK_QUEUE_PATH):
+    """
+    Process loop of a stage: lease a batch, handle it, acknowledge it; failed batches are
+    given back and retried up to WORK_QUEUE_MAX_ATTEMPTS times.
+
+    Args:
+        stage_name (str): Key of STAGES.
+        stop (multiprocessing.Event): Set to stop after the batch in progress.
+        path (str): Path of the work queue database.
+    """
+    # Ctrl+C reaches the whole process group; the orchestrator stops workers through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stage = STAGES[stage_name]
+    handler = HANDLERS[stage_name]
+    worker = StageWorker(path)
+    try:
+        while not stop.is_set():
+            jobs = worker.queue.lease(stage.queue, stage.batch_size, ORCHESTRATOR_LEASE_SECONDS)
+            if not jobs:
+                stop.wait(ORCHESTRATOR_POLL_SECONDS)
+                continue
+
+            job_ids = [job_id for job_id, _ in jobs]
+            try:
+                with heartbeat(path, job_ids), timed(ORCHESTRATOR_BATCH_SECONDS, stage=stage_name):
+                    handler(worker, [payload for _, payload in jobs])
+            except Exception as e:
+                print(f"[{stage_name}] Error handling {len(jobs)} jobs: {e}")
+                worker.queue.nack(job_ids, repr(e))
+            else:
+                worker.queue.ack(job_ids)
+    finally:
+        worker.close()
+
+def is_drained(counts: dict, stages: list) -> bool:
+    return not any(
+        counts.get(STAGES[name].queue, {}).get(status) for name in stages for status in ("ready", "leased")
+    )
+
+def run(stages: list = None, schedule: list = None, once: bool = False, path: str = WORK_QUEUE_PATH):
+    """
+    Start the stage workers and the scheduler, restarting workers that die, until interrupted.
+
+    Args:
+        stages (list): Names of the stages to run here, all of them by default.
+        schedule (list): Schedule entries, None to not schedule crawls from this process.
+        once (bool): Enqueue every schedule entry now and exit once the queues are drained.
+        path (str): Path of the work queue database.
+    """
+    stages = stages or list(STAGES)
+    if ORCHESTRATOR_METRICS_PORT:
+        start_metrics_server(ORCHESTRATOR_METRICS_PORT)
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    work_queue = WorkQueue(path)
+    processes = {}
+    failed = {}
+
+    def start(stage_name, index):
+        process = context.Process(target=run_worker, args=(stage_name, stop, path), name=f"{stage_name}-{index}")
+        process.start()
+        processes[(stage_name, index)] = process
+
+    for stage_name in stages:
+        for index in range(STAGES[stage_name].workers):
+            start(stage_name, index)
+
+    if schedule and once:
+        schedule_due(work_queue, schedule, force=True)
+
+    try:
+        while True:
+            if schedule and not once:
+                schedule_due(work_queue, schedule)
+
+            for (stage_name, index), process in list(processes.items()):
+                if not process.is_alive():
+                    print(f"Worker {process.name} exited with code {process.exitcode}, restarting.")
+                    mark_process_dead(process.pid)
+                    start(stage_name, index)
+
+            counts = work_queue.counts()
+            print(f"Queues: {counts}")
+            for queue, statuses in counts.items():
+                if statuses.get("failed", 0) > failed.get(queue, 0):
+                    print(f"{statuses['failed'] - failed.get(queue, 0)} more jobs of {queue} parked as failed, "
+                          f"{statuses['failed']} in total; their last error is in the error column of {path}")
+                failed[queue] = statuses.get("failed", 0)
+            if once and is_drained(counts, stages):
+                break
+            time.sleep(ORCHESTRATOR_TICK_SECONDS if not once else ORCHESTRATOR_POLL_SECONDS * 5)
+    except KeyboardInterrupt:
+        print("Stopping workers after their current batch...")
+    finally:
+        stop.set()
+        deadline = time.monotonic() + ORCHESTRATOR_SHUTDOWN_SECONDS
+        for process in processes.values():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                # Its leased jobs are delivered again once the lease expires
+                process.terminate()
+                process.join()
+            mark_process_dead(process.pid)
+        work_queue.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma separated stages to run in this process")
+    parser.add_argument("--once", action="store_true", help="Crawl every schedule entry once, then exit")
+    parser.add_argument("--no-schedule", action="store_true", help="Only run workers, scheduling is done elsewhere")
+    args = parser.parse_args()
+
+    unknown = set(args.stages.split(",")) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    run(
+        stages=args.stages.split(","),
+        schedule=None if args.no_schedule else load_schedule(),
+        once=args.once,
+    )
@@ -0,0 +1,112 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Selectors and patterns compiled once, used for every tweet
+TWEET_ATTRS = {"data-testid": "tweet"}
+TWEET_TEXT_ATTRS = {"data-testid": "tweetText"}
+USER_NAME_ATTRS = {"data-testid": "User-Name"}
+COUNTER_ATTRS = {"data-testid": "app-text-transition-container"}
+ONLY_TWEETS = SoupStrainer("article", attrs=TWEET_ATTRS)
+PROFILE_IMAGE_RE = re.compile(r"^https://pbs\.twimg\.com/profile_images/")
+STATUS_LINK_RE = re.compile(r"^/[^\s/]+/status/\d+")
+MENTION_RE = re.compile(r"@\w+")
+HASHTAG_RE = re.compile(r"#\w+")
+
+DEFAULT_PROFILE_IMAGE = "https://abs.twimg.com/sticky/default_profile_images/default_profile_normal.png"
+
+def convert_formatted_number(formatted_number):
+    """
+    Convert formatted numbers like 1K, 1M to integers.
+
+    Args:
+        formatted_number (str): The formatted number string.
+
+    Returns:
+        int: The converted integer value.
+    """
+    formatted_number = formatted_number.replace(",", "")
+    if formatted_number.isdigit():
+        return int(formatted_number)
+
+    suffix_multipliers = {'K': 10**3, 'M': 10**6, 'B': 10**9}
+    if formatted_number[-1] in suffix_multipliers:
+        multiplier = suffix_multipliers[formatted_number[-1]]
+        number_part = float(formatted_number[:-1])
+        return int(number_part * multiplier)
+
+    raise ValueError(f"Invalid formatted number: {formatted_number}")
+
+def parse_tweets(html):
+    """
+    Parse tweet elements out of HTML, building only the tweet subtrees.
+
+    Args:
+        html (str): A page, or the concatenated outerHTML of tweet nodes.
+
+    Returns:
+        list: The tweet elements parsed by BeautifulSoup.
+    """
+    return BeautifulSoup(html, 'lxml', parse_only=ONLY_TWEETS).find_all('article', TWEET_ATTRS)
+
+def extract_tweet_data(tweet):
+    """
+    Extract data from a single tweet element, walking the parsed tree once per field
+    instead of serializing the element back to a string for regexes.
+
+    Args:
+        tweet (BeautifulSoup): The tweet element parsed by BeautifulSoup.
+
+    Returns:
+        dict: A dictionary containing tweet data.
+    """
+    text_parts = []
+    for element in tweet.find('div', TWEET_TEXT_ATTRS).find_all(['span', 'img']):
+        if element.name == 'span':
+            text_parts.append(element.get_text(strip=True))
+        elif element.name == 'img' and element.has_attr('alt'):
+            text_parts.append(element['alt'])
+
+    full_text = " ".join(text_parts)
+
+    account = [i.text for i in tweet.find('div', USER_NAME_ATTRS).find_all(['span']) if i.text and i.text != '·']
+    username = account[-1]
+    name = account[0]
+
+    time_element = tweet.find('time')
+    waktu = time_element.get('datetime').split('T')
+    tgl = waktu[0]
+    jam = waktu[1].split('.')[0]
+
+    profile_image = tweet.find('img', src=PROFILE_IMAGE_RE)
+    link_image_url = profile_image['src'] if profile_image else DEFAULT_PROFILE_IMAGE
+
+    # The timestamp links to the tweet itself, also when the tweet quotes another one
+    permalink = time_element.find_parent('a', href=STATUS_LINK_RE) or tweet.find('a', href=STATUS_LINK_RE)
+    link_post = 'https://x.com' + permalink['href']
+    tweet_id = link_post.split('/')[-1]
+
+    agg = [i.text if i.text else "0" for i in tweet.find_all('span', COUNTER_ATTRS)]
+    reply_count = convert_formatted_number(agg[0])
+    retweet_count = convert_formatted_number(agg[1])
+    like_count = convert_formatted_number(agg[2])
+    views_count = convert_formatted_number(agg[3]) if len(agg) > 3 else 0
+
+    mentions = MENTION_RE.findall(full_text)
+    hashtags = HASHTAG_RE.findall(full_text)
+
+    return {
+        "id": tweet_id,
+        "full_text": full_text,
+        "link_post": link_post,
+        "link_image_url": link_image_url,
+        "username": username,
+        "name": name,
+        "date": tgl,
+        "time": jam,
+        "favorite_count": like_count,
+        "retweet_count": retweet_count,
+        "reply_count": reply_count,
+        "views_count": views_count,
+        "mentions": mentions,
+        "hashtags": hashtags
+    }
@@ -4,16 +4,38 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException
 import time
-import re
-import pandas as pd
-from elasticsearch import Elasticsearch, helpers
 from dotenv import load_dotenv
+from crawler.tweet_parser import parse_tweets, extract_tweet_data
+from crawler.enrichment import enrichment_stage
+from utils.elasticsearch_client import get_elasticsearch, create_elasticsearch
 import os
 # Load environment variables
 load_dotenv()
 
+INDEX_NAME = "twitter_jakarta"
+# Text embedded into the kNN vector of each tweet, and the fields sent to Gemini for classification
+EMBEDDING_FIELDS = ["full_text"]
+PROMPT_FIELDS = ["id", "full_text"]
+
+# Stop conditions of a timeline crawl
+TWEET_MAX_TWEETS = int(os.getenv("TWEET_MAX_TWEETS", 2000))
+TWEET_MAX_IDLE_SCROLLS = int(os.getenv("TWEET_MAX_IDLE_SCROLLS", 5))
+TWEET_TIME_BUDGET_SECONDS = float(os.getenv("TWEET_TIME_BUDGET_SECONDS", 900))
+TWEET_SCROLL_PAUSE = float(os.getenv("TWEET_SCROLL_PAUSE", 2))
+
+# Returns the outerHTML of the rendered tweet nodes not collected yet and marks them as collected;
+# nodes whose timestamp is not rendered yet are left for the next round
+NEW_TWEETS_SCRIPT = """
+const nodes = Array.from(document.querySelectorAll('article[data-testid="tweet"]:not([data-collected])'))
+    .filter(node => node.querySelector('time'));
+return nodes.map(node => { node.setAttribute('data-collected', '1'); return node.outerHTML; });
+"""
+HAS_NEW_TWEETS_SCRIPT = """
+return document.querySelector('article[data-testid="tweet"]:not([data-collected])') !== null;
+"""
+
 def setup_driver():
     """
     Set up and return a Selenium WebDriver instance.
@@ -51,9 +73,9 @@ def login_to_twitter(driver, url="https://x.com/"):
 
         # Wait for the password field and enter the password
         password_field = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.NAME, os.getenv("TWITTER_PASSWORD"))))
+            EC.presence_of_element_located((By.NAME, "password"))
         )
-        password_field.send_keys("your_password")
+        password_field.send_keys(os.getenv("TWITTER_PASSWORD"))
 
         # Submit the login form
         login_button = driver.find_element(By.CSS_SELECTOR, "div[data-testid='LoginForm_Login_Button']")
@@ -70,126 +92,84 @@ def login_to_twitter(driver, url="https://x.com/"):
         print(f"Login failed: {e}")
         driver.quit()
 
-def convert_formatted_number(formatted_number):
-    """
-    Convert formatted numbers like 1K, 1M to integers.
-
-    Args:
-        formatted_number (str): The formatted number string.
-
-    Returns:
-        int: The converted integer value.
-    """
-    if formatted_number.isdigit():
-        return int(formatted_number)
-
-    suffix_multipliers = {'K': 10**3, 'M': 10**6, 'B': 10**9}
-    if formatted_number[-1] in suffix_multipliers:
-        multiplier = suffix_multipliers[formatted_number[-1]]
-        number_part = float(formatted_number[:-1])
-        return int(number_part * multiplier)
-
-    raise ValueError(f"Invalid formatted number: {formatted_number}")
-
-def extract_tweet_data(tweet):
-    """
-    Extract data from a single tweet element.
-
-    Args:
-        tweet (BeautifulSoup): The tweet element parsed by BeautifulSoup.
-
-    Returns:
-        dict: A dictionary containing tweet data.
+def scroll_and_collect_tweets(driver, max_tweets=TWEET_MAX_TWEETS, max_idle_scrolls=TWEET_MAX_IDLE_SCROLLS,
+                              time_budget=TWEET_TIME_BUDGET_SECONDS, scroll_pause=TWEET_SCROLL_PAUSE):
     """
-    text_parts = []
-    for element in tweet.find('div', {"data-testid": "tweetText"}).find_all(['span', 'img']):
-        if element.name == 'span':
-            text_parts.append(element.get_text(strip=True))
-        elif element.name == 'img' and element.has_attr('alt'):
-            text_parts.append(element['alt'])
-
-    full_text = " ".join(text_parts)
-
-    account = [i.text for i in tweet.find('div', {"data-testid": "User-Name"}).find_all(['span']) if i.text and i.text != '·']
-    username = account[-1]
-    name = account[0]
+    Scroll the timeline and collect the tweets rendered since the previous scroll.
 
-    waktu = tweet.find('time').get('datetime').split('T')
-    tgl = waktu[0]
-    jam = waktu[1].split('.')[0]
-
-    try:
-        link_image_url = re.findall(r'(https://pbs.twimg.com/profile_images/.*?)"', str(tweet))[0]
-    except:
-        link_image_url = 'https://abs.twimg.com/sticky/default_profile_images/default_profile_normal.png'
-
-    link_post = 'https://x.com' + re.findall(r'href="(/[^\s]*?/status/.*?)"', str(tweet))[0]
-    tweet_id = link_post.split('/')[-1]
-
-    agg = [i.text if i.text else "0" for i in tweet.find_all('span', {'data-testid': 'app-text-transition-container'})]
-    reply_count = convert_formatted_number(agg[0])
-    retweet_count = convert_formatted_number(agg[1])
-    like_count = convert_formatted_number(agg[2])
-    views_count = convert_formatted_number(agg[3]) if len(agg) > 3 else 0
-
-    mentions = re.findall(r'@\w+', full_text)
-    hashtags = re.findall(r'#\w+', full_text)
-
-    return {
-        "id": tweet_id,
-        "full_text": full_text,
-        "link_post": link_post,
-        "link_image_url": link_image_url,
-        "username": username,
-        "name": name,
-        "date": tgl,
-        "time": jam,
-        "favorite_count": like_count,
-        "retweet_count": retweet_count,
-        "reply_count": reply_count,
-        "views_count": views_count,
-        "mentions": mentions,
-        "hashtags": hashtags
-    }
-
-def scroll_and_collect_tweets(driver):
-    """
-    Scroll the page and collect tweets using BeautifulSoup.
+    Each round only pulls the tweet nodes not collected yet (they are marked in the DOM),
+    parses them in one small document and dedupes tweet ids, so the cost of a scroll does
+    not grow with the number of tweets already on the page.
 
     Args:
         driver (webdriver.Chrome): The Selenium WebDriver instance.
+        max_tweets (int): Stop after this many unique tweets, 0 for no limit.
+        max_idle_scrolls (int): Stop after this many consecutive scrolls without a new tweet.
+        time_budget (float): Stop after this many seconds, 0 for no limit.
+        scroll_pause (float): Maximum seconds to wait for new tweets after a scroll.
 
-    Returns:
-        list: A list of dictionaries containing tweet data.
+    Yields:
+        dict: Tweet data, as soon as the tweet has been rendered.
     """
-    results = []
+    seen_ids = set()
+    idle_scrolls = 0
+    start = time.monotonic()
     while True:
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        tweets = soup.find_all('article', {"data-testid": "tweet"})
-        for tweet in tweets:
-            results.append(extract_tweet_data(tweet))
-        driver.execute_script("window.scrollBy(0, 1000);")
-        time.sleep(2)
-    return results
+        new_tweets = 0
+        for tweet in parse_tweets("".join(driver.execute_script(NEW_TWEETS_SCRIPT) or [])):
+            try:
+                record = extract_tweet_data(tweet)
+            except Exception as e:
+                # Ads and tweets still rendering lack some of the fields
+                print(f"Error extracting tweet: {e}")
+                continue
+            if record["id"] in seen_ids:
+                continue
+            seen_ids.add(record["id"])
+            new_tweets += 1
+            yield record
+            if max_tweets and len(seen_ids) >= max_tweets:
+                print(f"Collected {len(seen_ids)} tweets, reached the limit.")
+                return
+
+        idle_scrolls = 0 if new_tweets else idle_scrolls + 1
+        if idle_scrolls >= max_idle_scrolls:
+            print(f"Collected {len(seen_ids)} tweets, no new tweets after {idle_scrolls} scrolls.")
+            return
+        if time_budget and time.monotonic() - start >= time_budget:
+            print(f"Collected {len(seen_ids)} tweets, time budget of {time_budget}s spent.")
+            return
 
-def ingest_to_elasticsearch(results, es_url="http://localhost:9200", index_name="twitter_jakarta"):
+        driver.execute_script("window.scrollBy(0, 1000);")
+        try:
+            # Continue as soon as new tweets are rendered instead of always sleeping
+            WebDriverWait(driver, scroll_pause, poll_frequency=0.2).until(
+                lambda driver: driver.execute_script(HAS_NEW_TWEETS_SCRIPT)
+            )
+        except TimeoutException:
+            pass
+
+def ingest_to_elasticsearch(results, es_url=None, index_name=INDEX_NAME):
     """
-    Ingest collected tweet data into Elasticsearch.
+    Classify, embed and stream collected tweet data into Elasticsearch while the timeline is scrolled.
+
+    Tweets are indexed under their tweet id with upsert semantics, so a tweet collected again
+    updates its engagement counters in place; tweets that are already labeled skip Gemini.
+    Tweets Gemini could not label are indexed all the same, marked "enrichment_failed", and
+    are labeled when they are collected again.
 
     Args:
-        results (list): List of tweet data dictionaries.
-        es_url (str): The Elasticsearch URL.
+        results (iterable): Tweet data dictionaries, typically a generator.
+        es_url (str): The Elasticsearch URL, defaults to the shared client of the configured cluster.
         index_name (str): The Elasticsearch index name.
     """
-    es = Elasticsearch(es_url)
+    es = create_elasticsearch(hosts=[es_url]) if es_url else get_elasticsearch()
+    stats = enrichment_stage(
+        results, index_name, EMBEDDING_FIELDS, es=es, upsert=True, prompt_fields=PROMPT_FIELDS,
+    )
 
-    if not es.indices.exists(index=index_name):
-        es.indices.create(index=index_name)
-
-    df = pd.DataFrame(results).drop_duplicates('id').to_dict(orient='records')
-    helpers.bulk(es, [{"_index": index_name, "_source": record} for record in df])
-
-    print(f"Successfully ingested {len(df)} tweets to Elasticsearch.")
+    print(f"Successfully ingested {stats['indexed']} tweets to Elasticsearch, "
+          f"{stats['failed']} failed (see {stats['dead_letter_path']}).")
 
 def twitter_crawler():
     """
@@ -205,3 +185,6 @@ def twitter_crawler():
         print(f"Error: {e}")
     finally:
         driver.quit()
+
+if __name__ == "__main__":
+    twitter_crawler()
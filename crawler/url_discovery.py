@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from dotenv import load_dotenv
+from utils.rate_limit import TokenBucket
+
+load_dotenv()
+
+# Result pages requested per keyword: the first page plus "more results" clicks
+DISCOVERY_MAX_PAGES = int(os.getenv("DISCOVERY_MAX_PAGES", 3))
+DISCOVERY_RESULTS_TIMEOUT = int(os.getenv("DISCOVERY_RESULTS_TIMEOUT", 5))
+# Politeness: page loads and clicks per minute on any one domain, and the burst allowed
+DISCOVERY_REQUESTS_PER_MINUTE = float(os.getenv("DISCOVERY_REQUESTS_PER_MINUTE", 60))
+DISCOVERY_BURST = float(os.getenv("DISCOVERY_BURST", 8))
+
+SEARCH_URL = "https://duckduckgo.com/?q={query}&ia=news"
+
+# Query parameters that only track the click and never change the article
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "_ga", "amp"}
+TRACKING_PREFIXES = ("utm_",)
+
+# Result links, read from the DOM rather than scanning the page source
+LINKS_SCRIPT = """
+return Array.from(document.querySelectorAll('a[href^="http"]'), a => a.href);
+"""
+# Clicks the "more results" control of either DuckDuckGo layout, returning whether there was one
+MORE_RESULTS_SCRIPT = """
+const more = document.querySelector('#more-results, button.result--more__btn, a.result--more, .result--more a');
+if (!more) { return false; }
+more.click();
+return true;
+"""
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL, so the same article found under several links is crawled once.
+    Only used to compare URLs; the URL as linked is what is crawled and identifies the document.
+
+    Lowercases the scheme and host, drops the fragment, default ports, tracking parameters
+    and a trailing slash, and sorts the remaining query parameters.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+class DomainRateLimiter:
+    def __init__(self, rate_per_minute: float = DISCOVERY_REQUESTS_PER_MINUTE, burst: float = DISCOVERY_BURST):
+        """
+        One token bucket per domain, so concurrent workers stay polite to every site they hit.
+
+        Args:
+            rate_per_minute (float): Requests per minute allowed on a domain.
+            burst (float): Requests a domain may receive back to back.
+        """
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str):
+        """
+        Block until a request to the domain of url is allowed.
+        """
+        domain = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = TokenBucket(self.rate_per_minute, self.burst)
+        bucket.acquire()
+
+def _result_links(driver) -> set:
+    links = driver.execute_script(LINKS_SCRIPT) or []
+    return {link for link in links if "duckduckgo" not in (urlsplit(link).hostname or "")}
+
+def search_keyword(worker, keyword: str, results: queue.Queue, limiter: DomainRateLimiter,
+                   max_pages: int = DISCOVERY_MAX_PAGES):
+    """
+    Collect the news result links of one keyword on a pool worker, following "more results".
+
+    Args:
+        worker (BrowserWorker): The browser to search with.
+        keyword (str): The search keyword.
+        results (queue.Queue): Receives every link found, as soon as its page is read.
+        limiter (DomainRateLimiter): Politeness limiter of the search engine.
+        max_pages (int): Maximum number of result pages.
+    """
+    search_url = SEARCH_URL.format(query="+".join(keyword.split()))
+    worker.ensure_ready()
+    driver = worker.driver
+
+    limiter.acquire(search_url)
+    try:
+        driver.get(search_url)
+    except TimeoutException:
+        pass
+
+    seen = set()
+    for page in range(max_pages):
+        try:
+            WebDriverWait(driver, DISCOVERY_RESULTS_TIMEOUT, poll_frequency=0.2).until(
+                lambda driver: len(_result_links(driver)) > len(seen)
+            )
+        except TimeoutException:
+            if page == 0:
+                print(f"No results for keyword: {keyword}")
+            break
+
+        new_links = _result_links(driver) - seen
+        seen |= new_links
+        for link in new_links:
+            results.put(link)
+
+        if page + 1 < max_pages:
+            limiter.acquire(search_url)
+            if not driver.execute_script(MORE_RESULTS_SCRIPT):
+                break
+
+def discover_urls(keywords: list, pool, max_pages: int = DISCOVERY_MAX_PAGES, limiter: DomainRateLimiter = None):
+    """
+    Search all keywords concurrently, one per pool worker, and stream the unique article URLs.
+
+    Args:
+        keywords (list): Search keywords.
+        pool (BrowserPool): Browsers to search with.
+        max_pages (int): Result pages per keyword.
+        limiter (DomainRateLimiter): Politeness limiter, defaults to a new one.
+
+    Yields:
+        str: Article URLs as they are linked, one per normalized URL, as they are found. The
+        linked form is kept because document ids are derived from it (see news_crawler.article_id),
+        so articles indexed before normalization keep their id.
+    """
+    limiter = limiter or DomainRateLimiter()
+    results = queue.Queue()
+    done = object()
+
+    def search(keyword):
+        try:
+            with pool.worker() as worker:
+                search_keyword(worker, keyword, results, limiter, max_pages)
+        except Exception as e:
+            print(f"Error fetching results for {keyword}: {e}")
+
+    def run():
+        try:
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                list(executor.map(search, keywords))
+        finally:
+            results.put(done)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    seen = set()
+    while True:
+        link = results.get()
+        if link is done:
+            break
+        url = normalize_url(link)
+        if url not in seen:
+            seen.add(url)
+            yield link
+    print(f"Discovered {len(seen)} unique URLs for {len(keywords)} keywords.")
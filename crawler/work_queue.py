@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import sqlite3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", ".cache/work_queue.sqlite3")
+# Deliveries of a job before it is parked as failed
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", 5))
+
+class WorkQueue:
+    def __init__(self, path: str = WORK_QUEUE_PATH, max_attempts: int = WORK_QUEUE_MAX_ATTEMPTS):
+        """
+        Durable job queues shared by processes through one SQLite file.
+
+        A worker leases jobs for a while and acknowledges them once their output is handed to the
+        next queue; acknowledged jobs are deleted. Jobs of a worker that crashed become visible again
+        when their lease expires, so a pipeline resumes where it stopped instead of restarting.
+        A job key dedupes jobs that are waiting or running, so handing the same output over twice
+        after a crash does not duplicate work; a job still waiting takes the payload handed over last.
+
+        Each process must open its own WorkQueue.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_attempts (int): Deliveries of a job before it is marked failed.
+        """
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, job_key TEXT, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'ready', attempts INTEGER NOT NULL DEFAULT 0, "
+            "lease_expires_at REAL, error TEXT, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, id)")
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_key ON jobs (queue, job_key) WHERE status != 'failed'"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS schedule (name TEXT PRIMARY KEY, last_run_at REAL NOT NULL)")
+
+    def put_many(self, queue: str, jobs: list) -> int:
+        """
+        Enqueue jobs. A job whose key is already waiting gets the new payload instead, and one
+        whose key is running is skipped.
+
+        Args:
+            queue (str): Name of the queue.
+            jobs (list): (key, payload) pairs; the key may be None and the payload must be JSON serializable.
+
+        Returns:
+            int: Number of jobs added or updated.
+        """
+        now = time.time()
+        before = self._conn.total_changes
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT INTO jobs (queue, job_key, payload, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (queue, job_key) WHERE status != 'failed' "
+                "DO UPDATE SET payload = excluded.payload WHERE jobs.status = 'ready'",
+                [(queue, key, json.dumps(payload, default=str), now) for key, payload in jobs],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return self._conn.total_changes - before
+
+    def put(self, queue: str, payload, key: str = None) -> bool:
+        return self.put_many(queue, [(key, payload)]) == 1
+
+    def lease(self, queue: str, limit: int, lease_seconds: float) -> list:
+        """
+        Take up to limit jobs that are ready, or whose lease expired, for lease_seconds.
+
+        Returns:
+            list: (job id, payload) pairs, oldest first.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose lease expired after their last attempt are parked instead of crashing workers forever
+            parked = self._conn.execute(
+                "SELECT id FROM jobs WHERE queue = ? AND status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (queue, now, self.max_attempts),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'failed', lease_expires_at = NULL, error = 'lease expired too often' WHERE id = ?",
+                parked,
+            )
+            rows = self._conn.execute(
+                "SELECT id, payload FROM jobs WHERE queue = ? AND "
+                "(status = 'ready' OR (status = 'leased' AND lease_expires_at < ?)) ORDER BY id LIMIT ?",
+                (queue, now, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_expires_at = ? WHERE id = ?",
+                [(now + lease_seconds, job_id) for job_id, _ in rows],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if parked:
+            print(f"Parked {len(parked)} jobs of {queue} as failed: lease expired after {self.max_attempts} attempts, "
+                  f"ids {[job_id for (job_id,) in parked]}")
+        return [(job_id, json.loads(payload)) for job_id, payload in rows]
+
+    def ack(self, job_ids: list):
+        """
+        Mark jobs done, deleting them.
+        """
+        self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def nack(self, job_ids: list, error: str) -> int:
+        """
+        Give jobs back after a failure: ready again, or failed once they used up their attempts.
+
+        Returns:
+            int: Number of jobs parked as failed.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            parked = self._conn.execute(
+                f"SELECT id FROM jobs WHERE attempts >= ? AND id IN ({','.join('?' * len(job_ids))})",
+                [self.max_attempts, *job_ids],
+            ).fetchall() if job_ids else []
+            self._conn.executemany(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'ready' END, "
+                "lease_expires_at = NULL, error = ? WHERE id = ?",
+                [(self.max_attempts, error[:2000], job_id) for job_id in job_ids],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if parked:
+            print(f"Parked {len(parked)} jobs as failed after {self.max_attempts} attempts, "
+                  f"ids {[job_id for (job_id,) in parked]}: {error[:200]}")
+        return len(parked)
+
+    def extend(self, job_ids: list, lease_seconds: float):
+        """
+        Extend the lease of jobs still being worked on.
+        """
+        expires_at = time.time() + lease_seconds
+        self._conn.executemany(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'leased'",
+            [(expires_at, job_id) for job_id in job_ids],
+        )
+
+    def is_pending(self, queue: str, key: str) -> bool:
+        """
+        Whether a job with this key is waiting or running.
+        """
+        row = self._conn.execute(
+            "SELECT 1 FROM jobs WHERE queue = ? AND job_key = ? AND status != 'failed'", (queue, key)
+        ).fetchone()
+        return row is not None
+
+    def counts(self) -> dict:
+        """
+        Number of jobs per queue and status.
+        """
+        counts = {}
+        for queue, status, count in self._conn.execute("SELECT queue, status, COUNT(*) FROM jobs GROUP BY queue, status"):
+            counts.setdefault(queue, {})[status] = count
+        return counts
+
+    def last_run(self, name: str) -> float:
+        row = self._conn.execute("SELECT last_run_at FROM schedule WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0.0
+
+    def set_last_run(self, name: str, timestamp: float):
+        self._conn.execute("INSERT OR REPLACE INTO schedule (name, last_run_at) VALUES (?, ?)", (name, timestamp))
+
+    def close(self):
+        self._conn.close()
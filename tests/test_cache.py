@@ -0,0 +1,252 @@
+"""
+Eviction, expiry, tiering and request coalescing of utils.cache.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import utils.cache as cache
+
+
+class Clock:
+    """
+    Stands in for time.time; every reading advances it slightly, so SQLite access times are ordered.
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+
+class ClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patch = mock.patch.object(cache.time, "time", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+
+class MemoryCacheTest(ClockTestCase):
+    def test_evicts_least_recently_used_by_entries(self):
+        memory = cache.MemoryCache(max_entries=2)
+        memory.set("a", "1")
+        memory.set("b", "2")
+        memory.get("a")
+        memory.set("c", "3")
+
+        self.assertEqual(memory.get("a"), "1")
+        self.assertIsNone(memory.get("b"))
+        self.assertEqual(memory.get("c"), "3")
+        self.assertEqual(len(memory), 2)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        memory = cache.MemoryCache(max_entries=100, max_bytes=10)
+        memory.set("a", "xxxx")
+        memory.set("b", "yyyy")
+        memory.get("a")
+        memory.set("c", "zzzz")
+
+        self.assertIsNone(memory.get("b"))
+        self.assertEqual(memory.get("a"), "xxxx")
+        self.assertEqual(memory.get("c"), "zzzz")
+
+    def test_counts_encoded_bytes_and_replaced_values(self):
+        memory = cache.MemoryCache(max_entries=100, max_bytes=4)
+        memory.set("a", "éé")
+        memory.set("a", "é")
+        memory.set("b", "xx")
+
+        # "é" is two bytes in UTF-8; the replaced value no longer counts
+        self.assertEqual(memory.get("a"), "é")
+        self.assertEqual(memory.get("b"), "xx")
+
+    def test_value_larger_than_max_bytes_is_not_kept(self):
+        memory = cache.MemoryCache(max_entries=100, max_bytes=3)
+        memory.set("a", "xxxx")
+        self.assertIsNone(memory.get("a"))
+        self.assertEqual(len(memory), 0)
+
+    def test_expires_after_ttl(self):
+        memory = cache.MemoryCache(ttl=10)
+        memory.set("a", "1")
+        memory.set("b", "2", ttl=100)
+
+        self.clock.now += 11
+        self.assertIsNone(memory.get("a"))
+        self.assertEqual(memory.get("b"), "2")
+        self.assertEqual(len(memory), 1)
+
+
+class SQLiteCacheTest(ClockTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.sqlite3")
+
+    def open(self, **kwargs):
+        sqlite = cache.SQLiteCache(self.path, **kwargs)
+        self.addCleanup(sqlite._conn.close)
+        return sqlite
+
+    def test_evicts_least_recently_used_by_entries(self):
+        sqlite = self.open(max_entries=2)
+        sqlite.set("a", "1")
+        sqlite.set("b", "2")
+        sqlite.get("a")
+        sqlite.set("c", "3")
+
+        self.assertEqual(sqlite.get("a"), "1")
+        self.assertIsNone(sqlite.get("b"))
+        self.assertEqual(len(sqlite), 2)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        sqlite = self.open(max_bytes=10)
+        sqlite.set("a", "xxxx")
+        sqlite.set("b", "yyyy")
+        sqlite.get("a")
+        sqlite.set("c", "zzzz")
+
+        self.assertIsNone(sqlite.get("b"))
+        self.assertEqual(sqlite.get("a"), "xxxx")
+        self.assertEqual(sqlite.get("c"), "zzzz")
+
+    def test_expires_after_ttl(self):
+        sqlite = self.open(ttl=10)
+        sqlite.set("a", "1")
+        sqlite.set("b", "2", ttl=100)
+
+        self.clock.now += 11
+        self.assertIsNone(sqlite.get("a"))
+        self.assertEqual(sqlite.get("b"), "2")
+
+    def test_survives_reopening(self):
+        self.open().set("a", "1")
+        self.assertEqual(self.open().get("a"), "1")
+
+
+class TieredCacheTest(ClockTestCase):
+    def test_promotes_second_tier_hits(self):
+        first, second = cache.Cache(cache.MemoryCache()), cache.Cache(cache.MemoryCache())
+        tiered = cache.TieredCache(first, second)
+        second.set("a", "1")
+
+        self.assertEqual(tiered.get("a"), "1")
+        self.assertEqual(first.backend.get("a"), "1")
+        self.assertEqual(tiered.stats()["first"]["misses"], 1)
+        self.assertEqual(tiered.stats()["second"]["hits"], 1)
+
+        # Served by the first tier from now on
+        self.assertEqual(tiered.get("a"), "1")
+        self.assertEqual(tiered.stats()["first"]["hits"], 1)
+        self.assertEqual(tiered.stats()["second"]["hits"], 1)
+
+    def test_writes_and_deletes_both_tiers(self):
+        first, second = cache.Cache(cache.MemoryCache()), cache.Cache(cache.MemoryCache())
+        tiered = cache.TieredCache(first, second)
+        tiered.set("a", "1")
+        self.assertEqual((first.backend.get("a"), second.backend.get("a")), ("1", "1"))
+
+        tiered.delete("a")
+        self.assertIsNone(tiered.get("a"))
+
+    def test_without_second_tier(self):
+        tiered = cache.TieredCache(cache.Cache(cache.MemoryCache()))
+        self.assertIsNone(tiered.get("a"))
+        tiered.set("a", "1")
+        self.assertEqual(tiered.get("a"), "1")
+        self.assertIsNone(tiered.stats()["second"])
+
+
+class SingleFlightTest(unittest.TestCase):
+    def run_coalesced(self, function, waiters=4):
+        """
+        Starts a leader running function, then waiters on the same key while it is still running.
+        """
+        flight = cache.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        outcomes = []
+
+        def leader_function():
+            started.set()
+            release.wait(5)
+            return function()
+
+        def call(fn):
+            try:
+                outcomes.append(("result", flight.do("key", fn)))
+            except Exception as e:
+                outcomes.append(("error", e))
+
+        leader = threading.Thread(target=call, args=(leader_function,))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=call, args=(lambda: ("not", "coalesced"),)) for _ in range(waiters)]
+        for thread in followers:
+            thread.start()
+        # Every follower has joined the call once the coalesced counter says so
+        deadline = time.monotonic() + 5
+        while flight.coalesced < waiters and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        return flight, outcomes
+
+    def test_waiters_share_the_result(self):
+        calls = []
+        flight, outcomes = self.run_coalesced(lambda: calls.append(1) or "value")
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(outcomes, [("result", "value")] * 5)
+        self.assertEqual(flight.coalesced, 4)
+
+    def test_error_reaches_every_waiter(self):
+        error = RuntimeError("upstream failed")
+
+        def fail():
+            raise error
+
+        flight, outcomes = self.run_coalesced(fail)
+        self.assertEqual(len(outcomes), 5)
+        self.assertTrue(all(kind == "error" and raised is error for kind, raised in outcomes))
+
+        # The failed call is forgotten, so the next caller runs the function again
+        self.assertEqual(flight.do("key", lambda: "retried"), "retried")
+
+
+class BuildCacheFromEnvTest(unittest.TestCase):
+    def test_backends(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.sqlite3")
+            environment = {
+                "TEST_CACHE_BACKEND": "sqlite", "TEST_CACHE_PATH": path,
+                "TEST_CACHE_MAX_ENTRIES": "5", "TEST_CACHE_TTL_SECONDS": "60",
+            }
+            with mock.patch.dict(os.environ, environment):
+                sqlite = cache.build_cache_from_env("TEST_CACHE")
+            self.assertIsInstance(sqlite.backend, cache.SQLiteCache)
+            self.assertEqual((sqlite.backend.path, sqlite.backend.max_entries, sqlite.backend.ttl), (path, 5, 60.0))
+            sqlite.backend._conn.close()
+
+        with mock.patch.dict(os.environ, {"TEST_CACHE_BACKEND": "memory", "TEST_CACHE_MAX_BYTES": "100"}):
+            memory = cache.build_cache_from_env("TEST_CACHE")
+        self.assertIsInstance(memory.backend, cache.MemoryCache)
+        self.assertEqual((memory.backend.max_entries, memory.backend.max_bytes), (1024, 100))
+
+        with mock.patch.dict(os.environ, {"TEST_CACHE_BACKEND": "none"}):
+            self.assertIsNone(cache.build_cache_from_env("TEST_CACHE"))
+        with mock.patch.dict(os.environ, {"TEST_CACHE_BACKEND": "memcached"}):
+            self.assertRaises(ValueError, cache.build_cache_from_env, "TEST_CACHE")
+
+
+if __name__ == "__main__":
+    unittest.main()
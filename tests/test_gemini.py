@@ -0,0 +1,51 @@
+"""
+GeminiConnector against a local fake of the Vertex generative model.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import threading
+import unittest
+from unittest import mock
+
+import utils.gemini as gemini
+
+
+class FakeModel:
+    def __init__(self, model_name, system_instruction=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+
+def connector():
+    # Skips __init__, which reads credentials and initializes Vertex
+    instance = gemini.GeminiConnector.__new__(gemini.GeminiConnector)
+    instance.model = "gemini-test"
+    instance.multimodal_model = FakeModel("gemini-test")
+    instance._instruction_models = {}
+    instance._instruction_models_lock = threading.Lock()
+    return instance
+
+
+class ModelForTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(gemini, "GenerativeModel", FakeModel)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_without_instruction_uses_the_plain_model(self):
+        instance = connector()
+        self.assertIs(instance._model_for(None), instance.multimodal_model)
+
+    def test_one_model_per_instruction(self):
+        instance = connector()
+        first = instance._model_for("Classify every article.")
+
+        self.assertIs(instance._model_for("Classify every article."), first)
+        self.assertEqual(first.system_instruction, "Classify every article.")
+        self.assertEqual(first.model_name, "gemini-test")
+        self.assertIsNot(instance._model_for("Summarize every article."), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
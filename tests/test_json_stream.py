@@ -0,0 +1,66 @@
+"""
+Incremental parsing of streamed JSON arrays by utils.json_stream.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import json
+import unittest
+
+from utils.json_stream import JSONArrayStream
+
+ITEMS = [
+    {"id": "a", "contextual_content": 'Warga berkata "banjir {lagi}" di [Kampung Melayu]'},
+    {"id": "b", "contextual_content": "Jalan \\ tol ditutup }]", "contextual_keywords": ["macet", "[tol]"]},
+    {"id": "c", "nested": {"list": [1, {"x": "}"}]}, "urgency_level": 80},
+]
+
+
+def feed_in_chunks(text: str, size: int) -> tuple:
+    stream = JSONArrayStream()
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(stream.feed(text[start:start + size]))
+    return stream, items
+
+
+class JSONArrayStreamTest(unittest.TestCase):
+    def test_objects_split_across_chunks(self):
+        text = json.dumps(ITEMS, indent=2)
+        for size in (1, 2, 3, 7, 64, len(text)):
+            with self.subTest(size=size):
+                stream, items = feed_in_chunks(text, size)
+                self.assertEqual(items, ITEMS)
+                self.assertEqual(stream.errors, 0)
+
+    def test_each_object_is_returned_once_complete(self):
+        stream = JSONArrayStream()
+        self.assertEqual(stream.feed('[{"id": "a"}, {"id": '), [{"id": "a"}])
+        self.assertEqual(stream.feed('"b"}'), [{"id": "b"}])
+        self.assertEqual(stream.feed("]"), [])
+
+    def test_escaped_quotes_and_brackets_inside_strings(self):
+        text = json.dumps([{"id": "a", "text": '\\"}] still a string [{\\'}, {"id": "b"}])
+        stream, items = feed_in_chunks(text, 5)
+        self.assertEqual(items, [{"id": "a", "text": '\\"}] still a string [{\\'}, {"id": "b"}])
+        self.assertEqual(stream.errors, 0)
+
+    def test_truncated_final_object_is_dropped(self):
+        text = json.dumps(ITEMS)
+        cut = text.index('{"id": "c"') + 20
+        stream, items = feed_in_chunks(text[:cut], 4)
+        self.assertEqual(items, ITEMS[:2])
+        self.assertEqual(stream.errors, 0)
+
+    def test_text_around_the_array_is_ignored(self):
+        stream = JSONArrayStream()
+        self.assertEqual(stream.feed('```json\n[{"id": "a"}]\n```'), [{"id": "a"}])
+
+    def test_invalid_objects_are_counted_and_skipped(self):
+        stream = JSONArrayStream()
+        self.assertEqual(stream.feed('[{"id": "a",}, {"id": "b"}]'), [{"id": "b"}])
+        self.assertEqual(stream.errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
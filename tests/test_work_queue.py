@@ -0,0 +1,207 @@
+"""
+Leases, retries and dedupe of crawler.work_queue, and scheduling of the orchestrator.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import crawler.work_queue as work_queue
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class WorkQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patch = mock.patch.object(work_queue.time, "time", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "work_queue.sqlite3")
+
+    def open(self, max_attempts=3):
+        queue = work_queue.WorkQueue(self.path, max_attempts=max_attempts)
+        self.addCleanup(queue.close)
+        return queue
+
+
+class LeaseTest(WorkQueueTestCase):
+    def test_leased_jobs_are_hidden_until_the_lease_expires(self):
+        queue = self.open()
+        queue.put("fetch", {"url": "a"})
+        queue.put("fetch", {"url": "b"})
+
+        leased = queue.lease("fetch", 10, lease_seconds=60)
+        self.assertEqual([payload for _, payload in leased], [{"url": "a"}, {"url": "b"}])
+        self.assertEqual(queue.lease("fetch", 10, lease_seconds=60), [])
+
+        # A crashed worker never acks; its jobs are delivered again after the lease
+        self.clock.now += 61
+        self.assertEqual(queue.lease("fetch", 10, lease_seconds=60), leased)
+        self.assertEqual(queue.counts(), {"fetch": {"leased": 2}})
+
+    def test_lease_respects_limit_and_queue(self):
+        queue = self.open()
+        queue.put_many("fetch", [(None, i) for i in range(3)])
+        queue.put("enrich", "other")
+
+        self.assertEqual([payload for _, payload in queue.lease("fetch", 2, lease_seconds=60)], [0, 1])
+        self.assertEqual([payload for _, payload in queue.lease("fetch", 2, lease_seconds=60)], [2])
+        self.assertEqual([payload for _, payload in queue.lease("enrich", 2, lease_seconds=60)], ["other"])
+
+    def test_extend_keeps_the_lease(self):
+        queue = self.open()
+        queue.put("fetch", "a")
+        job_ids = [job_id for job_id, _ in queue.lease("fetch", 1, lease_seconds=60)]
+
+        self.clock.now += 50
+        queue.extend(job_ids, lease_seconds=60)
+        self.clock.now += 50
+        self.assertEqual(queue.lease("fetch", 1, lease_seconds=60), [])
+        self.clock.now += 11
+        self.assertEqual([job_id for job_id, _ in queue.lease("fetch", 1, lease_seconds=60)], job_ids)
+
+    def test_ack_deletes(self):
+        queue = self.open()
+        queue.put("fetch", "a", key="a")
+        queue.ack([job_id for job_id, _ in queue.lease("fetch", 1, lease_seconds=60)])
+
+        self.clock.now += 61
+        self.assertEqual(queue.lease("fetch", 1, lease_seconds=60), [])
+        self.assertFalse(queue.is_pending("fetch", "a"))
+        self.assertEqual(queue.counts(), {})
+
+
+class MaxAttemptsTest(WorkQueueTestCase):
+    def test_nack_parks_after_max_attempts(self):
+        queue = self.open(max_attempts=2)
+        queue.put("fetch", "a", key="a")
+
+        (job_id, _), = queue.lease("fetch", 1, lease_seconds=60)
+        self.assertEqual(queue.nack([job_id], "timeout"), 0)
+        self.assertEqual(queue.counts(), {"fetch": {"ready": 1}})
+
+        self.assertEqual(queue.lease("fetch", 1, lease_seconds=60), [(job_id, "a")])
+        self.assertEqual(queue.nack([job_id], "timeout"), 1)
+        self.assertEqual(queue.counts(), {"fetch": {"failed": 1}})
+        self.assertEqual(queue.lease("fetch", 1, lease_seconds=60), [])
+        self.assertFalse(queue.is_pending("fetch", "a"))
+
+    def test_lease_parks_jobs_whose_last_lease_expired(self):
+        queue = self.open(max_attempts=2)
+        queue.put("fetch", "a")
+
+        for _ in range(2):
+            self.assertEqual(len(queue.lease("fetch", 1, lease_seconds=60)), 1)
+            self.clock.now += 61
+
+        # Two deliveries crashed their worker; the job is parked, not delivered a third time
+        self.assertEqual(queue.lease("fetch", 1, lease_seconds=60), [])
+        self.assertEqual(queue.counts(), {"fetch": {"failed": 1}})
+
+    def test_parking_applies_to_a_reopened_queue(self):
+        queue = self.open(max_attempts=1)
+        queue.put("fetch", "a")
+        queue.lease("fetch", 1, lease_seconds=60)
+        queue.close()
+
+        self.clock.now += 61
+        self.assertEqual(self.open(max_attempts=1).lease("fetch", 1, lease_seconds=60), [])
+
+
+class DedupeTest(WorkQueueTestCase):
+    def test_waiting_job_takes_the_latest_payload(self):
+        queue = self.open()
+        self.assertTrue(queue.put("fetch", {"version": 1}, key="a"))
+        self.assertTrue(queue.put("fetch", {"version": 2}, key="a"))
+
+        self.assertEqual([payload for _, payload in queue.lease("fetch", 10, lease_seconds=60)], [{"version": 2}])
+
+    def test_running_job_is_not_touched(self):
+        queue = self.open()
+        queue.put("fetch", {"version": 1}, key="a")
+        (job_id, _), = queue.lease("fetch", 1, lease_seconds=60)
+
+        self.assertFalse(queue.put("fetch", {"version": 2}, key="a"))
+        self.clock.now += 61
+        self.assertEqual(queue.lease("fetch", 10, lease_seconds=60), [(job_id, {"version": 1})])
+
+    def test_failed_job_does_not_block_a_new_one(self):
+        queue = self.open(max_attempts=1)
+        queue.put("fetch", {"version": 1}, key="a")
+        queue.nack([job_id for job_id, _ in queue.lease("fetch", 1, lease_seconds=60)], "error")
+
+        self.assertTrue(queue.put("fetch", {"version": 2}, key="a"))
+        self.assertTrue(queue.is_pending("fetch", "a"))
+        self.assertEqual(queue.counts(), {"fetch": {"failed": 1, "ready": 1}})
+
+    def test_keys_are_per_queue_and_none_is_never_deduped(self):
+        queue = self.open()
+        # The second "a" updates the first, so it counts as a change but not as a job
+        self.assertEqual(queue.put_many("fetch", [("a", 1), ("a", 2), (None, 3), (None, 4)]), 4)
+        self.assertEqual(queue.put_many("enrich", [("a", 1)]), 1)
+        self.assertEqual(queue.counts(), {"fetch": {"ready": 3}, "enrich": {"ready": 1}})
+
+
+class ScheduleDueTest(WorkQueueTestCase):
+    SCHEDULE = [
+        {"name": "banjir", "pipeline": "news", "interval_minutes": 60, "keywords": ["banjir", "genangan"]},
+        {"name": "tweets", "pipeline": "tweets", "interval_minutes": 10, "keywords": []},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        from crawler import orchestrator
+        self.schedule_due = orchestrator.schedule_due
+        patch = mock.patch.object(orchestrator.time, "time", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def discovery_payloads(self, queue):
+        return sorted(
+            (payload["schedule"], payload.get("keyword"))
+            for _, payload in queue.lease("discover", 100, lease_seconds=60)
+        )
+
+    def test_enqueues_one_job_per_keyword_when_due(self):
+        queue = self.open()
+        self.assertEqual(self.schedule_due(queue, self.SCHEDULE), 3)
+        self.assertEqual(self.discovery_payloads(queue), [("banjir", "banjir"), ("banjir", "genangan"), ("tweets", None)])
+        self.assertEqual(queue.last_run("banjir"), self.clock.now)
+
+    def test_waits_for_the_interval(self):
+        queue = self.open()
+        self.schedule_due(queue, self.SCHEDULE)
+        queue.ack([job_id for job_id, _ in queue.lease("discover", 100, lease_seconds=60)])
+
+        self.clock.now += 11 * 60
+        self.assertEqual(self.schedule_due(queue, self.SCHEDULE), 1)
+        self.assertEqual(self.discovery_payloads(queue), [("tweets", None)])
+
+        self.clock.now += 50 * 60
+        self.assertEqual(self.schedule_due(queue, self.SCHEDULE), 2)
+
+    def test_force_ignores_the_interval_but_not_pending_jobs(self):
+        queue = self.open()
+        self.schedule_due(queue, self.SCHEDULE)
+        queue.lease("discover", 1, lease_seconds=60)
+
+        # The leased keyword is still running; the waiting ones only get their payload refreshed
+        self.assertEqual(self.schedule_due(queue, self.SCHEDULE, force=True), 2)
+        self.assertEqual(queue.counts(), {"discover": {"leased": 1, "ready": 2}})
+
+
+if __name__ == "__main__":
+    unittest.main()
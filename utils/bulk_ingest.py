@@ -0,0 +1,131 @@
+import os
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch, helpers
+from utils.metrics import ES_BULK_LOAD_SECONDS, ES_BULK_DOCUMENTS
+
+load_dotenv()
+
+# Bulk requests are cut at whichever comes first: document count or bytes
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+BULK_MAX_CHUNK_BYTES = int(os.getenv("BULK_MAX_CHUNK_BYTES", 10 * 1024 * 1024))
+BULK_THREAD_COUNT = int(os.getenv("BULK_THREAD_COUNT", 4))
+# Chunks buffered ahead of the bulk threads; bounds memory and applies backpressure to the crawl
+BULK_QUEUE_SIZE = int(os.getenv("BULK_QUEUE_SIZE", 4))
+# refresh_interval while loading: "-1" disables refreshes, a longer interval keeps documents appearing
+BULK_REFRESH_INTERVAL = os.getenv("BULK_REFRESH_INTERVAL", "30s")
+DEAD_LETTER_DIR = os.getenv("DEAD_LETTER_DIR", ".dead_letter")
+
+def iter_batches(iterable, size: int):
+    """
+    Yield lists of up to size consecutive items of an iterable.
+
+    Args:
+        iterable (iterable): Items to group.
+        size (int): Maximum number of items per list.
+
+    Yields:
+        list: The next batch.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+@contextmanager
+def relaxed_refresh(es: Elasticsearch, index_name: str, refresh_interval: str = BULK_REFRESH_INTERVAL):
+    """
+    Relax the refresh interval of an index during a large load, then restore it and refresh once.
+
+    Args:
+        es (Elasticsearch): An instance of the Elasticsearch client.
+        index_name (str): The index being loaded.
+        refresh_interval (str): Interval used during the load, "-1" to disable refreshes.
+    """
+    settings = es.indices.get_settings(index=index_name, name="index.refresh_interval")
+    previous = settings.get(index_name, {}).get("settings", {}).get("index", {}).get("refresh_interval")
+
+    es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": refresh_interval}})
+    try:
+        yield
+    finally:
+        # None resets the setting to the cluster default
+        es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": previous}})
+        es.indices.refresh(index=index_name)
+
+def stream_ingest(es: Elasticsearch, actions, index_name: str, chunk_size: int = BULK_CHUNK_SIZE,
+                  max_chunk_bytes: int = BULK_MAX_CHUNK_BYTES, thread_count: int = BULK_THREAD_COUNT,
+                  queue_size: int = BULK_QUEUE_SIZE, dead_letter_path: str = None, relax_refresh: bool = True,
+                  on_indexed=None) -> dict:
+    """
+    Stream bulk actions into Elasticsearch with parallel_bulk at constant memory.
+
+    Actions are pulled from the iterable only as fast as the bulk threads send them. Items that
+    Elasticsearch rejects are appended with their error to a JSON-lines dead-letter file.
+
+    Args:
+        es (Elasticsearch): An instance of the Elasticsearch client.
+        actions (iterable): Bulk actions, typically a generator.
+        index_name (str): The target index, used for the refresh settings and the dead-letter file name.
+        chunk_size (int): Maximum documents per bulk request.
+        max_chunk_bytes (int): Maximum bytes per bulk request.
+        thread_count (int): Number of concurrent bulk requests.
+        queue_size (int): Number of chunks buffered ahead of the bulk threads.
+        dead_letter_path (str): File receiving failed items, defaults to DEAD_LETTER_DIR/<index_name>.jsonl.
+        relax_refresh (bool): Relax the index refresh interval during the load.
+        on_indexed (callable): Called with each action Elasticsearch accepted, optional.
+
+    Returns:
+        dict: Number of indexed and failed documents, elapsed seconds and the dead-letter path.
+    """
+    dead_letter_path = dead_letter_path or os.path.join(DEAD_LETTER_DIR, f"{index_name}.jsonl")
+    stats = {"indexed": 0, "failed": 0, "seconds": 0.0, "dead_letter_path": dead_letter_path}
+
+    # Results come back in action order, so the actions in flight are tracked to dead-letter failures
+    in_flight = deque()
+
+    def tracked(actions):
+        for action in actions:
+            in_flight.append(action)
+            yield action
+
+    def run():
+        dead_letter = None
+        try:
+            for ok, item in helpers.parallel_bulk(
+                es, tracked(actions), thread_count=thread_count, chunk_size=chunk_size,
+                max_chunk_bytes=max_chunk_bytes, queue_size=queue_size,
+                raise_on_error=False, raise_on_exception=False,
+            ):
+                action = in_flight.popleft()
+                ES_BULK_DOCUMENTS.labels(outcome="indexed" if ok else "failed").inc()
+                if ok:
+                    stats["indexed"] += 1
+                    if on_indexed is not None:
+                        on_indexed(action)
+                    continue
+
+                stats["failed"] += 1
+                if dead_letter is None:
+                    os.makedirs(os.path.dirname(dead_letter_path) or ".", exist_ok=True)
+                    dead_letter = open(dead_letter_path, "a")
+                dead_letter.write(json.dumps({"action": action, "error": item}, default=str) + "\n")
+        finally:
+            if dead_letter is not None:
+                dead_letter.close()
+
+    start = time.perf_counter()
+    if relax_refresh:
+        with relaxed_refresh(es, index_name):
+            run()
+    else:
+        run()
+    stats["seconds"] = time.perf_counter() - start
+    ES_BULK_LOAD_SECONDS.observe(stats["seconds"])
+    return stats
@@ -0,0 +1,383 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class MemoryCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, ttl: float = None):
+        """
+        In-process LRU cache with optional size and TTL limits.
+
+        Parameters:
+        - max_entries (int): Maximum number of entries kept.
+        - max_bytes (int): Maximum total size of the cached values, in bytes of their encoded form.
+        - ttl (float): Default time to live of an entry in seconds, or None to never expire.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        size = len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            self._entries[key] = (value, expires_at, size)
+            self._size += size
+
+            # Evict least recently used entries until both limits hold
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._size > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def delete(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    def __init__(self, path: str, max_entries: int = 100000, max_bytes: int = None, ttl: float = None):
+        """
+        On-disk cache stored in a single SQLite file, evicting least recently used entries.
+
+        Parameters:
+        - path (str): Path of the SQLite database file.
+        - max_entries (int): Maximum number of entries kept.
+        - max_bytes (int): Maximum total size of the cached values in bytes.
+        - ttl (float): Default time to live of an entry in seconds, or None to never expire.
+        """
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = now + ttl if ttl is not None else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), expires_at, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        if self.max_bytes is None:
+            return
+        size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if size > self.max_bytes:
+            excess = size - self.max_bytes
+            rows = self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+            for key, entry_size in rows:
+                if excess <= 0:
+                    break
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                excess -= entry_size
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+class RedisCache:
+    def __init__(self, url: str, prefix: str = "cache:", ttl: float = None):
+        """
+        Cache stored in Redis. Size-based eviction is left to the server's maxmemory policy.
+
+        Parameters:
+        - url (str): Redis connection URL, e.g. redis://localhost:6379/0.
+        - prefix (str): Prefix added to every key.
+        - ttl (float): Default time to live of an entry in seconds, or None to never expire.
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis cache backend requires the 'redis' package: pip install redis")
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: str):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float = None):
+        ttl = ttl if ttl is not None else self.ttl
+        if ttl is not None:
+            self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+        else:
+            self.client.set(self.prefix + key, value)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+class Cache:
+    def __init__(self, backend):
+        """
+        Wraps a cache backend and counts hits, misses and writes.
+
+        Parameters:
+        - backend: A MemoryCache, SQLiteCache or RedisCache instance.
+        """
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self.backend.set(key, value, ttl=ttl)
+        with self._lock:
+            self.sets += 1
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the current number of entries.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class TieredCache:
+    def __init__(self, first: Cache, second: Cache = None):
+        """
+        Two-level cache: a fast first tier backed by an optional persistent second tier.
+
+        Misses on the first tier fall through to the second, and second-tier hits are
+        copied into the first.
+
+        Parameters:
+        - first (Cache): Fast tier, usually in-process memory.
+        - second (Cache): Slower tier that survives restarts, e.g. SQLite, or None.
+        """
+        self.first = first
+        self.second = second
+
+    def get(self, key: str):
+        value = self.first.get(key)
+        if value is None and self.second is not None:
+            value = self.second.get(key)
+            if value is not None:
+                self.first.set(key, value)
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self.first.set(key, value, ttl=ttl)
+        if self.second is not None:
+            self.second.set(key, value, ttl=ttl)
+
+    def delete(self, key: str):
+        self.first.delete(key)
+        if self.second is not None:
+            self.second.delete(key)
+
+    def clear(self):
+        self.first.clear()
+        if self.second is not None:
+            self.second.clear()
+
+    def stats(self) -> dict:
+        return {
+            "first": self.first.stats(),
+            "second": self.second.stats() if self.second is not None else None,
+        }
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesces concurrent calls for the same key: the first caller runs the function,
+        callers arriving while it runs wait for and share its result.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: str, function):
+        """
+        Runs function once per key among overlapping callers.
+
+        Parameters:
+        - key (str): Identifies identical calls.
+        - function (callable): Zero-argument function producing the result.
+
+        Returns:
+        object: The result of the function, shared by all waiting callers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = function()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+# Default of the cache argument of the clients (OCRProcessor, GeminiConnector): build the cache
+# configured by the environment. Passing None instead disables caching
+CACHE_FROM_ENV = object()
+
+def _optional_number(value, cast):
+    return cast(value) if value not in (None, "") else None
+
+def build_cache_from_env(prefix: str, default_backend: str = "memory", default_path: str = None):
+    """
+    Builds a cache from environment variables sharing a common prefix.
+
+    Reads <prefix>_BACKEND (memory, sqlite, redis or none), <prefix>_MAX_ENTRIES,
+    <prefix>_MAX_BYTES, <prefix>_TTL_SECONDS, <prefix>_PATH and REDIS_URL.
+
+    Parameters:
+    - prefix (str): Environment variable prefix, e.g. "OCR_CACHE".
+    - default_backend (str): Backend used when <prefix>_BACKEND is not set.
+    - default_path (str): SQLite file used when <prefix>_PATH is not set.
+
+    Returns:
+    Cache | None: The configured cache, or None when caching is disabled.
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", default_backend).lower()
+    max_entries = _optional_number(os.getenv(f"{prefix}_MAX_ENTRIES"), int)
+    max_bytes = _optional_number(os.getenv(f"{prefix}_MAX_BYTES"), int)
+    ttl = _optional_number(os.getenv(f"{prefix}_TTL_SECONDS"), float)
+
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return Cache(MemoryCache(max_entries=max_entries or 1024, max_bytes=max_bytes, ttl=ttl))
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_PATH", default_path or f".cache/{prefix.lower()}.sqlite3")
+        return Cache(SQLiteCache(path, max_entries=max_entries or 100000, max_bytes=max_bytes, ttl=ttl))
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        return Cache(RedisCache(url, prefix=f"{prefix.lower()}:", ttl=ttl))
+
+    raise ValueError(f"Unknown cache backend for {prefix}_BACKEND: {backend}")
@@ -0,0 +1,102 @@
+import time
+import threading
+from importlib import import_module
+
+class ClientRegistry:
+    def __init__(self):
+        """
+        Registry of backend clients that are built lazily, once, on first use.
+
+        Factories are callables or "module:attribute" strings. String factories keep the
+        backend SDK from being imported until the client is actually needed.
+        """
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory):
+        """
+        Registers the factory of a client, replacing any previous one.
+
+        Parameters:
+        - name (str): Name the client is retrieved by.
+        - factory (callable | str): Zero-argument callable, or "module:attribute" path to one.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        """
+        Returns the client registered under name, building it on the first call.
+
+        Parameters:
+        - name (str): Name of the client.
+
+        Returns:
+        object: The shared client instance.
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self._factories:
+            raise KeyError(f"No client registered under '{name}'")
+
+        # One lock per client, so a slow backend does not block the others
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                factory = self._factories[name]
+                if isinstance(factory, str):
+                    module_name, attribute = factory.split(":")
+                    factory = getattr(import_module(module_name), attribute)
+                instance = factory()
+                self._instances[name] = instance
+            return instance
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: list = None) -> dict:
+        """
+        Builds clients ahead of the first request. Failures are reported, not raised.
+
+        Parameters:
+        - names (list): Clients to build, defaults to every registered client.
+
+        Returns:
+        dict: Seconds spent building each client, or the error message when it failed.
+        """
+        report = {}
+        for name in names or list(self._factories):
+            start = time.perf_counter()
+            try:
+                self.get(name)
+                report[name] = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                report[name] = f"error: {e}"
+                print(f"Warm-up of client '{name}' failed: {e}")
+        return report
+
+    def reset(self, name: str = None):
+        """
+        Drops a built client (or all of them) so the next get builds it again.
+        """
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+# Shared registry used by the API, the utils modules and the crawlers
+registry = ClientRegistry()
+registry.register("ocr", "utils.ocr_document_ai:OCRProcessor")
+registry.register("gemini", "utils.gemini:GeminiConnector")
+registry.register("gcs_bucket", "utils.gcs:create_bucket")
+registry.register("embedding_model", "utils.embeddings:create_embedding_model")
+registry.register("embedding_store", "utils.embeddings:create_embedding_store")
+registry.register("elasticsearch", "utils.elasticsearch_client:create_elasticsearch")
+registry.register("async_elasticsearch", "utils.elasticsearch_client:create_async_elasticsearch")
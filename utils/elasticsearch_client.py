@@ -0,0 +1,86 @@
+import os
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+from utils.clients import registry
+
+load_dotenv()
+
+# Cluster: Elastic Cloud when ELASTIC_CLOUD_ID is set, otherwise ELASTICSEARCH_URL
+ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
+ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
+ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
+ELASTIC_CLOUD_ID = os.getenv("ELASTIC_CLOUD_ID")
+ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+
+# Transport tuning shared by every client
+ELASTIC_CONNECTIONS_PER_NODE = int(os.getenv("ELASTIC_CONNECTIONS_PER_NODE", 32))
+ELASTIC_REQUEST_TIMEOUT = float(os.getenv("ELASTIC_REQUEST_TIMEOUT", 30))
+ELASTIC_MAX_RETRIES = int(os.getenv("ELASTIC_MAX_RETRIES", 3))
+ELASTIC_HTTP_COMPRESS = os.getenv("ELASTIC_HTTP_COMPRESS", "true").lower() == "true"
+
+def elasticsearch_options(**overrides) -> dict:
+    """
+    Build the connection options of the configured cluster.
+
+    Connections are kept alive in a per-node pool of ELASTIC_CONNECTIONS_PER_NODE, request bodies
+    are gzip-compressed, and timed-out requests are retried up to ELASTIC_MAX_RETRIES times.
+
+    Args:
+        **overrides: Options replacing the configured ones, e.g. hosts=["http://other:9200"].
+
+    Returns:
+        dict: Keyword arguments for Elasticsearch or AsyncElasticsearch.
+    """
+    options = {
+        "connections_per_node": ELASTIC_CONNECTIONS_PER_NODE,
+        "http_compress": ELASTIC_HTTP_COMPRESS,
+        "request_timeout": ELASTIC_REQUEST_TIMEOUT,
+        "retry_on_timeout": True,
+        "max_retries": ELASTIC_MAX_RETRIES,
+    }
+
+    if "hosts" not in overrides:
+        if ELASTIC_CLOUD_ID:
+            options["cloud_id"] = ELASTIC_CLOUD_ID
+        else:
+            options["hosts"] = [ELASTICSEARCH_URL]
+
+    if ELASTIC_API_KEY:
+        options["api_key"] = ELASTIC_API_KEY
+    elif ELASTIC_USERNAME and ELASTIC_PASSWORD:
+        options["basic_auth"] = (ELASTIC_USERNAME, ELASTIC_PASSWORD)
+
+    options.update(overrides)
+    return options
+
+def create_elasticsearch(**overrides) -> Elasticsearch:
+    """
+    Create an Elasticsearch client for the configured cluster. The shared client is built once by the client registry.
+
+    Returns:
+        Elasticsearch: Client with a pooled, keep-alive HTTP transport.
+    """
+    return Elasticsearch(**elasticsearch_options(**overrides))
+
+def create_async_elasticsearch(**overrides):
+    """
+    Create an AsyncElasticsearch client for the configured cluster. Requires the aiohttp package.
+
+    Returns:
+        AsyncElasticsearch: Async client with the same connection options as create_elasticsearch.
+    """
+    from elasticsearch import AsyncElasticsearch
+
+    return AsyncElasticsearch(**elasticsearch_options(**overrides))
+
+def get_elasticsearch() -> Elasticsearch:
+    """
+    Return the shared Elasticsearch client, creating it on the first call.
+    """
+    return registry.get("elasticsearch")
+
+def get_async_elasticsearch():
+    """
+    Return the shared AsyncElasticsearch client, creating it on the first call.
+    """
+    return registry.get("async_elasticsearch")
@@ -1,19 +1,35 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch, helpers
+from utils.cache import Cache, MemoryCache
+from utils.elasticsearch_client import get_elasticsearch
+from utils.latency import LatencyTracker
+from utils.metrics import ES_REQUEST_SECONDS
 
 load_dotenv()
 
-ELASTIC_USERNAME = os.getenv("ELASTIC_USERNAME")
-ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
-ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
-ELASTIC_CLOUD_ID = os.getenv("ELASTIC_CLOUD_ID")
-elasticsearch = Elasticsearch(
-    cloud_id=ELASTIC_CLOUD_ID,
-    basic_auth=(os.getenv("ELASTIC_USERNAME"), os.getenv("ELASTIC_PASSWORD"))
-)
+# Recent query vectors, so repeated queries skip the embedding round trip
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 10000))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", 86400))
+query_embedding_cache = Cache(MemoryCache(max_entries=QUERY_EMBEDDING_CACHE_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL))
 
-def use_elasticsearch_searching(field:str, question:str, question_vector:list, elasticsearch:Elasticsearch, index:str) -> list:
+# Per-stage latency of hybrid_search: embed, bm25, knn, fusion and total
+search_latency = LatencyTracker()
+
+# Keyword and returned fields of the indexes written by the crawlers, used when a search names none
+SEARCH_FIELDS = {
+    "news_jakarta": {"text_fields": ["title", "content"], "source_fields": ["title", "url", "content", "publish_at"]},
+    "twitter_jakarta": {"text_fields": ["full_text"], "source_fields": ["full_text", "username", "link_post", "date"]},
+}
+
+# Runs the BM25 leg while the query is being embedded
+_search_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_WORKERS", 16)))
+
+def use_elasticsearch_searching(field:str, question:str, question_vector:list, elasticsearch:Elasticsearch, index:str,
+                                k:int=5, num_candidates:int=100, size:int=10, knn_boost:float=0.5, text_boost:float=0.5,
+                                text_fields:list=None, source_fields:list=None) -> list:
     """
     Perform a combined k-Nearest Neighbors (kNN) and keyword search query in Elasticsearch to retrieve relevant documents.
 
@@ -23,6 +39,13 @@ def use_elasticsearch_searching(field:str, question:str, question_vector:list, e
         question_vector (list): The vector representation of the query for the kNN search.
         elasticsearch (Elasticsearch): An instance of the Elasticsearch client.
         index (str): The name of the Elasticsearch index to search in.
+        k (int): Number of nearest neighbours returned by the kNN search.
+        num_candidates (int): Number of candidates considered per shard by the kNN search.
+        size (int): Number of documents returned.
+        knn_boost (float): Weight of the kNN score.
+        text_boost (float): Weight of the keyword score.
+        text_fields (list): Fields matched by the keyword query, defaults to ["text"].
+        source_fields (list): Fields returned for each document, defaults to ["text"].
 
     Returns:
         list(dict): A list of documents that match the query, with only the specified fields (e.g., "text") included in the results.
@@ -30,9 +53,9 @@ def use_elasticsearch_searching(field:str, question:str, question_vector:list, e
     knn_query = {
         "field" : field,
         "query_vector" : question_vector,
-        "k" : 5,
-        "num_candidates" : 100,
-        "boost": 0.5
+        "k" : k,
+        "num_candidates" : num_candidates,
+        "boost": knn_boost
     }
 
     question_query = {
@@ -40,9 +63,9 @@ def use_elasticsearch_searching(field:str, question:str, question_vector:list, e
             "must": {
                 "multi_match": {
                     "query": question,
-                    "fields": ["text"],
+                    "fields": text_fields or ["text"],
                     "type": "best_fields",
-                    "boost": 0.5,
+                    "boost": text_boost,
                 }
             }
         }
@@ -51,8 +74,8 @@ def use_elasticsearch_searching(field:str, question:str, question_vector:list, e
     search_query = {
         "knn": knn_query,
         "query": question_query,
-        "size": 10,
-        "_source": ["text"]
+        "size": size,
+        "_source": source_fields or ["text"]
     }
 
     elasticsearch_search = elasticsearch.search(
@@ -64,3 +87,120 @@ def use_elasticsearch_searching(field:str, question:str, question_vector:list, e
     for hits in elasticsearch_search["hits"]["hits"]:
         documents.append(hits["_source"])
     return documents
+
+def get_query_vector(question:str) -> list:
+    """
+    Embed a search query, answering repeated queries from the query embedding cache.
+
+    Args:
+        question (str): The textual query.
+
+    Returns:
+        list: The query vector.
+    """
+    # Imported here so the API only loads Vertex AI when the first query is embedded
+    from utils.embeddings import use_embedding_from_vertex_ai
+
+    vector = query_embedding_cache.get(question)
+    if vector is None:
+        vector = use_embedding_from_vertex_ai(question)
+        query_embedding_cache.set(question, vector)
+    return vector
+
+def _bm25_search(elasticsearch:Elasticsearch, index:str, question:str, text_fields:list, size:int, source_fields:list) -> list:
+    query = {"multi_match": {"query": question, "fields": text_fields, "type": "best_fields"}}
+    return elasticsearch.search(index=index, query=query, size=size, source=source_fields)["hits"]["hits"]
+
+def _knn_search(elasticsearch:Elasticsearch, index:str, field:str, question_vector:list, k:int, num_candidates:int, source_fields:list) -> list:
+    knn = {"field": field, "query_vector": question_vector, "k": k, "num_candidates": num_candidates}
+    return elasticsearch.search(index=index, knn=knn, size=k, source=source_fields)["hits"]["hits"]
+
+def fuse_boost(bm25_hits:list, knn_hits:list, text_boost:float, knn_boost:float, size:int) -> list:
+    """
+    Blend keyword and kNN hits by a weighted sum of their scores, as Elasticsearch does for a query plus knn search.
+
+    Returns:
+        list(dict): Hits sorted by blended score, each with "_id", "_score" and "_source".
+    """
+    fused = {}
+    for hits, boost in ((bm25_hits, text_boost), (knn_hits, knn_boost)):
+        for hit in hits:
+            entry = fused.setdefault(hit["_id"], {"_id": hit["_id"], "_score": 0.0, "_source": hit["_source"]})
+            entry["_score"] += boost * hit["_score"]
+    return sorted(fused.values(), key=lambda hit: hit["_score"], reverse=True)[:size]
+
+def fuse_rrf(bm25_hits:list, knn_hits:list, rank_constant:int, size:int) -> list:
+    """
+    Combine keyword and kNN hits with reciprocal rank fusion: score = sum of 1 / (rank_constant + rank).
+
+    Returns:
+        list(dict): Hits sorted by fused score, each with "_id", "_score" and "_source".
+    """
+    fused = {}
+    for hits in (bm25_hits, knn_hits):
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["_id"], {"_id": hit["_id"], "_score": 0.0, "_source": hit["_source"]})
+            entry["_score"] += 1.0 / (rank_constant + rank)
+    return sorted(fused.values(), key=lambda hit: hit["_score"], reverse=True)[:size]
+
+def hybrid_search(question:str, index:str, field:str="embedding", k:int=5, num_candidates:int=100, size:int=10,
+                  knn_boost:float=0.5, text_boost:float=0.5, text_fields:list=None, source_fields:list=None,
+                  fusion:str="boost", rank_constant:int=60, elasticsearch:Elasticsearch=None) -> list:
+    """
+    Hybrid keyword and kNN search. The BM25 leg runs while the query is embedded, the kNN leg
+    follows, and both result lists are fused by weighted score ("boost") or reciprocal rank ("rrf").
+
+    Args:
+        question (str): The textual query.
+        index (str): The name of the Elasticsearch index to search in.
+        field (str): The dense_vector field to run the kNN search on.
+        k (int): Number of nearest neighbours returned by the kNN search.
+        num_candidates (int): Number of candidates considered per shard by the kNN search.
+        size (int): Number of documents returned.
+        knn_boost (float): Weight of the kNN score in "boost" fusion.
+        text_boost (float): Weight of the keyword score in "boost" fusion.
+        text_fields (list): Fields matched by the keyword query, defaults to those of the index in SEARCH_FIELDS.
+        source_fields (list): Fields returned for each document, defaults to those of the index in SEARCH_FIELDS.
+        fusion (str): "boost" or "rrf".
+        rank_constant (int): Rank constant of reciprocal rank fusion.
+        elasticsearch (Elasticsearch): Client to use, defaults to the shared client.
+
+    Returns:
+        list(dict): Matching documents with their "_id", fused "_score" and "_source".
+    """
+    if fusion not in ("boost", "rrf"):
+        raise ValueError(f"Unknown fusion: {fusion}")
+
+    defaults = SEARCH_FIELDS.get(index, {})
+    text_fields = text_fields or defaults.get("text_fields")
+    source_fields = source_fields or defaults.get("source_fields")
+    if not text_fields or not source_fields:
+        raise ValueError(f"No default search fields for index {index}: pass text_fields and source_fields")
+
+    elasticsearch = elasticsearch or get_elasticsearch()
+    # RRF ranks both lists, so fetch as many keyword hits as kNN hits at least
+    bm25_size = max(size, k) if fusion == "rrf" else size
+
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            search_latency.record(stage, seconds * 1000)
+            if stage in ("bm25", "knn"):
+                ES_REQUEST_SECONDS.labels(operation=stage).observe(seconds)
+
+    start = time.perf_counter()
+    bm25_future = _search_executor.submit(timed, "bm25", _bm25_search, elasticsearch, index, question, text_fields, bm25_size, source_fields)
+    question_vector = timed("embed", get_query_vector, question)
+    knn_hits = timed("knn", _knn_search, elasticsearch, index, field, question_vector, k, num_candidates, source_fields)
+    bm25_hits = bm25_future.result()
+
+    if fusion == "rrf":
+        documents = timed("fusion", fuse_rrf, bm25_hits, knn_hits, rank_constant, size)
+    else:
+        documents = timed("fusion", fuse_boost, bm25_hits, knn_hits, text_boost, knn_boost, size)
+
+    search_latency.record("total", (time.perf_counter() - start) * 1000)
+    return documents
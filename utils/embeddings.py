@@ -1,18 +1,173 @@
 import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
 import vertexai
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from vertexai.language_models import TextEmbeddingModel
+from utils.clients import registry
+from utils.metrics import timed, EMBEDDING_BATCH_SECONDS, EMBEDDING_TEXTS
 
 load_dotenv()
 GCLOUD_SECRETS = os.getenv("GCLOUD_SECRETS_PATH")
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.expanduser(GCLOUD_SECRETS)
 
 REGION = os.getenv("REGION")
 MODEL_ID = os.getenv("MODEL_ID")
 PROJECT_ID = os.getenv("PROJECT_ID")
 
-vertexai.init(project=PROJECT_ID, location=REGION)
-model = TextEmbeddingModel.from_pretrained(MODEL_ID)
+# Per-request limits of the embedding model and the number of requests sent concurrently
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 250))
+EMBEDDING_BATCH_TOKEN_LIMIT = int(os.getenv("EMBEDDING_BATCH_TOKEN_LIMIT", 20000))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", 4))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+
+def create_embedding_model() -> TextEmbeddingModel:
+    """
+    Initialize Vertex AI and load the embedding model. Called once by the client registry on first use.
+
+    Returns:
+        TextEmbeddingModel: The model named by MODEL_ID.
+    """
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.expanduser(GCLOUD_SECRETS)
+    vertexai.init(project=PROJECT_ID, location=REGION)
+    return TextEmbeddingModel.from_pretrained(MODEL_ID)
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        """
+        Persistent embedding cache keyed by (model id, text hash), storing vectors as raw float32 bytes.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        path = os.path.expanduser(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model_id TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model_id, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model_id: str, text_hashes: list) -> dict:
+        """
+        Look up cached vectors.
+
+        Args:
+            model_id (str): Embedding model id.
+            text_hashes (list): Hashes of the texts to look up.
+
+        Returns:
+            dict: Text hash to float32 vector, for the hashes found.
+        """
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(text_hashes), 500):
+                batch = text_hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_id = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model_id, *batch],
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model_id: str, vectors: dict):
+        """
+        Store vectors.
+
+        Args:
+            model_id (str): Embedding model id.
+            vectors (dict): Text hash to vector.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_id, text_hash, vector) VALUES (?, ?, ?)",
+                [(model_id, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+            )
+            self._conn.commit()
+
+def create_embedding_store() -> EmbeddingStore:
+    """
+    Open the embedding cache at EMBEDDING_CACHE_PATH. Called once by the client registry on first use.
+    """
+    return EmbeddingStore(EMBEDDING_CACHE_PATH)
+
+def text_hash(text: str) -> str:
+    """
+    Return the SHA-256 hex digest identifying a text in the embedding cache.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _batches(texts: list, batch_size: int, token_limit: int) -> list:
+    """
+    Split texts into request batches within the per-request text count and estimated token limits.
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for text in texts:
+        tokens = len(text) // 4 + 1
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > token_limit):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def embed_texts(texts: list, batch_size: int = EMBEDDING_BATCH_SIZE, max_workers: int = EMBEDDING_MAX_WORKERS,
+                use_cache: bool = True) -> np.ndarray:
+    """
+    Generate embeddings for many texts with batched, concurrent Vertex AI requests.
+
+    Identical texts are embedded once, and vectors already in the embedding cache are not requested again.
+
+    Args:
+        texts (list): The input texts.
+        batch_size (int): Maximum number of texts per request.
+        max_workers (int): Maximum number of requests in flight.
+        use_cache (bool): Read and write the persistent embedding cache.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dimensions), in the order of the input texts.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    hashes = [text_hash(text) for text in texts]
+    unique_texts = dict(zip(hashes, texts))
+
+    store = registry.get("embedding_store") if use_cache else None
+    vectors = store.get_many(MODEL_ID, list(unique_texts)) if store is not None else {}
+
+    missing = [key for key in unique_texts if key not in vectors]
+    EMBEDDING_TEXTS.labels(source="cache").inc(len(unique_texts) - len(missing))
+    EMBEDDING_TEXTS.labels(source="model").inc(len(missing))
+    if missing:
+        model = registry.get("embedding_model")
+        batches = _batches([unique_texts[key] for key in missing], batch_size, EMBEDDING_BATCH_TOKEN_LIMIT)
+
+        @timed(EMBEDDING_BATCH_SECONDS)
+        def embed_batch(batch):
+            return [np.asarray(embedding.values, dtype=np.float32) for embedding in model.get_embeddings(batch)]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            new_vectors = [vector for batch_vectors in executor.map(embed_batch, batches) for vector in batch_vectors]
+
+        computed = dict(zip(missing, new_vectors))
+        if store is not None:
+            store.put_many(MODEL_ID, computed)
+        vectors.update(computed)
+
+    return np.stack([vectors[key] for key in hashes])
 
 def use_embedding_from_vertex_ai(text:str) -> list:
     """
@@ -24,5 +179,4 @@ def use_embedding_from_vertex_ai(text:str) -> list:
     Returns:
         list: A list of values representing the first embedding vector for the input text.
     """
-    embeddings = model.get_embeddings([text])
-    return embeddings[0].values
+    return embed_texts([text])[0].tolist()
@@ -1,6 +1,15 @@
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.clients import registry
+from utils.metrics import observe_transfer
+import google_crc32c
+import hashlib
+import base64
+import time
 import os
 
 # Load environment variables
@@ -11,10 +20,41 @@ SERVICE_ACCOUNT_CREDENTIALS_PATH = os.getenv('CREDENTIAL_GCS_FILE_PATH')
 BUCKET_NAME = os.getenv('BUCKET_NAME')
 PROJECT_ID=os.getenv('PROJECT_ID')
 
-# Initialize GCS Client
-credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_CREDENTIALS_PATH)
-storage_client = storage.Client(project=PROJECT_ID, credentials=credentials)
-bucket = storage_client.get_bucket(BUCKET_NAME)
+
+def create_bucket():
+    """
+    Builds the GCS client and fetches the configured bucket.
+
+    Called once by the client registry on first use instead of at import time.
+
+    Returns:
+    Bucket: The bucket named by BUCKET_NAME.
+    """
+    if os.getenv('STORAGE_EMULATOR_HOST'):
+        # Local emulator such as fake-gcs-server, which accepts unauthenticated requests
+        credentials = AnonymousCredentials()
+    else:
+        credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_CREDENTIALS_PATH)
+    storage_client = storage.Client(project=PROJECT_ID, credentials=credentials)
+    return storage_client.get_bucket(BUCKET_NAME)
+
+
+def get_bucket():
+    """
+    Returns the shared bucket, building the GCS client on the first call.
+    """
+    return registry.get("gcs_bucket")
+
+# Size of each resumable upload request and ranged download; must be a multiple of 256 KiB
+DEFAULT_CHUNK_SIZE = int(os.getenv('GCS_CHUNK_SIZE', 8 * 1024 * 1024))
+CHUNK_SIZE_MULTIPLE = 256 * 1024
+
+# Bulk transfers: worker threads, and objects above the threshold are downloaded as parallel slices
+DEFAULT_TRANSFER_WORKERS = int(os.getenv('GCS_TRANSFER_WORKERS', 8))
+SLICED_DOWNLOAD_THRESHOLD = int(os.getenv('GCS_SLICED_DOWNLOAD_THRESHOLD', 64 * 1024 * 1024))
+SLICED_DOWNLOAD_SLICE_SIZE = int(os.getenv('GCS_SLICED_DOWNLOAD_SLICE_SIZE', 32 * 1024 * 1024))
+# Slices of one object fetched at once; each of the max_workers downloads may run its own slices
+SLICED_DOWNLOAD_WORKERS = int(os.getenv('GCS_SLICED_DOWNLOAD_WORKERS', 4))
 
 def upload_to_gcs(source_file: str, destination_blob_name: str):
     """
@@ -28,8 +68,10 @@ def upload_to_gcs(source_file: str, destination_blob_name: str):
     dict: Confirmation message with uploaded file path.
     """
     # Upload the file to GCS
-    blob = bucket.blob(destination_blob_name)
+    blob = get_bucket().blob(destination_blob_name)
+    start = time.perf_counter()
     blob.upload_from_filename(source_file)
+    observe_transfer("upload", os.path.getsize(source_file), time.perf_counter() - start)
 
     print(f"File {source_file} uploaded to {BUCKET_NAME}/{destination_blob_name} successfully.")
 
@@ -46,9 +88,259 @@ def download_from_gcs(blob_name: str, destination_file: str):
     dict: Confirmation message with the downloaded file path.
     """
     # Download the file from GCS
-    blob = bucket.blob(blob_name)
+    blob = get_bucket().blob(blob_name)
+    start = time.perf_counter()
     blob.download_to_filename(destination_file)
+    observe_transfer("download", os.path.getsize(destination_file), time.perf_counter() - start)
 
     print(f"File {blob_name} downloaded from {BUCKET_NAME} to {destination_file} successfully.")
 
     return destination_file
+
+
+def open_upload_stream(destination_blob_name: str, content_type: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Opens a writable file-like object backed by a resumable GCS upload.
+
+    Only one chunk is buffered in memory at a time; each full chunk is sent to GCS as it is written.
+
+    Parameters:
+    - destination_blob_name (str): Destination path in the GCS bucket.
+    - content_type (str): MIME type stored on the object.
+    - chunk_size (int): Bytes sent per resumable upload request, a multiple of 256 KiB.
+
+    Returns:
+    BlobWriter: Writer to write the content to; closing it finalizes the upload.
+    """
+    if chunk_size <= 0 or chunk_size % CHUNK_SIZE_MULTIPLE:
+        raise ValueError(f"chunk_size must be a positive multiple of {CHUNK_SIZE_MULTIPLE} bytes")
+
+    blob = get_bucket().blob(destination_blob_name)
+    return blob.open("wb", content_type=content_type, chunk_size=chunk_size)
+
+
+def abort_upload_stream(writer):
+    """
+    Abandons a writer returned by open_upload_stream without finalizing the object.
+
+    Closing the writer would commit the partial content, so the resumable session, if one was
+    started, is cancelled instead and the buffered bytes are dropped.
+
+    Parameters:
+    - writer (BlobWriter): Writer of a failed upload.
+    """
+    try:
+        writer.terminate()
+    except Exception as e:
+        print(f"Error cancelling resumable upload: {e}")
+
+
+def get_blob_metadata(blob_name: str):
+    """
+    Fetches the metadata of a blob.
+
+    Parameters:
+    - blob_name (str): Path of the file in the GCS bucket.
+
+    Returns:
+    Blob | None: The blob with its size, content type and generation loaded, or None if it does not exist.
+    """
+    return get_bucket().get_blob(blob_name)
+
+
+def iter_blob_range(blob, start: int, end: int, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yields the bytes of a blob between two offsets, one ranged request per chunk.
+
+    The download is pinned to the blob's generation so a concurrent overwrite cannot mix two versions.
+
+    Parameters:
+    - blob (Blob): Blob returned by get_blob_metadata.
+    - start (int): First byte to return.
+    - end (int): Last byte to return, inclusive.
+    - chunk_size (int): Bytes fetched per request.
+
+    Yields:
+    bytes: Consecutive chunks of the requested range.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive number of bytes")
+
+    position = start
+    while position <= end:
+        chunk_end = min(position + chunk_size - 1, end)
+        start_time = time.perf_counter()
+        chunk = blob.download_as_bytes(start=position, end=chunk_end, if_generation_match=blob.generation)
+        observe_transfer("download", len(chunk), time.perf_counter() - start_time)
+        yield chunk
+        position = chunk_end + 1
+
+
+def _local_checksums(path: str) -> dict:
+    """
+    Computes the base64 MD5 and CRC32C of a local file, as GCS reports them.
+    """
+    md5 = hashlib.md5()
+    crc32c = google_crc32c.Checksum()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            md5.update(block)
+            crc32c.update(block)
+    return {
+        "md5": base64.b64encode(md5.digest()).decode(),
+        "crc32c": base64.b64encode(crc32c.digest()).decode(),
+    }
+
+
+def _is_unchanged(blob, path: str) -> bool:
+    """
+    Checks whether a local file already has the same content as a blob.
+
+    CRC32C is compared when available since composite objects have no MD5.
+    """
+    if blob is None or not os.path.exists(path) or os.path.getsize(path) != blob.size:
+        return False
+    checksums = _local_checksums(path)
+    if blob.crc32c:
+        return checksums["crc32c"] == blob.crc32c
+    return checksums["md5"] == blob.md5_hash
+
+
+def _transfer_report(results: list, elapsed: float) -> dict:
+    """
+    Aggregates per-object results into a throughput report.
+    """
+    transferred = [result for result in results if result["status"] == "transferred"]
+    total_bytes = sum(result["bytes"] for result in transferred)
+    return {
+        "transferred": len(transferred),
+        "skipped": sum(1 for result in results if result["status"] == "skipped"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "bytes_per_second": total_bytes / elapsed if elapsed else 0.0,
+        "objects": results,
+    }
+
+
+def _run_transfers(transfer, items: list, max_workers: int) -> dict:
+    """
+    Runs a transfer function over items on a bounded thread pool and times it.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items) or 1))) as executor:
+        results = list(executor.map(transfer, items))
+    return _transfer_report(results, time.perf_counter() - start)
+
+
+def upload_many(source_files: list = None, source_dir: str = None, prefix: str = "",
+                max_workers: int = DEFAULT_TRANSFER_WORKERS, skip_unchanged: bool = True) -> dict:
+    """
+    Uploads many local files to Google Cloud Storage in parallel.
+
+    Parameters:
+    - source_files (list): Local file paths to upload; each is stored as prefix + its basename.
+      Files mapping to the same blob name are reported failed rather than overwriting each other.
+    - source_dir (str): Directory uploaded recursively; each file is stored as prefix + its relative path.
+    - prefix (str): Prefix prepended to every destination blob name.
+    - max_workers (int): Maximum number of concurrent uploads.
+    - skip_unchanged (bool): Skip files whose checksum matches the existing blob.
+
+    Returns:
+    dict: Counts, total bytes, elapsed seconds, bytes/s and per-object timing.
+    """
+    bucket = get_bucket()
+    items = [(path, prefix + os.path.basename(path)) for path in source_files or []]
+    if source_dir:
+        for root, _, filenames in os.walk(source_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative_path = os.path.relpath(path, source_dir).replace(os.sep, "/")
+                items.append((path, prefix + relative_path))
+
+    sources = {}
+    for path, blob_name in items:
+        sources.setdefault(blob_name, []).append(path)
+
+    def upload(item):
+        source_file, blob_name = item
+        result = {"name": blob_name, "path": source_file, "bytes": 0}
+        start = time.perf_counter()
+        try:
+            if len(sources[blob_name]) > 1:
+                raise ValueError(f"Several files map to blob {blob_name}: {', '.join(sources[blob_name])}")
+            if skip_unchanged and _is_unchanged(bucket.get_blob(blob_name), source_file):
+                result["status"] = "skipped"
+            else:
+                bucket.blob(blob_name).upload_from_filename(source_file)
+                result["status"] = "transferred"
+                result["bytes"] = os.path.getsize(source_file)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        if result["status"] == "transferred":
+            observe_transfer("upload", result["bytes"], result["seconds"])
+        return result
+
+    return _run_transfers(upload, items, max_workers)
+
+
+def download_many(destination_dir: str, blob_names: list = None, prefix: str = None,
+                  max_workers: int = DEFAULT_TRANSFER_WORKERS, skip_unchanged: bool = True) -> dict:
+    """
+    Downloads many blobs from Google Cloud Storage in parallel.
+
+    Large objects are fetched as concurrent byte-range slices.
+
+    Parameters:
+    - destination_dir (str): Local directory; each blob is saved under its full blob name. Blobs whose
+      name would resolve outside of it, such as "../x", are reported failed.
+    - blob_names (list): Paths of the files in the GCS bucket.
+    - prefix (str): Download every blob whose name starts with this prefix.
+    - max_workers (int): Maximum number of concurrent downloads.
+    - skip_unchanged (bool): Skip blobs whose checksum matches the existing local file.
+
+    Returns:
+    dict: Counts, total bytes, elapsed seconds, bytes/s and per-object timing.
+    """
+    bucket = get_bucket()
+    blobs = [bucket.blob(name) for name in blob_names or []]
+    if prefix is not None:
+        blobs.extend(blob for blob in bucket.list_blobs(prefix=prefix) if not blob.name.endswith("/"))
+
+    root = os.path.realpath(destination_dir)
+
+    def download(blob):
+        destination_file = os.path.realpath(os.path.join(root, *blob.name.split("/")))
+        result = {"name": blob.name, "path": destination_file, "bytes": 0}
+        start = time.perf_counter()
+        try:
+            # Blob names come from the caller or the bucket, so they must not escape destination_dir
+            if destination_file == root or os.path.commonpath([root, destination_file]) != root:
+                raise ValueError(f"Blob name {blob.name} resolves outside of {destination_dir}")
+            # Blobs listed by prefix already carry their metadata
+            if blob.size is None:
+                blob.reload()
+            if skip_unchanged and _is_unchanged(blob, destination_file):
+                result["status"] = "skipped"
+            else:
+                os.makedirs(os.path.dirname(destination_file), exist_ok=True)
+                if blob.size > SLICED_DOWNLOAD_THRESHOLD:
+                    transfer_manager.download_chunks_concurrently(
+                        blob, destination_file, chunk_size=SLICED_DOWNLOAD_SLICE_SIZE,
+                        max_workers=SLICED_DOWNLOAD_WORKERS, worker_type=transfer_manager.THREAD,
+                    )
+                else:
+                    blob.download_to_filename(destination_file)
+                result["status"] = "transferred"
+                result["bytes"] = blob.size
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        if result["status"] == "transferred":
+            observe_transfer("download", result["bytes"], result["seconds"])
+        return result
+
+    return _run_transfers(download, blobs, max_workers)
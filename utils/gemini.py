@@ -2,6 +2,7 @@ from google.oauth2 import service_account
 import vertexai
 from google.cloud import documentai_v1 as documentai
 from vertexai.generative_models import (
+    FinishReason,
     GenerationConfig,
     GenerativeModel,
     HarmCategory,
@@ -9,13 +10,19 @@ from vertexai.generative_models import (
     Image
 )
 from dotenv import load_dotenv
+from utils.cache import build_cache_from_env, TieredCache, SingleFlight, CACHE_FROM_ENV
+from utils.metrics import record_tokens, GEMINI_SECONDS
+import hashlib
+import threading
+import time
+import json
 import os
 
 # Load environment variables
 load_dotenv()
 
 class GeminiConnector:
-    def __init__(self):
+    def __init__(self, cache=CACHE_FROM_ENV):
         """
         Initialize the GeminiConnector with credentials and configurations.
 
@@ -23,8 +30,10 @@ class GeminiConnector:
         - credentials_file_path (str): Path to the service account credentials file.
         - project_id (str): Google Cloud Project ID.
         - model (str): Name of the Gemini model.
+        - cache: Response cache, or None to disable caching; defaults to a memory tier (GEMINI_CACHE_*)
+          over an optional persistent tier (GEMINI_DISK_CACHE_*, disabled unless GEMINI_DISK_CACHE_BACKEND is set).
         """
-        
+
         self.credentials = service_account.Credentials.from_service_account_file(os.getenv("CREDENTIAL_DOCAI_FILE_PATH"))
         self.project_id =  os.getenv("PROJECT_ID")
         self.model = os.getenv("GEMINI_MODEL")
@@ -35,37 +44,180 @@ class GeminiConnector:
         # Initialize Models
         self.multimodal_model = GenerativeModel(self.model)
 
-    def generate_content(self, prompt: str) -> str:
+        # Response cache and coalescing of identical in-flight requests
+        if cache is CACHE_FROM_ENV:
+            memory_cache = build_cache_from_env("GEMINI_CACHE")
+            cache = None if memory_cache is None else TieredCache(
+                memory_cache, build_cache_from_env("GEMINI_DISK_CACHE", default_backend="none")
+            )
+        self.cache = cache
+        self._inflight = SingleFlight()
+
+        # One model per static system instruction. Vertex caches a prefix repeated across requests
+        # implicitly and reports the hit as cached_content_token_count, recorded as cached_tokens
+        self._instruction_models = {}
+        self._instruction_models_lock = threading.Lock()
+
+    def _model_for(self, system_instruction: str = None) -> GenerativeModel:
+        """
+        Returns the model to call for a request, carrying its system instruction if any.
+        """
+        if system_instruction is None:
+            return self.multimodal_model
+        key = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        with self._instruction_models_lock:
+            model = self._instruction_models.get(key)
+            if model is None:
+                model = self._instruction_models[key] = GenerativeModel(self.model, system_instruction=system_instruction)
+            return model
+
+    def _cache_key(self, prompt: str, safety_config: dict, config: GenerationConfig, system_instruction: str = None) -> str:
+        """
+        Build the cache key of a request from the model, system instruction, prompt, generation and safety settings.
+        """
+        payload = json.dumps({
+            "model": self.model,
+            "system_instruction": system_instruction,
+            "prompt": prompt,
+            "generation_config": config.to_dict(),
+            "safety_config": {str(category): str(threshold) for category, threshold in safety_config.items()},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def generate_content(self, prompt: str, use_cache: bool = True, response_schema: dict = None,
+                         system_instruction: str = None) -> str:
         """
         Generate content using the multimodal model.
 
+        Identical requests are answered from the response cache, and concurrent identical
+        requests share a single upstream call.
+
         Parameters:
         - prompt (str): Text prompt for content generation.
+        - use_cache (bool): Look up and store the response in the cache.
+        - response_schema (dict): OpenAPI schema of a JSON response; enables JSON response mode.
+        - system_instruction (str): Static instruction shared by many requests, sent as system instruction.
 
         Returns:
         str: Generated content.
         """
-        try:
-            # Configure safety and generation settings
-            safety_config = self._safety_config()
-            config = self._generation_config()
+        # Configure safety and generation settings
+        safety_config = self._safety_config()
+        config = self._generation_config(response_schema)
+
+        if not use_cache or self.cache is None:
+            return self._generate(prompt, safety_config, config, system_instruction)
+
+        key = self._cache_key(prompt, safety_config, config, system_instruction)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        def generate_and_store():
+            outcome = {}
+            result = self._generate(prompt, safety_config, config, system_instruction, outcome)
+            # Truncated or blocked answers are not cached, so a retry asks the model again
+            if outcome.get("finish_reason") == FinishReason.STOP:
+                self.cache.set(key, result)
+            return result
+
+        return self._inflight.do(key, generate_and_store)
+
+    def stream_content(self, prompt: str, use_cache: bool = True, response_schema: dict = None, usage: dict = None,
+                       system_instruction: str = None):
+        """
+        Generate content using the multimodal model, yielding text chunks as they arrive.
+
+        A cached response is yielded as a single chunk. A response is stored in the cache only when it
+        was streamed in full and the model finished normally, so a response cut off by the token
+        limit or a safety block is asked again on the next call.
+
+        Parameters:
+        - prompt (str): Text prompt for content generation.
+        - use_cache (bool): Look up and store the response in the cache.
+        - response_schema (dict): OpenAPI schema of a JSON response; enables JSON response mode.
+        - usage (dict): Receives prompt_tokens, cached_tokens and output_tokens of the call; stays empty on a cache hit.
+        - system_instruction (str): Static instruction shared by many requests, sent as system instruction.
+
+        Yields:
+        str: Generated text chunks.
+        """
+        safety_config = self._safety_config()
+        config = self._generation_config(response_schema)
+
+        key = None
+        if use_cache and self.cache is not None:
+            key = self._cache_key(prompt, safety_config, config, system_instruction)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        outcome = {}
+        for text in self._stream(prompt, safety_config, config, usage, system_instruction, outcome):
+            parts.append(text)
+            yield text
+
+        if key is not None and outcome.get("finish_reason") == FinishReason.STOP:
+            self.cache.set(key, "".join(parts).strip())
+
+    def cache_stats(self) -> dict:
+        """
+        Report the response cache counters and the number of coalesced requests.
+
+        Returns:
+        dict: Cache statistics, or {"enabled": False} when caching is disabled.
+        """
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "coalesced": self._inflight.coalesced, **self.cache.stats()}
 
+    def _stream(self, prompt: str, safety_config: dict, config: GenerationConfig, usage: dict = None,
+                system_instruction: str = None, outcome: dict = None):
+        """
+        Call the model with streaming enabled and yield the text of each chunk.
+
+        The token counts of the last chunk's usage metadata are written to usage, and the finish
+        reason of the response to outcome["finish_reason"], when given.
+        Time to first chunk, total time and token counts are recorded in the metrics.
+        """
+        tokens = {}
+        start = time.perf_counter()
+        try:
             # Generate content
-            responses = self.multimodal_model.generate_content(
+            responses = self._model_for(system_instruction).generate_content(
                 [prompt],
                 safety_settings=safety_config,
                 generation_config=config,
                 stream=True
             )
 
-            # Collect the full result
-            full_result = ""
-            for response in responses:
-                full_result += response.text
-
-            return full_result.strip()
+            for index, response in enumerate(responses):
+                if index == 0:
+                    GEMINI_SECONDS.labels(stage="first_chunk").observe(time.perf_counter() - start)
+                if response.usage_metadata:
+                    tokens["prompt_tokens"] = response.usage_metadata.prompt_token_count
+                    tokens["cached_tokens"] = getattr(response.usage_metadata, "cached_content_token_count", 0)
+                    tokens["output_tokens"] = response.usage_metadata.candidates_token_count
+                    if usage is not None:
+                        usage.update(tokens)
+                if outcome is not None and response.candidates and response.candidates[0].finish_reason:
+                    outcome["finish_reason"] = response.candidates[0].finish_reason
+                yield response.text
         except Exception as e:
             raise Exception(f"Error generating content: {e}")
+        finally:
+            GEMINI_SECONDS.labels(stage="total").observe(time.perf_counter() - start)
+            record_tokens(tokens)
+
+    def _generate(self, prompt: str, safety_config: dict, config: GenerationConfig, system_instruction: str = None,
+                  outcome: dict = None) -> str:
+        """
+        Call the model and return the full generated text.
+        """
+        # Collect the full result
+        return "".join(self._stream(prompt, safety_config, config, system_instruction=system_instruction, outcome=outcome)).strip()
 
     def _safety_config(self):
         """
@@ -81,11 +233,17 @@ class GeminiConnector:
             HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
         }
 
-    def _generation_config(self):
+    def _generation_config(self, response_schema: dict = None):
         """
         Configure generation settings.
 
+        Parameters:
+        - response_schema (dict): OpenAPI schema of a JSON response, or None for free text.
+
         Returns:
         GenerationConfig: Configuration object for content generation.
         """
+        if response_schema is not None:
+            return GenerationConfig(temperature=0.0, top_p=1, top_k=32,
+                                    response_mime_type="application/json", response_schema=response_schema)
         return GenerationConfig(temperature=0.0, top_p=1, top_k=32)
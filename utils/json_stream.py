@@ -0,0 +1,65 @@
+import json
+
+class JSONArrayStream:
+    def __init__(self):
+        """
+        Incremental parser of a streamed JSON array of objects.
+
+        Text is fed chunk by chunk as it arrives from a model, and every top-level object is
+        returned as soon as its closing brace is seen, so the items completed before a stream
+        is cut off are not lost. Text before the opening bracket (such as a markdown fence) is ignored.
+        """
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.errors = 0
+
+    def feed(self, text: str) -> list:
+        """
+        Consume the next chunk of the stream.
+
+        Parameters:
+        - text (str): The next chunk of generated text.
+
+        Returns:
+        list: The objects completed in this chunk. Objects that are not valid JSON are skipped and counted in errors.
+        """
+        items = []
+        for char in text:
+            if not self._started:
+                self._started = char == "["
+                continue
+
+            if self._depth == 0:
+                # Between items: only an opening brace starts the next one
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        item = json.loads("".join(self._buffer))
+                    except ValueError:
+                        self.errors += 1
+                    else:
+                        if isinstance(item, dict):
+                            items.append(item)
+                    self._buffer = []
+        return items
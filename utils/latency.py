@@ -0,0 +1,41 @@
+import threading
+from collections import defaultdict, deque
+
+class LatencyTracker:
+    def __init__(self, window: int = 1000):
+        """
+        Keeps the most recent latency samples per stage and reports percentiles over them.
+
+        Parameters:
+        - window (int): Number of recent samples kept per stage.
+        """
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, milliseconds: float):
+        with self._lock:
+            self._samples[stage].append(milliseconds)
+
+    @staticmethod
+    def _percentile(ordered: list, percentile: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(percentile / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        """
+        Returns count, mean, p50, p95 and p99 in milliseconds for every stage.
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+
+        return {
+            stage: {
+                "count": len(ordered),
+                "mean_ms": round(sum(ordered) / len(ordered), 3),
+                "p50_ms": round(self._percentile(ordered, 50), 3),
+                "p95_ms": round(self._percentile(ordered, 95), 3),
+                "p99_ms": round(self._percentile(ordered, 99), 3),
+            }
+            for stage, ordered in samples.items() if ordered
+        }
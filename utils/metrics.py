@@ -0,0 +1,231 @@
+import os
+import time
+import functools
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# prometheus_client and opentelemetry are optional: without them every metric and span is a no-op
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true" and prometheus_client is not None
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true" and trace is not None
+# Set for processes forked by a process manager (gunicorn workers, the crawl orchestrator), so
+# /metrics aggregates the samples of every process; see the prometheus_client multiprocess docs
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets in seconds: fast calls (Elasticsearch, page parsing) and slow remote calls (models, OCR)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Throughput buckets in bytes per second, 64 KiB/s to 1 GiB/s
+THROUGHPUT_BUCKETS = tuple(64 * 1024 * 4 ** i for i in range(8))
+
+class _NoopMetric:
+    """
+    Stands in for a metric when prometheus_client is not installed or metrics are disabled.
+    """
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+def histogram(name: str, documentation: str, labelnames: tuple = (), buckets: tuple = FAST_BUCKETS):
+    """
+    Creates a Prometheus histogram, or a no-op metric when metrics are unavailable.
+
+    Parameters:
+    - name (str): Metric name.
+    - documentation (str): Help text.
+    - labelnames (tuple): Label names.
+    - buckets (tuple): Upper bounds of the buckets.
+
+    Returns:
+    Histogram: The histogram.
+    """
+    if not METRICS_ENABLED:
+        return _NoopMetric()
+    return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+
+def counter(name: str, documentation: str, labelnames: tuple = ()):
+    """
+    Creates a Prometheus counter, or a no-op metric when metrics are unavailable.
+    """
+    if not METRICS_ENABLED:
+        return _NoopMetric()
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+# API
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "API request latency.", ("method", "route", "status"), SLOW_BUCKETS
+)
+# Document AI
+DOCUMENT_AI_SECONDS = histogram("documentai_request_duration_seconds", "Document AI process_document latency.", (), SLOW_BUCKETS)
+DOCUMENT_AI_PAGES = counter("documentai_pages_total", "Pages processed by Document AI.")
+# Google Cloud Storage
+GCS_TRANSFER_SECONDS = histogram("gcs_transfer_duration_seconds", "GCS object transfer time.", ("direction",), SLOW_BUCKETS)
+GCS_TRANSFER_BYTES = counter("gcs_transfer_bytes_total", "Bytes transferred to and from GCS.", ("direction",))
+GCS_THROUGHPUT = histogram(
+    "gcs_transfer_bytes_per_second", "Throughput of GCS object transfers.", ("direction",), THROUGHPUT_BUCKETS
+)
+# Gemini
+GEMINI_SECONDS = histogram("gemini_request_duration_seconds", "Gemini generation latency.", ("stage",), SLOW_BUCKETS)
+GEMINI_TOKENS = counter("gemini_tokens_total", "Gemini tokens by kind: prompt, cached or output.", ("kind",))
+GEMINI_ENRICHMENT_ARTICLES = counter(
+    "gemini_enrichment_articles_total", "Articles of the bulk enrichment by outcome: enriched, retried or failed.", ("outcome",)
+)
+# Divided by the enriched articles, this is the tokens wasted per article
+GEMINI_ENRICHMENT_WASTED_TOKENS = counter(
+    "gemini_enrichment_wasted_tokens_total", "Gemini tokens spent on articles left out of an enrichment response."
+)
+# Embeddings
+EMBEDDING_BATCH_SECONDS = histogram("embedding_batch_duration_seconds", "Embedding model request latency per batch.", (), SLOW_BUCKETS)
+EMBEDDING_TEXTS = counter("embedding_texts_total", "Texts embedded, by source: model or cache.", ("source",))
+# Elasticsearch
+ES_REQUEST_SECONDS = histogram(
+    "elasticsearch_request_duration_seconds", "Elasticsearch latency by operation.", ("operation",), FAST_BUCKETS
+)
+# parallel_bulk does not expose the time of each bulk request, so whole loads are timed
+ES_BULK_LOAD_SECONDS = histogram("elasticsearch_bulk_load_duration_seconds", "Duration of streamed bulk loads.", (), SLOW_BUCKETS)
+ES_BULK_DOCUMENTS = counter("elasticsearch_bulk_documents_total", "Documents sent in bulk, by outcome.", ("outcome",))
+# Crawlers
+CRAWLER_FETCH_SECONDS = histogram(
+    "crawler_page_fetch_duration_seconds", "Page fetch time by method: http or browser.", ("method",), SLOW_BUCKETS
+)
+ORCHESTRATOR_BATCH_SECONDS = histogram(
+    "orchestrator_batch_duration_seconds", "Time to handle a leased batch, by stage.", ("stage",), SLOW_BUCKETS + (600, 1800)
+)
+
+class timed:
+    def __init__(self, metric, span_name: str = None, **labels):
+        """
+        Observes the duration of a block or function call in a histogram, optionally inside a trace span.
+
+        Usable as a context manager (with timed(GEMINI_SECONDS, stage="total"): ...) or a decorator
+        (@timed(EMBEDDING_BATCH_SECONDS)). The duration is observed also when the block raises.
+
+        Parameters:
+        - metric (Histogram): Histogram receiving the duration in seconds.
+        - span_name (str): Name of a trace span covering the block, optional.
+        - labels: Label values of the histogram.
+        """
+        self.metric = metric.labels(**labels) if labels else metric
+        self.span_name = span_name
+        self.seconds = None
+        self._span = None
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # A fresh timer per call, so concurrent calls do not share a start time
+            with timed(self.metric, self.span_name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        if self.span_name:
+            self._span = span(self.span_name)
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self.metric.observe(self.seconds)
+        if self._span is not None:
+            self._span.__exit__(*exc)
+        return False
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Opens an OpenTelemetry span as the current span, or does nothing when tracing is unavailable.
+
+    Spans are exported by whatever tracer provider the process configured, e.g. with opentelemetry-instrument.
+
+    Parameters:
+    - name (str): Span name.
+    - attributes: Span attributes.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    with trace.get_tracer("insight-jakarta").start_as_current_span(name, attributes=attributes or None) as current:
+        yield current
+
+def observe_transfer(direction: str, num_bytes: int, seconds: float):
+    """
+    Records one GCS object transfer.
+
+    Parameters:
+    - direction (str): "upload" or "download".
+    - num_bytes (int): Bytes transferred.
+    - seconds (float): Duration of the transfer.
+    """
+    GCS_TRANSFER_SECONDS.labels(direction=direction).observe(seconds)
+    GCS_TRANSFER_BYTES.labels(direction=direction).inc(num_bytes)
+    if seconds > 0 and num_bytes:
+        GCS_THROUGHPUT.labels(direction=direction).observe(num_bytes / seconds)
+
+def record_tokens(usage: dict):
+    """
+    Adds the token counts of a Gemini call, as filled by GeminiConnector.stream_content.
+    """
+    for kind in ("prompt", "cached", "output"):
+        if usage.get(f"{kind}_tokens"):
+            GEMINI_TOKENS.labels(kind=kind).inc(usage[f"{kind}_tokens"])
+
+def _registry():
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+def mark_process_dead(pid: int):
+    """
+    Removes the files of an exited process from PROMETHEUS_MULTIPROC_DIR, so its live gauges stop
+    being reported; its counters and histograms stay in the totals. Does nothing outside multiprocess mode.
+
+    Parameters:
+    - pid (int): Process id of the exited process.
+    """
+    if METRICS_ENABLED and PROMETHEUS_MULTIPROC_DIR and pid is not None:
+        multiprocess.mark_process_dead(pid, PROMETHEUS_MULTIPROC_DIR)
+
+def metrics_payload() -> tuple:
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Returns:
+    tuple: The payload (bytes) and its content type.
+    """
+    if not METRICS_ENABLED:
+        raise RuntimeError("Metrics are disabled or prometheus_client is not installed: pip install prometheus-client")
+    return prometheus_client.generate_latest(_registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+def start_metrics_server(port: int):
+    """
+    Serves /metrics on its own port, for processes without an HTTP server such as the crawlers.
+
+    Parameters:
+    - port (int): Port to listen on.
+    """
+    if not METRICS_ENABLED:
+        print("Metrics are disabled or prometheus_client is not installed, not starting the metrics server.")
+        return
+    prometheus_client.start_http_server(port, registry=_registry())
+    print(f"Serving metrics on port {port}.")
@@ -1,55 +1,130 @@
-import os, json
+import os, io, json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import documentai_v1 as documentai
 from google.oauth2 import service_account
+from pypdf import PdfReader, PdfWriter
 from mimetypes import guess_type
 from dotenv import load_dotenv
+from utils.cache import build_cache_from_env, CACHE_FROM_ENV
+from utils.metrics import timed, DOCUMENT_AI_SECONDS, DOCUMENT_AI_PAGES
 
 # Load environment variables
 load_dotenv()
 
+# Number of long-lived Document AI clients (gRPC channels) shared by all callers
+DEFAULT_CLIENT_POOL_SIZE = int(os.getenv('DOCAI_CLIENT_POOL_SIZE', 4))
+# Pages per request when splitting PDFs; online processing accepts at most 15 pages per document
+DEFAULT_PAGES_PER_SHARD = int(os.getenv('OCR_PAGES_PER_SHARD', 15))
+# Number of page ranges OCRed in parallel for a single PDF
+DEFAULT_SHARD_WORKERS = int(os.getenv('OCR_SHARD_WORKERS', 8))
+
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, pool_size: int = DEFAULT_CLIENT_POOL_SIZE, cache=CACHE_FROM_ENV):
         """
         Initializes the OCRProcessor with the required environment variables.
+
+        Parameters:
+        - pool_size (int): Maximum number of Document AI clients kept open and shared across threads.
+        - cache (Cache): OCR result cache, or None to disable caching. Defaults to the one configured by the OCR_CACHE_* variables.
         """
         self.credentials_file_path = os.getenv('CREDENTIAL_DOCAI_FILE_PATH')
-        self.project_id = os.getenv('PROJECT_ID') 
+        self.project_id = os.getenv('PROJECT_ID')
         self.location = os.getenv('LOCATION')
-        self.processor_id = os.getenv('PROCESSOR_ID') 
+        self.processor_id = os.getenv('PROCESSOR_ID')
 
 
         # Ensure required environment variables are set
         if not all([self.credentials_file_path, self.project_id, self.location, self.processor_id]):
             raise EnvironmentError("Missing one or more required environment variables: CREDENTIALS_FILE_PATH, PROJECT_ID, LOCATION, PROCESSOR_ID")
 
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+
         # Load credentials
         with open(self.credentials_file_path, "r") as creds:
             service_account_info = json.load(creds)
         self.credentials = service_account.Credentials.from_service_account_info(service_account_info)
 
-    def process_file(self, filename: str) -> str:
+        # Client pool, filled lazily on first use
+        self.pool_size = pool_size
+        self._clients = []
+        self._next_client = 0
+        self._pool_lock = threading.Lock()
+
+        # Content-addressed result cache, see cache_key
+        self.cache = build_cache_from_env("OCR_CACHE") if cache is CACHE_FROM_ENV else cache
+
+    def _create_client(self) -> documentai.DocumentProcessorServiceClient:
         """
-        Processes a document using Google Document AI OCR with the provided filename.
+        Creates a new Document AI client bound to the regional endpoint.
+
+        Returns:
+        DocumentProcessorServiceClient: A client with its own gRPC channel.
+        """
+        # Define the API endpoint based on the location
+        api_endpoint = f"{self.location}-documentai.googleapis.com"
+        client_options = {"api_endpoint": api_endpoint}
+
+        return documentai.DocumentProcessorServiceClient(client_options=client_options, credentials=self.credentials)
+
+    def _get_client(self) -> documentai.DocumentProcessorServiceClient:
+        """
+        Returns a pooled Document AI client, creating one if the pool is not full yet.
+
+        Clients are handed out round-robin. gRPC clients are thread-safe, so a client
+        can serve several concurrent requests; the pool only spreads load over channels.
+
+        Returns:
+        DocumentProcessorServiceClient: A shared client from the pool.
+        """
+        with self._pool_lock:
+            if len(self._clients) < self.pool_size:
+                client = self._create_client()
+                self._clients.append(client)
+                return client
+
+            client = self._clients[self._next_client]
+            self._next_client = (self._next_client + 1) % self.pool_size
+            return client
+
+    def close(self):
+        """
+        Closes every pooled client and empties the pool.
+        """
+        with self._pool_lock:
+            clients, self._clients = self._clients, []
+            self._next_client = 0
+
+        for client in clients:
+            client.transport.close()
+
+    def cache_key(self, file_content: bytes) -> str:
+        """
+        Builds the cache key of a document from its bytes and the processor id.
 
         Parameters:
-        - filename (str): Path to the file to be processed.
+        - file_content (bytes): Raw content of the document.
 
         Returns:
-        str: Extracted text from the processed document.
+        str: Key identifying the OCR result of this content on this processor.
         """
-        # Read the file content
-        with open(filename, 'rb') as file:
-            file_content = file.read()
+        return f"{self.processor_id}:{hashlib.sha256(file_content).hexdigest()}"
 
-        # Get the MIME type of the file
-        mime_type, _ = guess_type(filename)
+    def _process_content(self, file_content: bytes, mime_type: str) -> documentai.Document:
+        """
+        Sends raw document bytes to Document AI.
 
-        # Define the API endpoint based on the location
-        api_endpoint = f"{self.location}-documentai.googleapis.com"
-        client_options = {"api_endpoint": api_endpoint}
+        Parameters:
+        - file_content (bytes): Raw content of the document.
+        - mime_type (str): MIME type of the content.
 
-        # Create a Document AI client
-        documentai_client = documentai.DocumentProcessorServiceClient(client_options=client_options, credentials=self.credentials)
+        Returns:
+        Document: The processed Document AI document.
+        """
+        # Reuse a pooled Document AI client
+        documentai_client = self._get_client()
 
         # Construct the processor resource name
         resource_name = documentai_client.processor_path(self.project_id, self.location, self.processor_id)
@@ -61,14 +136,140 @@ class OCRProcessor:
         request = documentai.ProcessRequest(name=resource_name, raw_document=raw_document)
 
         # Process the document
-        result = documentai_client.process_document(request=request).document
-        
+        with timed(DOCUMENT_AI_SECONDS, span_name="documentai.process_document"):
+            document = documentai_client.process_document(request=request).document
+        DOCUMENT_AI_PAGES.inc(len(document.pages))
+        return document
+
+    def process_file(self, filename: str) -> str:
+        """
+        Processes a document using Google Document AI OCR with the provided filename.
+
+        Parameters:
+        - filename (str): Path to the file to be processed.
+
+        Returns:
+        str: Extracted text from the processed document.
+        """
+        # Read the file content
+        with open(filename, 'rb') as file:
+            file_content = file.read()
+
+        # Answer repeated documents from the cache
+        if self.cache is not None:
+            key = self.cache_key(file_content)
+            cached_text = self.cache.get(key)
+            if cached_text is not None:
+                return cached_text
+
+        # Get the MIME type of the file
+        mime_type, _ = guess_type(filename)
+
+        result = self._process_content(file_content, mime_type)
+
+        if self.cache is not None:
+            self.cache.set(key, result.text)
+
         # Return the text content of the document
         return result.text
 
+    @staticmethod
+    def _split_pdf(file_content: bytes, pages_per_shard: int) -> list:
+        """
+        Splits a PDF into consecutive page ranges.
+
+        Parameters:
+        - file_content (bytes): Raw content of the PDF.
+        - pages_per_shard (int): Maximum number of pages per range.
+
+        Returns:
+        list: PDF bytes of each page range, in page order.
+        """
+        reader = PdfReader(io.BytesIO(file_content))
+        page_count = len(reader.pages)
+        if page_count <= pages_per_shard:
+            return [file_content]
+
+        shards = []
+        for start in range(0, page_count, pages_per_shard):
+            writer = PdfWriter()
+            for page in reader.pages[start:start + pages_per_shard]:
+                writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            shards.append(buffer.getvalue())
+        return shards
+
+    @staticmethod
+    def _page_offsets(document: documentai.Document) -> list:
+        """
+        Returns the (start, end) character offsets of every page within the document text.
+        """
+        offsets = []
+        for page in document.pages:
+            segments = page.layout.text_anchor.text_segments
+            if segments:
+                offsets.append((int(segments[0].start_index), int(segments[-1].end_index)))
+            else:
+                # Pages without text get an empty range at the current position
+                position = offsets[-1][1] if offsets else 0
+                offsets.append((position, position))
+        return offsets
+
+    def process_file_pages(self, filename: str, pages_per_shard: int = DEFAULT_PAGES_PER_SHARD,
+                           max_workers: int = DEFAULT_SHARD_WORKERS) -> dict:
+        """
+        Processes a large PDF by OCRing page ranges in parallel and stitching the text back in page order.
+
+        Non-PDF files are processed as a single range.
+
+        Parameters:
+        - filename (str): Path to the file to be processed.
+        - pages_per_shard (int): Maximum number of pages sent in one Document AI request.
+        - max_workers (int): Maximum number of page ranges processed at the same time.
+
+        Returns:
+        dict: The full text and, for every page, its number and start/end offsets in that text.
+        """
+        # Read the file content
+        with open(filename, 'rb') as file:
+            file_content = file.read()
+
+        if self.cache is not None:
+            key = self.cache_key(file_content) + ":pages"
+            cached_result = self.cache.get(key)
+            if cached_result is not None:
+                return json.loads(cached_result)
+
+        mime_type, _ = guess_type(filename)
+        if mime_type == "application/pdf":
+            shards = self._split_pdf(file_content, pages_per_shard)
+        else:
+            shards = [file_content]
+
+        # Every shard is an independent request, the slowest one bounds the total time
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+            documents = list(executor.map(lambda shard: self._process_content(shard, mime_type), shards))
+
+        texts = []
+        pages = []
+        offset = 0
+        for document in documents:
+            for start, end in self._page_offsets(document):
+                pages.append({"page_number": len(pages) + 1, "start_index": offset + start, "end_index": offset + end})
+            texts.append(document.text)
+            offset += len(document.text)
+
+        result = {"text": "".join(texts), "pages": pages}
+
+        if self.cache is not None:
+            self.cache.set(key, json.dumps(result))
+
+        return result
+
 # Example usage
 if __name__ == "__main__":
     ocr_processor = OCRProcessor()
     filename = os.getenv('FILENAME')
     ocr_text = ocr_processor.process_file(filename)
-    print(ocr_text)
\ No newline at end of file
+    print(ocr_text)
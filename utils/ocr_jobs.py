@@ -0,0 +1,146 @@
+import os
+import time
+import uuid
+import asyncio
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of documents sent to Document AI at the same time, across all jobs
+DEFAULT_CONCURRENCY = int(os.getenv('OCR_BATCH_CONCURRENCY', 8))
+# How long finished jobs are kept for polling before they are discarded
+JOB_RETENTION_SECONDS = int(os.getenv('OCR_JOB_RETENTION_SECONDS', 3600))
+
+class OCRJob:
+    def __init__(self, filenames: list):
+        """
+        Holds the state and per-file results of one batch OCR job.
+
+        Parameters:
+        - filenames (list): Paths of the files to be processed.
+        """
+        self.id = str(uuid.uuid4())
+        self.filenames = filenames
+        self.results = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) == len(self.filenames)
+
+    async def add_result(self, result: dict):
+        """
+        Records the result of one file and wakes up every reader of the job.
+        """
+        async with self._changed:
+            self.results.append(result)
+            if self.done:
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def iter_results(self):
+        """
+        Yields per-file results in completion order, waiting for new ones until the job is done.
+        """
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.results) or self.done)
+                pending = self.results[position:]
+            for result in pending:
+                yield result
+            position += len(pending)
+            if self.done and position == len(self.results):
+                return
+
+    def summary(self) -> dict:
+        failed = sum(1 for result in self.results if result["status"] == "failed")
+        return {
+            "job_id": self.id,
+            "status": "done" if self.done else "running",
+            "total": len(self.filenames),
+            "completed": len(self.results) - failed,
+            "failed": failed,
+            "results": list(self.results),
+        }
+
+class OCRJobManager:
+    def __init__(self, process_file, concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        Runs batch OCR jobs through a shared asyncio work queue with bounded concurrency.
+
+        Parameters:
+        - process_file (callable): Blocking function taking a filename and returning its text.
+        - concurrency (int): Number of queue workers, i.e. maximum Document AI calls in flight.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.process_file = process_file
+        self.concurrency = concurrency
+        self.jobs = {}
+        self._queue = None
+        self._workers = []
+
+    def _ensure_workers(self):
+        # The queue and workers are bound to the running event loop, so start them on first use
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def _worker(self):
+        while True:
+            job, filename = await self._queue.get()
+            try:
+                if not os.path.exists(filename):
+                    raise FileNotFoundError(f"File not found: {filename}")
+                text = await asyncio.to_thread(self.process_file, filename)
+                result = {"filename": filename, "status": "done", "extracted_text": text}
+            except Exception as e:
+                result = {"filename": filename, "status": "failed", "error": str(e)}
+            finally:
+                self._queue.task_done()
+            await job.add_result(result)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, filenames: list) -> OCRJob:
+        """
+        Creates a job and queues its files. Must be called from the running event loop.
+
+        Parameters:
+        - filenames (list): Paths of the files to be processed.
+
+        Returns:
+        OCRJob: The queued job.
+        """
+        self._ensure_workers()
+        self._prune()
+
+        job = OCRJob(filenames)
+        self.jobs[job.id] = job
+        for filename in filenames:
+            self._queue.put_nowait((job, filename))
+        return job
+
+    def get(self, job_id: str):
+        """
+        Returns the job with the given id, or None if it is unknown or expired.
+        """
+        return self.jobs.get(job_id)
+
+    async def shutdown(self):
+        """
+        Cancels the queue workers.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
@@ -0,0 +1,96 @@
+import re
+import time
+import random
+import threading
+
+# HTTP status codes worth retrying: quota exhausted and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_MESSAGE = re.compile(r'\b(?:429|500|502|503|504)\b|resource exhausted|unavailable', flags=re.I)
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        """
+        Thread-safe token bucket refilled continuously at a per-minute rate.
+
+        Parameters:
+        - rate_per_minute (float): Tokens added per minute, e.g. a requests- or tokens-per-minute quota.
+        - capacity (float): Maximum burst size, defaults to one minute of quota.
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def acquire(self, amount: float = 1):
+        """
+        Blocks until amount tokens are available and takes them.
+
+        Requests larger than the capacity are clamped to it so they can eventually pass.
+
+        Parameters:
+        - amount (float): Number of tokens to take.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Checks whether an error, or any error it was raised from, is a quota or transient server error.
+
+    Looks at the `code` attribute set by google.api_core exceptions and falls back to the status in the message.
+
+    Parameters:
+    - error (BaseException): The raised error.
+
+    Returns:
+    bool: True if the call should be retried.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        code = getattr(error, "code", None)
+        if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+            return True
+        if RETRYABLE_MESSAGE.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def retry_with_backoff(function, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                       is_retryable=is_retryable_error):
+    """
+    Calls a function, retrying retryable failures with exponential backoff and full jitter.
+
+    Parameters:
+    - function (callable): Zero-argument function to call.
+    - max_attempts (int): Maximum number of calls, including the first one.
+    - base_delay (float): Upper bound of the first backoff in seconds, doubled on every retry.
+    - max_delay (float): Cap of the backoff upper bound in seconds.
+    - is_retryable (callable): Predicate deciding whether an error is retried.
+
+    Returns:
+    object: The return value of the first successful call.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return function()
+        except Exception as e:
+            if attempt == max_attempts or not is_retryable(e):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1))))
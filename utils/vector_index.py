@@ -0,0 +1,154 @@
+import os
+import hashlib
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+from utils.bulk_ingest import iter_batches
+
+load_dotenv()
+
+# Dense vector settings of the crawled indices
+EMBEDDING_DIMS = int(os.getenv("EMBEDDING_DIMS", 768))
+VECTOR_FIELD = "embedding"
+VECTOR_HASH_FIELD = "embedding_hash"
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 100))
+# "int8" stores quantized vectors in the HNSW graph (about 4x less memory), "none" keeps float32
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Records embedded together when embedding a stream of records
+EMBEDDING_INGEST_BATCH_SIZE = int(os.getenv("EMBEDDING_INGEST_BATCH_SIZE", 100))
+
+def dense_vector_mapping(dims: int = EMBEDDING_DIMS, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                         quantization: str = VECTOR_QUANTIZATION) -> dict:
+    """
+    Build the mapping of a kNN-searchable dense_vector field.
+
+    Args:
+        dims (int): Number of dimensions of the embedding model.
+        m (int): HNSW graph connections per node.
+        ef_construction (int): HNSW candidate list size while building the graph.
+        quantization (str): "int8" for int8_hnsw, anything else for plain hnsw.
+
+    Returns:
+        dict: Mapping of the vector field.
+    """
+    return {
+        "type": "dense_vector",
+        "dims": dims,
+        "index": True,
+        "similarity": "cosine",
+        "index_options": {
+            "type": "int8_hnsw" if quantization == "int8" else "hnsw",
+            "m": m,
+            "ef_construction": ef_construction,
+        },
+    }
+
+def ensure_vector_index(es: Elasticsearch, index_name: str, vector_field: str = VECTOR_FIELD):
+    """
+    Create the index with the dense_vector mapping if it does not exist yet.
+
+    Args:
+        es (Elasticsearch): An instance of the Elasticsearch client.
+        index_name (str): The name of the index.
+        vector_field (str): The field holding the embedding.
+    """
+    if es.indices.exists(index=index_name):
+        return
+
+    es.indices.create(index=index_name, mappings={
+        "properties": {
+            vector_field: dense_vector_mapping(),
+            VECTOR_HASH_FIELD: {"type": "keyword"},
+        }
+    })
+
+def embedding_text(record: dict, fields: list) -> str:
+    """
+    Join the non-empty text fields of a record into the text that gets embedded.
+    """
+    return "\n".join(str(record[field]) for field in fields if record.get(field))
+
+def _indexed_vectors(es: Elasticsearch, index_name: str, ids: list, vector_field: str) -> dict:
+    """
+    Fetch the stored vectors and embedding hashes of documents that are already indexed.
+
+    Returns:
+        dict: Document id to (embedding hash, vector).
+    """
+    if not ids or not es.indices.exists(index=index_name):
+        return {}
+
+    response = es.mget(index=index_name, ids=ids, source=[vector_field, VECTOR_HASH_FIELD])
+    indexed = {}
+    for document in response["docs"]:
+        source = document.get("_source") or {}
+        if document.get("found") and source.get(vector_field) and source.get(VECTOR_HASH_FIELD):
+            indexed[document["_id"]] = (source[VECTOR_HASH_FIELD], source[vector_field])
+    return indexed
+
+def add_embeddings(records: list, fields: list, vector_field: str = VECTOR_FIELD,
+                   es: Elasticsearch = None, index_name: str = None, id_field: str = "id") -> list:
+    """
+    Batch-embed the text fields of records before they are ingested.
+
+    Records whose text is unchanged since they were indexed reuse the stored vector; the rest go
+    through embed_texts, which also skips texts already in the local embedding cache.
+
+    Args:
+        records (list): Documents to ingest, modified in place.
+        fields (list): Text fields joined into the embedded text.
+        vector_field (str): Field receiving the embedding.
+        es (Elasticsearch): Client used to look up already indexed vectors, optional.
+        index_name (str): Index the records are ingested into, required with es.
+        id_field (str): Record field holding the document id.
+
+    Returns:
+        list: The records with vector_field and embedding_hash set; records without text are left unchanged.
+    """
+    # Imported here so the crawlers only load Vertex AI when they actually embed
+    from utils.embeddings import embed_texts
+
+    pending = []
+    for record in records:
+        text = embedding_text(record, fields)
+        if text:
+            record[VECTOR_HASH_FIELD] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            pending.append((record, text))
+
+    indexed = {}
+    if es is not None and index_name:
+        indexed = _indexed_vectors(es, index_name, [str(record[id_field]) for record, _ in pending if record.get(id_field)], vector_field)
+
+    to_embed = []
+    for record, text in pending:
+        stored = indexed.get(str(record.get(id_field)))
+        if stored and stored[0] == record[VECTOR_HASH_FIELD]:
+            record[vector_field] = stored[1]
+        else:
+            to_embed.append((record, text))
+
+    if to_embed:
+        vectors = embed_texts([text for _, text in to_embed])
+        for (record, _), vector in zip(to_embed, vectors):
+            record[vector_field] = vector.tolist()
+
+    return records
+
+def iter_with_embeddings(records, fields: list, vector_field: str = VECTOR_FIELD, es: Elasticsearch = None,
+                         index_name: str = None, batch_size: int = EMBEDDING_INGEST_BATCH_SIZE):
+    """
+    Embed a stream of records batch by batch, so embedding keeps up with the crawl at constant memory.
+
+    Args:
+        records (iterable): Documents to ingest.
+        fields (list): Text fields joined into the embedded text.
+        vector_field (str): Field receiving the embedding.
+        es (Elasticsearch): Client used to look up already indexed vectors, optional.
+        index_name (str): Index the records are ingested into, required with es.
+        batch_size (int): Records embedded together.
+
+    Yields:
+        dict: The records with their embedding.
+    """
+    for batch in iter_batches(records, batch_size):
+        yield from add_embeddings(batch, fields, vector_field=vector_field, es=es, index_name=index_name)